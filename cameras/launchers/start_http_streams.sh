@@ -19,7 +19,7 @@ ffmpeg -f v4l2 \
        -framerate 30 \
        -i /dev/video0 \
        -f mjpeg \
-       -q:v 3 \
+       -c:v copy \
        -listen 1 \
        -timeout 30 \
        http://0.0.0.0:$PORT1 &
@@ -32,7 +32,7 @@ ffmpeg -f v4l2 \
        -framerate 30 \
        -i /dev/video2 \
        -f mjpeg \
-       -q:v 3 \
+       -c:v copy \
        -listen 1 \
        -timeout 30 \
        http://0.0.0.0:$PORT2 &
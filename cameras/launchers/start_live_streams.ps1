@@ -14,10 +14,10 @@ Write-Host ""
 
 # Start individual ffmpeg streams in background on Jetson
 Write-Host "Starting Camera 1 stream (port 8080)..." -ForegroundColor Yellow
-ssh "${Username}@${Hostname}" "nohup ffmpeg -f v4l2 -input_format mjpeg -video_size 1280x720 -framerate 30 -i /dev/video0 -f mjpeg -q:v 5 -an - > /tmp/cam1_stream.mjpg &" 2>&1 | Out-Null
+ssh "${Username}@${Hostname}" "nohup ffmpeg -f v4l2 -input_format mjpeg -video_size 1280x720 -framerate 30 -i /dev/video0 -f mjpeg -c:v copy -an - > /tmp/cam1_stream.mjpg &" 2>&1 | Out-Null
 
 Write-Host "Starting Camera 2 stream (port 8081)..." -ForegroundColor Yellow  
-ssh "${Username}@${Hostname}" "nohup ffmpeg -f v4l2 -input_format mjpeg -video_size 1280x720 -framerate 30 -i /dev/video2 -f mjpeg -q:v 5 -an - > /tmp/cam2_stream.mjpg &" 2>&1 | Out-Null
+ssh "${Username}@${Hostname}" "nohup ffmpeg -f v4l2 -input_format mjpeg -video_size 1280x720 -framerate 30 -i /dev/video2 -f mjpeg -c:v copy -an - > /tmp/cam2_stream.mjpg &" 2>&1 | Out-Null
 
 # Actually, let's use a simpler approach - fast image refresh with ultra-low latency
 Write-Host "`nUsing ultra-fast refresh method (100ms = 10 FPS)..." -ForegroundColor Yellow
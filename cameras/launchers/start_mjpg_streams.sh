@@ -21,9 +21,8 @@ ffmpeg -f v4l2 \
        -re \
        -i /dev/video0 \
        -f mjpeg \
-       -q:v 3 \
+       -c:v copy \
        -an \
-       -vf "format=yuvj420p" \
        -fflags +genpts \
        -flags low_delay \
        -strict experimental \
@@ -39,9 +38,8 @@ ffmpeg -f v4l2 \
        -re \
        -i /dev/video2 \
        -f mjpeg \
-       -q:v 3 \
+       -c:v copy \
        -an \
-       -vf "format=yuvj420p" \
        -fflags +genpts \
        -flags low_delay \
        -strict experimental \
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Shared camera capture service: one ffmpeg per camera, any number of consumers
+Each camera is opened once. A reader thread splits ffmpeg's MJPEG output into
+JPEG frames (jpeg_splitter.py) and puts them in a small ring buffer; HTTP
+streams, detectors and recorders subscribe to the ring instead of starting
+their own ffmpeg on /dev/video0. The capture never waits for consumers, so its cost stays the
+same however many are attached. A consumer that falls behind skips to the
+newest frame ('latest' mode) or to the oldest one still in the ring ('all'
+mode, for recorders) and counts what it dropped.
+
+The camera's MJPEG is passed through as-is (ffmpeg -c:v copy): ffmpeg only
+demuxes the V4L2 buffers, so capture costs almost no CPU and clients get
+the JPEGs the camera compressed. passthrough=False (--transcode) restores
+the old decode + re-encode at -q:v 3, e.g. to shrink frames for slow links.
+
+Frames carry the JPEG bytes; Frame.image() decodes once and shares the
+result between every consumer that asks for it. A camera with no
+subscribers is closed after idle_timeout seconds, releasing the device.
+
+Usage:
+  python camera_capture_service.py --benchmark --consumers 1 4 16        # capture CPU vs consumers
+  python camera_capture_service.py --test-pattern --benchmark            # same, no camera needed
+  python camera_capture_service.py --benchmark --compare-transcode        # passthrough vs re-encode CPU
+  python camera_capture_service.py --record camera1.mjpeg --duration 10  # record /dev/video0
+"""
+
+import os
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+from jpeg_splitter import JpegSplitter
+
+CAMERAS = {'camera1': '/dev/video0', 'camera2': '/dev/video2'}
+
+VIDEO_SIZE = '1280x720'
+FRAMERATE = 30
+RING_SIZE = 8           # frames kept per camera
+READ_SIZE = 65536       # bytes per ffmpeg stdout read
+IDLE_TIMEOUT = 5.0      # seconds without subscribers before the camera is closed
+
+TEST_PATTERN = 'testsrc'   # device name that selects ffmpeg's generated test video
+MJPEG_FILES = ('.mjpeg', '.mjpg')   # device names ending in these replay a recording in a loop
+
+
+class Frame:
+    """One captured JPEG; image() decodes it at most once"""
+    __slots__ = ('seq', 'timestamp', 'jpeg', '_image', '_lock')
+
+    def __init__(self, seq: int, timestamp: float, jpeg: bytes):
+        self.seq = seq
+        self.timestamp = timestamp      # time.monotonic() when the frame was complete
+        self.jpeg = jpeg
+        self._image = None
+        self._lock = threading.Lock()
+
+    def image(self):
+        """Decoded BGR image (OpenCV), shared by all consumers of this frame"""
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    import cv2
+                    import numpy as np
+                    self._image = cv2.imdecode(np.frombuffer(self.jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return self._image
+
+
+class FrameRing:
+    """Fixed-size ring of the newest frames; put() never blocks on readers"""
+
+    def __init__(self, size: int = RING_SIZE):
+        self.size = size
+        self._slots: List[Optional[Frame]] = [None] * size
+        self.seq = 0                    # sequence number of the newest frame (0 = none yet)
+        self.closed = False
+        self.generation = 0             # bumped by reopen(), one per producer
+        self._cond = threading.Condition()
+
+    def put(self, jpeg: bytes, timestamp: Optional[float] = None) -> Frame:
+        with self._cond:
+            self.seq += 1
+            frame = Frame(self.seq, time.monotonic() if timestamp is None else timestamp, jpeg)
+            self._slots[self.seq % self.size] = frame
+            self._cond.notify_all()
+        return frame
+
+    def close(self, generation: Optional[int] = None):
+        """Close the ring; with a generation, only if no reopen() happened since"""
+        with self._cond:
+            if generation is not None and generation != self.generation:
+                return
+            self.closed = True
+            self._cond.notify_all()
+
+    def reopen(self) -> int:
+        """Open the ring for a new producer; returns its generation"""
+        with self._cond:
+            self.closed = False
+            self.generation += 1
+            return self.generation
+
+    def latest(self) -> Optional[Frame]:
+        return self._slots[self.seq % self.size] if self.seq else None
+
+    def wait(self, after: int, timeout: Optional[float] = None, every: bool = False) -> Optional[Frame]:
+        """
+        Next frame with seq > after: the newest one, or with every=True the
+        oldest one still in the ring. None on timeout or when closed.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after or self.closed, timeout):
+                return None
+            if self.seq <= after:
+                return None
+            if every:
+                seq = max(after + 1, self.seq - self.size + 1)
+                return self._slots[seq % self.size]
+            return self._slots[self.seq % self.size]
+
+
+class Subscription:
+    """A consumer's position in one camera's ring"""
+
+    def __init__(self, source: 'CameraSource', every: bool = False):
+        self.source = source
+        self.every = every
+        self.last_seq = source.ring.seq
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+
+    def get(self, timeout: Optional[float] = 1.0) -> Optional[Frame]:
+        """Next frame (see FrameRing.wait), or None on timeout / when the camera stopped"""
+        frame = self.source.ring.wait(self.last_seq, timeout, self.every)
+        if frame is not None:
+            self.dropped += frame.seq - self.last_seq - 1
+            self.last_seq = frame.seq
+            self.received += 1
+        return frame
+
+    def __iter__(self):
+        """Frames until the camera stops or the subscription is closed"""
+        while not self.closed:
+            frame = self.get(timeout=1.0)
+            if frame is None:
+                if self.source.ring.closed and not self.source.running:
+                    return
+                continue
+            yield frame
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.source.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class CameraSource:
+    """One camera: a single ffmpeg process feeding a FrameRing"""
+
+    def __init__(self, device: str, video_size: str = VIDEO_SIZE, framerate: int = FRAMERATE,
+                 ring_size: int = RING_SIZE, idle_timeout: float = IDLE_TIMEOUT, passthrough: bool = True):
+        self.device = device
+        self.video_size = video_size
+        self.framerate = framerate
+        self.passthrough = passthrough
+        self.idle_timeout = idle_timeout
+        self.ring = FrameRing(ring_size)
+        self.process: Optional[subprocess.Popen] = None
+        self._generation = 0            # ring generation of the current process
+        self.frames = 0
+        self.bytes = 0
+        self.starts = 0
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+        self._idle_timer: Optional[threading.Timer] = None
+
+    def ffmpeg_command(self) -> List[str]:
+        compressed = True   # the source already delivers JPEG frames
+        if self.device.startswith(TEST_PATTERN):
+            source = ['-re', '-f', 'lavfi', '-i', f'{self.device}=size={self.video_size}:rate={self.framerate}']
+            compressed = False
+        elif self.device.endswith(MJPEG_FILES):
+            source = ['-re', '-stream_loop', '-1', '-f', 'mjpeg', '-framerate', str(self.framerate),
+                      '-i', self.device]
+        else:
+            # Small probe size / analyzeduration for camera 2 compatibility
+            source = ['-f', 'v4l2', '-input_format', 'mjpeg', '-video_size', self.video_size,
+                      '-framerate', str(self.framerate), '-probesize', '32', '-analyzeduration', '0',
+                      '-i', self.device]
+        if compressed and self.passthrough:
+            # Forward the camera's own JPEGs: no decode, no re-encode
+            codec = ['-c:v', 'copy']
+        else:
+            codec = ['-q:v', '3']
+        return (['ffmpeg', '-hide_banner', '-loglevel', 'error', '-fflags', 'nobuffer', '-flags', 'low_delay']
+                + source + ['-f', 'mjpeg'] + codec + ['-an', '-'])
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._generation = self.ring.reopen()
+            self.process = subprocess.Popen(self.ffmpeg_command(), stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL, bufsize=0)
+            self.starts += 1
+            self._reader = threading.Thread(target=self._read_loop, args=(self.process, self._generation),
+                                            name=f'capture {self.device}', daemon=True)
+            self._reader.start()
+
+    def _read_loop(self, process: subprocess.Popen, generation: int):
+        splitter = JpegSplitter()
+        stdout = process.stdout
+        try:
+            while True:
+                chunk = stdout.read(READ_SIZE)
+                if not chunk:
+                    break
+                for jpeg in splitter.feed(chunk):
+                    self.ring.put(jpeg)
+                    self.frames += 1
+                    self.bytes += len(jpeg)
+        finally:
+            # A restart may already have reopened the ring for a new process
+            self.ring.close(generation)
+
+    def _detach(self):
+        """Take the process out of the source; caller holds _lock"""
+        process, self.process = self.process, None
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        return process, self._generation
+
+    def _terminate(self, process: Optional[subprocess.Popen], generation: int):
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.ring.close(generation)
+
+    def stop(self):
+        with self._lock:
+            process, generation = self._detach()
+        self._terminate(process, generation)
+
+    def subscribe(self, every: bool = False) -> Subscription:
+        """Attach a consumer (starts the camera if needed)"""
+        sub = Subscription(self, every)
+        with self._lock:
+            # Registered before starting, so a pending idle stop sees a subscriber
+            self._subscribers.append(sub)
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+        self.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+            if not self._subscribers and self.idle_timeout is not None and self._idle_timer is None:
+                self._idle_timer = threading.Timer(self.idle_timeout, self._stop_if_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    def _stop_if_idle(self):
+        # Idle check and detach in one lock hold: a subscribe() in between
+        # either keeps the camera running or starts a fresh process
+        with self._lock:
+            self._idle_timer = None
+            if self._subscribers:
+                return
+            process, generation = self._detach()
+        self._terminate(process, generation)
+
+    def cpu_seconds(self) -> Optional[float]:
+        """User + system CPU used by this camera's ffmpeg so far (Linux /proc)"""
+        process = self.process
+        if process is None:
+            return None
+        try:
+            with open(f'/proc/{process.pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        except (OSError, ValueError, IndexError):
+            return None
+
+
+class CaptureService:
+    """All cameras of this process, opened on first use"""
+
+    def __init__(self, **source_options):
+        self.source_options = source_options
+        self.sources: Dict[str, CameraSource] = {}
+        self._lock = threading.Lock()
+
+    def source(self, device: str) -> CameraSource:
+        with self._lock:
+            source = self.sources.get(device)
+            if source is None:
+                source = self.sources[device] = CameraSource(device, **self.source_options)
+            return source
+
+    def subscribe(self, device: str, every: bool = False) -> Subscription:
+        return self.source(device).subscribe(every)
+
+    def stop(self):
+        for source in list(self.sources.values()):
+            source.stop()
+
+
+SERVICE = CaptureService()
+
+
+def mjpeg_part(jpeg: bytes, boundary: str = 'jpgboundary') -> bytes:
+    """One multipart/x-mixed-replace part for an MJPEG HTTP stream"""
+    return (b'--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+            % (boundary.encode(), len(jpeg))) + jpeg + b'\r\n'
+
+
+def record(device: str, path: str, duration: float, service: CaptureService = SERVICE) -> int:
+    """Write every frame for duration seconds to an .mjpeg file; returns the frame count"""
+    written = 0
+    deadline = time.monotonic() + duration
+    with service.subscribe(device, every=True) as sub, open(path, 'wb') as f:
+        while time.monotonic() < deadline:
+            frame = sub.get(timeout=1.0)
+            if frame is not None:
+                f.write(frame.jpeg)
+                written += 1
+        print(f"  [OK] {written} frames to {path} ({sub.dropped} dropped)")
+    return written
+
+
+def benchmark(device: str, consumer_counts: List[int], duration: float, passthrough: bool = True) -> List[dict]:
+    """Capture CPU and delivered frames with N consumers attached"""
+    results = []
+    for count in consumer_counts:
+        service = CaptureService(idle_timeout=None, passthrough=passthrough)
+        source = service.source(device)
+        subs = [source.subscribe() for _ in range(count)]
+        stop = threading.Event()
+
+        def consume(sub):
+            while not stop.is_set():
+                sub.get(timeout=0.5)
+
+        threads = [threading.Thread(target=consume, args=(s,), daemon=True) for s in subs]
+        for t in threads:
+            t.start()
+        time.sleep(1.0)   # let ffmpeg settle
+        cpu0, py0, frames0, t0 = source.cpu_seconds(), time.process_time(), source.frames, time.monotonic()
+        received0 = [s.received for s in subs]
+        time.sleep(duration)
+        cpu1, py1, frames1, t1 = source.cpu_seconds(), time.process_time(), source.frames, time.monotonic()
+        received = [s.received - r for s, r in zip(subs, received0)]
+        stop.set()
+        for t in threads:
+            t.join()
+        service.stop()
+
+        elapsed = t1 - t0
+        results.append({
+            'consumers': count,
+            'mode': 'passthrough' if passthrough else 'transcode',
+            'capture_fps': (frames1 - frames0) / elapsed,
+            'ffmpeg_cpu': (cpu1 - cpu0) / elapsed if cpu0 is not None and cpu1 is not None else None,
+            'python_cpu': (py1 - py0) / elapsed,
+            'consumer_fps': sum(received) / len(received) / elapsed if received else 0.0,
+        })
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Shared camera capture service')
+    parser.add_argument('--device', default=CAMERAS['camera1'],
+                       help='Camera device, or an .mjpeg recording to replay (default: /dev/video0)')
+    parser.add_argument('--test-pattern', action='store_true',
+                       help="Use ffmpeg's generated test video instead of a camera")
+    parser.add_argument('--benchmark', action='store_true', help='Measure capture CPU vs number of consumers')
+    parser.add_argument('--consumers', type=int, nargs='+', default=[1, 4, 16],
+                       help='Consumer counts to benchmark (default: 1 4 16)')
+    parser.add_argument('--record', metavar='PATH', help='Record the camera to an .mjpeg file')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run (default: 5)')
+    parser.add_argument('--transcode', action='store_true',
+                       help='Decode and re-encode the camera MJPEG instead of passing it through')
+    parser.add_argument('--compare-transcode', action='store_true',
+                       help='Benchmark passthrough and transcode one after the other')
+    args = parser.parse_args()
+    device = TEST_PATTERN if args.test_pattern else args.device
+    SERVICE.source_options['passthrough'] = not args.transcode
+
+    print("=" * 70)
+    print(f"CAMERA CAPTURE SERVICE: {device}")
+    print("=" * 70)
+    print()
+
+    try:
+        if args.record:
+            record(device, args.record, args.duration)
+        elif args.benchmark:
+            modes = [True, False] if args.compare_transcode else [not args.transcode]
+            print(f"  {'mode':<12} {'consumers':>9} {'capture fps':>12} {'ffmpeg CPU':>11} "
+                  f"{'python CPU':>11} {'fps/consumer':>13}")
+            for passthrough in modes:
+                for r in benchmark(device, args.consumers, args.duration, passthrough):
+                    ffmpeg_cpu = f"{r['ffmpeg_cpu'] * 100:.1f}%" if r['ffmpeg_cpu'] is not None else 'n/a'
+                    print(f"  {r['mode']:<12} {r['consumers']:>9} {r['capture_fps']:>12.1f} {ffmpeg_cpu:>11} "
+                          f"{r['python_cpu'] * 100:>10.1f}% {r['consumer_fps']:>13.1f}")
+        else:
+            parser.print_help()
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+    finally:
+        SERVICE.stop()
+
+
+if __name__ == '__main__':
+    main()
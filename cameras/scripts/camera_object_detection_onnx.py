@@ -5,29 +5,15 @@ Uses a lightweight ONNX model for object detection
 Downloads Tiny YOLO ONNX model if not present
 """
 
-import cv2
-import numpy as np
 import onnxruntime as ort
 import time
 from datetime import datetime
 import os
 import urllib.request
 
-# COCO class names (80 objects)
-COCO_CLASSES = [
-    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck',
-    'boat', 'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench',
-    'bird', 'cat', 'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra',
-    'giraffe', 'backpack', 'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee',
-    'skis', 'snowboard', 'sports ball', 'kite', 'baseball bat', 'baseball glove',
-    'skateboard', 'surfboard', 'tennis racket', 'bottle', 'wine glass', 'cup',
-    'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich', 'orange',
-    'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
-    'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse',
-    'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink',
-    'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
-    'toothbrush'
-]
+from motion_gate import MotionGate, MotionGatedDetector
+from synced_capture import SyncedCapture
+from yolo_detector import YoloDetector
 
 MODEL_PATH = os.path.expanduser("~/yolov8n.onnx")
 MODEL_URL = "https://github.com/ultralytics/assets/releases/download/v8.2.0/yolov8n.onnx"
@@ -69,19 +55,11 @@ if use_onnx and os.path.exists(MODEL_PATH):
         input_size = (input_shape[3], input_shape[2])  # (width, height)
         print(f"  Input size: {input_size}")
         
-        def detect_objects_onnx(frame):
-            # Preprocess
-            img_resized = cv2.resize(frame, input_size)
-            img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
-            img_normalized = img_rgb.astype(np.float32) / 255.0
-            img_transposed = np.transpose(img_normalized, (2, 0, 1))
-            img_batch = np.expand_dims(img_transposed, axis=0)
-            
-            # Run inference
-            outputs = session.run(output_names, {input_name: img_batch})
-            return outputs[0]  # Return predictions
+        detector = YoloDetector(session, conf_threshold=0.5)
         
-        detect_fn = detect_objects_onnx
+        # The model only runs on cameras whose frame changed (motion_gate.py)
+        gated_detector = MotionGatedDetector(detector)
+        detect_fn = gated_detector.detect
         detection_mode = "ONNX"
         
     except Exception as e:
@@ -93,26 +71,8 @@ if not use_onnx:
     print("Using simple motion detection (no model required)...")
     detection_mode = "Motion"
     
-    # Store previous frames for motion detection
-    prev_frame1 = None
-    prev_frame2 = None
-    
-    def detect_motion(frame, prev):
-        if prev is None:
-            return []
-        
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        prev_gray = cv2.cvtColor(prev, cv2.COLOR_BGR2GRAY)
-        
-        diff = cv2.absdiff(gray, prev_gray)
-        _, thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)
-        
-        # Count motion pixels
-        motion_ratio = np.sum(thresh > 0) / thresh.size
-        
-        if motion_ratio > 0.01:  # More than 1% motion
-            return [("motion detected", motion_ratio)]
-        return []
+    # Same downscaled frame differencing that gates the model, without the model
+    motion_gate = MotionGate(max_interval=float('inf'))
     
     detect_fn = None  # Will use motion detection separately
 
@@ -121,16 +81,11 @@ print(f"Starting object detection using: {detection_mode}")
 print("Press Ctrl+C to stop")
 print("="*60 + "\n")
 
-# Open cameras
-cap1 = cv2.VideoCapture(CAMERA1)
-cap2 = cv2.VideoCapture(CAMERA2)
+# Open cameras: grabbed back to back, then decoded (synced_capture.py)
+capture = SyncedCapture({"Camera 1": CAMERA1, "Camera 2": CAMERA2}, width=640, height=480)
 
-# Set camera properties
-for cap, name in [(cap1, "Camera 1"), (cap2, "Camera 2")]:
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    
-    if not cap.isOpened():
+for name, ok in capture.opened().items():
+    if not ok:
         print(f"⚠ Warning: {name} could not be opened")
     else:
         print(f"✓ {name} opened successfully")
@@ -146,47 +101,30 @@ try:
         frame_count += 1
         current_time = time.time()
         
-        ret1, frame1 = cap1.read()
-        ret2, frame2 = cap2.read()
+        synced = capture.read()
+        frames = {name: f.image for name, f in synced.frames.items() if f is not None}
         
-        if not ret1 and not ret2:
+        if not frames:
             time.sleep(0.1)
             continue
         
         detections = {}
         
         if detection_mode == "ONNX" and detect_fn:
-            # Process Camera 1
-            if ret1:
-                try:
-                    outputs = detect_fn(frame1)
-                    # Parse YOLO outputs (simplified - would need proper post-processing)
-                    # For now, just report detection occurred
-                    detections["Camera 1"] = [("objects detected", 0.5)]
-                except:
-                    pass
-            
-            # Process Camera 2
-            if ret2:
-                try:
-                    outputs = detect_fn(frame2)
-                    detections["Camera 2"] = [("objects detected", 0.5)]
-                except:
-                    pass
+            # Cameras that moved in one session.run (yolo_detector.py); static ones keep their last detections
+            try:
+                for camera_name, objects in detect_fn(frames).items():
+                    if objects:
+                        detections[camera_name] = [(d.class_name, d.confidence) for d in objects]
+            except:
+                pass
         
         elif detection_mode == "Motion":
             # Motion detection
-            if ret1:
-                motion = detect_motion(frame1, prev_frame1)
-                if motion:
-                    detections["Camera 1"] = motion
-                prev_frame1 = frame1.copy()
-            
-            if ret2:
-                motion = detect_motion(frame2, prev_frame2)
-                if motion:
-                    detections["Camera 2"] = motion
-                prev_frame2 = frame2.copy()
+            for camera_name, frame in frames.items():
+                decision = motion_gate.check(camera_name, frame)
+                if decision.reason == "motion":
+                    detections[camera_name] = [("motion detected", decision.motion)]
         
         # Print detections
         if current_time - last_print_time >= print_interval:
@@ -202,6 +140,10 @@ try:
             else:
                 print("No detections")
             
+            if detection_mode == "ONNX":
+                print(f"Model ran on {gated_detector.runs}/{gated_detector.frames} camera frames")
+            if synced.skew is not None:
+                print(f"Camera skew: {synced.skew * 1000:.1f} ms (p95 {capture.stats()['skew_p95'] * 1000:.1f} ms)")
             print("-" * 60)
             last_print_time = current_time
         
@@ -210,7 +152,6 @@ try:
 except KeyboardInterrupt:
     print("\n\nStopping detection...")
 finally:
-    cap1.release()
-    cap2.release()
+    capture.release()
     print("✓ Done!")
 
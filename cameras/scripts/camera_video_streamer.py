@@ -10,6 +10,8 @@ from http.server import BaseHTTPRequestHandler
 import threading
 import sys
 
+from camera_capture_service import SERVICE
+
 class VideoStreamHandler(BaseHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/camera1':
@@ -28,14 +30,13 @@ class VideoStreamHandler(BaseHTTPRequestHandler):
         self.send_header('Pragma', 'no-cache')
         self.end_headers()
         
-        # Use ffmpeg to stream H.264 video
+        # The camera is captured once (shared); each client gets its own
+        # H.264 encoder fed with the captured JPEGs on stdin
         ffmpeg = subprocess.Popen(
             ['ffmpeg',
-             '-f', 'v4l2',
-             '-input_format', 'mjpeg',
-             '-video_size', '1280x720',
+             '-f', 'mjpeg',
              '-framerate', '30',
-             '-i', device,
+             '-i', '-',
              '-c:v', 'libx264',
              '-preset', 'ultrafast',
              '-tune', 'zerolatency',
@@ -43,10 +44,26 @@ class VideoStreamHandler(BaseHTTPRequestHandler):
              '-f', 'mp4',
              '-movflags', 'frag_keyframe+empty_moov',
              '-'],
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.DEVNULL,
-            bufsize=10**8
+            bufsize=0
         )
+        sub = SERVICE.subscribe(device)
+        
+        def feed():
+            try:
+                for frame in sub:
+                    ffmpeg.stdin.write(frame.jpeg)
+            except (BrokenPipeError, ValueError):
+                pass
+            finally:
+                try:
+                    ffmpeg.stdin.close()
+                except (BrokenPipeError, OSError):
+                    pass
+        
+        threading.Thread(target=feed, daemon=True).start()
         
         try:
             while True:
@@ -57,6 +74,7 @@ class VideoStreamHandler(BaseHTTPRequestHandler):
         except (ConnectionResetError, BrokenPipeError):
             pass
         finally:
+            sub.close()
             ffmpeg.terminate()
             ffmpeg.wait()
     
@@ -65,7 +83,9 @@ class VideoStreamHandler(BaseHTTPRequestHandler):
 
 def run_server(port=8080):
     """Run the video streaming server"""
-    class TCPServer(socketserver.TCPServer):
+    # A thread per client: each stream holds its connection for as long as it is watched
+    class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+        daemon_threads = True
         allow_reuse_address = True
     
     with TCPServer(("", port), VideoStreamHandler) as httpd:
@@ -10,32 +10,37 @@ import numpy as np
 from threading import Thread
 import sys
 
+from jpeg_splitter import JpegSplitter
+
 class CameraViewer:
     def __init__(self, camera1_url, camera2_url):
         self.camera1_url = camera1_url
         self.camera2_url = camera2_url
         self.running = True
+        self.streams = {}   # url -> (chunk iterator, splitter, decoded frames not yet shown)
         
     def get_frame(self, url):
-        """Get single frame from MJPEG stream"""
+        """Get the next frame from the MJPEG stream (the connection stays open between calls)"""
         try:
-            response = requests.get(url, stream=True, timeout=2)
-            if response.status_code == 200:
-                bytes_data = bytes()
-                for chunk in response.iter_content(chunk_size=1024):
-                    bytes_data += chunk
-                    # Look for JPEG marker
-                    a = bytes_data.find(b'\xff\xd8')
-                    b = bytes_data.find(b'\xff\xd9')
-                    if a != -1 and b != -1:
-                        jpg = bytes_data[a:b+2]
-                        bytes_data = bytes_data[b+2:]
-                        img = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
-                        if img is not None:
-                            return img
-            return None
+            if url not in self.streams:
+                response = requests.get(url, stream=True, timeout=2)
+                if response.status_code != 200:
+                    return None
+                self.streams[url] = (response.iter_content(chunk_size=65536), JpegSplitter(), [])
+            chunks, splitter, pending = self.streams[url]
+            while not pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    del self.streams[url]
+                    return None
+                pending.extend(splitter.feed(chunk))
+            # Show the newest complete frame, skip any older ones
+            jpg = pending[-1]
+            pending.clear()
+            return cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
         except Exception as e:
             print(f"Error getting frame: {e}")
+            self.streams.pop(url, None)
             return None
     
     def stream_camera(self, url, window_name):
@@ -10,21 +10,19 @@ import sys
 import os
 from pathlib import Path
 
+from jpeg_splitter import JpegSplitter
+
 def download_frame(url, output_file, timeout=3):
     """Download a single frame from MJPEG stream"""
     try:
         response = requests.get(url, stream=True, timeout=timeout)
         if response.status_code == 200:
-            bytes_data = bytes()
-            for chunk in response.iter_content(chunk_size=8192):
-                bytes_data += chunk
-                # Look for JPEG boundaries
-                start = bytes_data.find(b'\xff\xd8')
-                end = bytes_data.find(b'\xff\xd9')
-                if start != -1 and end != -1:
-                    jpg = bytes_data[start:end+2]
+            splitter = JpegSplitter()
+            for chunk in response.iter_content(chunk_size=65536):
+                frames = splitter.feed(chunk)
+                if frames:
                     with open(output_file, 'wb') as f:
-                        f.write(jpg)
+                        f.write(frames[0])
                     return True
         return False
     except Exception as e:
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Pipelined multi-camera YOLO detection
+The detector scripts ran capture, preprocessing, inference and
+postprocessing one after the other, so each stage waited on all the others,
+and cv2.VideoCapture's internal queue left results seconds behind the
+cameras. Here every stage has its own thread:
+
+  capture (one per camera)  subscribes to the shared capture service
+                            (camera_capture_service.py) and keeps only the
+                            newest JPEG per camera
+  preprocess                while inference runs, decodes the next fresh
+                            frame(s) and letterboxes them into the next
+                            input batch (yolo_preprocess.py)
+  infer                     one session.run per batch (yolo_detector.py)
+  publish                   postprocess (yolo_postprocess.py), latency, callback
+
+Stages are connected by bounded handoffs that drop the oldest item instead
+of blocking, so a slow stage always works on the newest data and old frames
+are discarded rather than queued. Preprocessing overlaps inference: as soon
+as inference takes a batch, the next one is built into another letterbox
+tensor, timed to be ready about when the run ends, so it is fresh when
+taken. It holds only frames captured after it was started (whichever
+cameras delivered one, the camera whose turn it is first), so results don't
+wait for the slowest camera and never start from a frame that already sat
+pending for most of a frame interval. A batch that still waited longer than max_age (a stall) is dropped at
+take time instead of being run. Frames wait as JPEGs and are decoded only
+when taken, so replaced frames cost nothing. Letterbox tensors come from a
+fixed pool (one in inference, one waiting, one being filled); nothing is
+allocated per frame.
+
+With gate=MotionGate() the preprocess stage drops frames that did not
+change since the model last saw that camera (motion_gate.py), and
+optionally crops the rest to the region that moved; a camera's published
+result then keeps its earlier detections outside that region.
+
+stats() reports how busy each stage is, the mean fill of each handoff, how
+many frames were dropped as stale and where, and the capture-to-result
+latency (from the moment the camera's JPEG was complete to the moment its
+detections were published). Latency is also exported as the
+detection_latency_seconds histogram (tools/metrics.py, $METRICS_PORT).
+
+Usage:
+  python detection_pipeline.py                                   # print detections from both cameras
+  python detection_pipeline.py --test-pattern --benchmark        # pipeline vs serial loop, no camera needed
+  python detection_pipeline.py --motion-gate                     # model only on frames that changed (motion_gate.py)
+"""
+
+import collections
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import _paths  # ../../tools on sys.path for metrics
+from metrics import gauge, histogram, start_from_env
+
+from camera_capture_service import CAMERAS, SERVICE, TEST_PATTERN, CaptureService, Frame
+from motion_gate import MotionGate, Region, crop, merge_region
+from yolo_detector import YoloDetector, find_model
+from yolo_postprocess import Detection, postprocess
+from yolo_preprocess import Letterbox
+
+HANDOFF_SIZE = 1        # items waiting between two stages before the oldest is dropped
+BUFFERS = 3             # letterbox tensors: one being filled, one waiting, one in inference
+MAX_AGE = 0.5           # seconds a built batch may wait for inference before it is dropped
+TIMING_WEIGHT = 0.2     # smoothing of the stage times used to schedule preprocessing
+FRESH_WAIT = 0.05       # seconds a take waits for a camera whose turn it is (about 1.5 frames at 30 fps)
+LATENCY_SAMPLES = 1000  # recent latencies kept for stats()
+TEST_CAMERAS = {'camera1': TEST_PATTERN, 'camera2': TEST_PATTERN + '2'}   # lavfi testsrc / testsrc2
+
+LATENCY = histogram('detection_latency_seconds', 'Camera frame to published detections', ['camera'])
+STAGE_BUSY = gauge('detection_stage_busy_ratio', 'Fraction of time a pipeline stage is working', ['stage'])
+
+
+class Captured(NamedTuple):
+    camera: str
+    seq: int
+    timestamp: float            # time.monotonic() when the camera's JPEG was complete
+    frame: Frame                # the JPEG as captured
+    image: Optional[np.ndarray] = None      # decoded BGR, filled in by preprocess
+
+
+class Batch(NamedTuple):
+    built: float                # time.monotonic() when the batch was ready
+    frames: List[Captured]
+    letterbox: Letterbox        # holds the batch in letterbox.tensor[:len(frames)]
+    boxes: List[Tuple[float, Tuple[int, int]]]   # (scale, pad) per frame
+    regions: List[Optional[Region]]              # motion crop per frame (None = whole frame)
+
+
+class Inferred(NamedTuple):
+    frames: List[Captured]
+    boxes: List[Tuple[float, Tuple[int, int]]]
+    regions: List[Optional[Region]]
+    output: np.ndarray
+
+
+class DetectionResult(NamedTuple):
+    camera: str
+    seq: int
+    timestamp: float
+    detections: List[Detection]
+    latency: float              # seconds from camera frame to publish
+
+
+class Handoff:
+    """Bounded queue between two stages; put() on a full queue drops the oldest item instead of blocking"""
+
+    def __init__(self, size: int = HANDOFF_SIZE, on_drop: Optional[Callable] = None):
+        self.size = size
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.closed = False
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._start = self._changed = time.monotonic()
+        self._depth_seconds = 0.0
+
+    def _account(self):
+        now = time.monotonic()
+        self._depth_seconds += len(self._items) * (now - self._changed)
+        self._changed = now
+
+    def put(self, item):
+        dropped = None
+        with self._cond:
+            self._account()
+            if len(self._items) >= self.size:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+    def get(self, timeout: Optional[float] = None):
+        """Oldest item, or None on timeout / when closed"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout) or not self._items:
+                return None
+            self._account()
+            item = self._items.popleft()
+            self._cond.notify_all()     # wakes a producer in wait_taken()
+            return item
+
+    def wait_taken(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the queue is empty (the consumer took what was there)"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._items or self.closed, timeout)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def occupancy(self) -> float:
+        """Mean fill (0..1) since creation"""
+        with self._cond:
+            self._account()
+            elapsed = self._changed - self._start
+        return self._depth_seconds / elapsed / self.size if elapsed > 0 else 0.0
+
+
+class LatestFrames:
+    """Newest captured frame per camera; put() replaces a frame that was not taken yet"""
+
+    def __init__(self, cameras: int = 1):
+        self.cameras = cameras
+        self.replaced = collections.Counter()
+        self._last = set()      # cameras in the last take
+        self.closed = False
+        self._frames: Dict[str, Captured] = {}
+        self._cond = threading.Condition()
+
+    def put(self, captured: Captured):
+        with self._cond:
+            if captured.camera in self._frames:
+                self.replaced[captured.camera] += 1
+            self._frames[captured.camera] = captured
+            self._cond.notify()
+
+    def take(self, timeout: Optional[float] = None, since: float = 0.0) -> List[Captured]:
+        """
+        Pending frames captured at or after since (possibly none on timeout).
+        A camera that missed the last take is waited for first (up to
+        FRESH_WAIT), so cameras take turns; pending frames older than since
+        are dropped as replaced.
+        """
+        def fresh(skip=()):
+            return any(c.timestamp >= since and c.camera not in skip for c in self._frames.values())
+
+        with self._cond:
+            if len(self._last) < self.cameras:
+                self._cond.wait_for(lambda: fresh(self._last) or self.closed, min(FRESH_WAIT, timeout or FRESH_WAIT))
+            self._cond.wait_for(lambda: fresh() or self.closed, timeout)
+            frames = []
+            for captured in self._frames.values():
+                if captured.timestamp >= since:
+                    frames.append(captured)
+                else:
+                    self.replaced[captured.camera] += 1
+            self._frames.clear()
+            if frames:
+                self._last = {c.camera for c in frames}
+            return frames
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class DetectionPipeline:
+    """Capture -> preprocess -> infer -> publish, each stage on its own thread"""
+
+    def __init__(self, detector: YoloDetector, cameras: Dict[str, str] = CAMERAS,
+                 service: CaptureService = SERVICE,
+                 on_result: Optional[Callable[[List[DetectionResult]], None]] = None, buffers: int = BUFFERS,
+                 gate: Optional[MotionGate] = None, max_age: float = MAX_AGE):
+        self.detector = detector
+        self.gate = gate
+        self.max_age = max_age
+        self.cameras = dict(cameras)
+        self.service = service
+        self.on_result = on_result
+        self.latest: Dict[str, DetectionResult] = {}
+        self.published = 0
+        self.gated = 0          # frames the motion gate kept from the model
+        self.expired = 0        # batches older than max_age when inference took them
+        self.frames = LatestFrames(len(self.cameras))
+        self.to_infer = Handoff(on_drop=self._release)
+        self.to_publish = Handoff()
+        self._free: 'queue.Queue[Letterbox]' = queue.Queue()
+        for _ in range(buffers):
+            self._free.put(Letterbox(detector.input_size))
+        self.stages = ['preprocess', 'infer', 'publish']
+        self._busy = {stage: 0.0 for stage in self.stages}
+        self._infer_started = 0.0       # when the current (or last) inference run began
+        self._infer_time = 0.0          # smoothed seconds per inference run
+        self._preprocess_time = 0.0     # smoothed seconds to build a batch
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._subscriptions = []
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._start = time.monotonic()
+        for stage in self.stages:
+            STAGE_BUSY.labels(stage).set_function(lambda stage=stage: self.busy(stage))
+
+    # Stages
+
+    def _capture(self, camera: str, subscription):
+        for frame in subscription:
+            if not self._running:
+                break
+            self.frames.put(Captured(camera, frame.seq, frame.timestamp, frame))
+
+    def _preprocess(self):
+        while self._running:
+            # At most one batch ahead: wait until inference took the last one
+            if not self.to_infer.wait_taken(timeout=0.5):
+                continue
+            # ...then take frames late enough that the batch is ready about when that run ends
+            delay = self._infer_started + self._infer_time - self._preprocess_time - time.monotonic()
+            if delay > 0:
+                time.sleep(min(delay, self.max_age))
+            letterbox = self._free.get()
+            # Only frames from now on: a pending frame may be most of a frame interval old
+            frames = self.frames.take(timeout=0.5, since=time.monotonic())
+            if not frames:
+                self._free.put(letterbox)
+                continue
+            t0 = time.monotonic()
+            frames = [c._replace(image=c.frame.image()) for c in frames]
+            frames = [c for c in frames if c.image is not None]
+            regions = [None] * len(frames)
+            if self.gate is not None:
+                decisions = [self.gate.check(c.camera, c.image, t0) for c in frames]
+                self.gated += sum(not d.run for d in decisions)
+                frames = [c for c, d in zip(frames, decisions) if d.run]
+                regions = [d.region for d in decisions if d.run]
+            if not frames:
+                self._busy['preprocess'] += time.monotonic() - t0
+                self._free.put(letterbox)
+                continue
+            letterbox.ensure_batch(len(frames))
+            boxes = []
+            for i, (captured, region) in enumerate(zip(frames, regions)):
+                result = letterbox(crop(captured.image, region), i)
+                boxes.append((result.scale, result.pad))
+            built = time.monotonic()
+            self._busy['preprocess'] += built - t0
+            self._preprocess_time += TIMING_WEIGHT * (built - t0 - self._preprocess_time)
+            self.to_infer.put(Batch(built, frames, letterbox, boxes, regions))
+
+    def _infer(self):
+        while self._running:
+            batch = self.to_infer.get(timeout=0.5)
+            if batch is None:
+                continue
+            t0 = time.monotonic()
+            if t0 - batch.built > self.max_age:
+                # Waited through a stall; the next batch is built from newer frames
+                self.expired += 1
+                self._release(batch)
+                continue
+            self._infer_started = t0
+            output = self.detector.infer(batch.letterbox.tensor[:len(batch.frames)])
+            elapsed = time.monotonic() - t0
+            self._busy['infer'] += elapsed
+            self._infer_time += TIMING_WEIGHT * (elapsed - self._infer_time)
+            self._release(batch)
+            self.to_publish.put(Inferred(batch.frames, batch.boxes, batch.regions, output))
+
+    def _publish(self):
+        detector = self.detector
+        while self._running:
+            inferred = self.to_publish.get(timeout=0.5)
+            if inferred is None:
+                continue
+            t0 = time.monotonic()
+            detections = [postprocess(inferred.output[i], detector.conf_threshold, detector.iou_threshold,
+                                      scale, pad, orig_shape=crop(captured.image, region).shape)
+                          for i, (captured, (scale, pad), region)
+                          in enumerate(zip(inferred.frames, inferred.boxes, inferred.regions))]
+            now = time.monotonic()
+            self._busy['publish'] += now - t0
+            results = []
+            for captured, found, region in zip(inferred.frames, detections, inferred.regions):
+                if region is not None:
+                    previous = self.latest.get(captured.camera)
+                    found = merge_region(previous.detections if previous else [], found, region)
+                result = DetectionResult(captured.camera, captured.seq, captured.timestamp, found,
+                                         now - captured.timestamp)
+                LATENCY.labels(captured.camera).observe(result.latency)
+                self._latencies.append(result.latency)
+                self.latest[captured.camera] = result
+                results.append(result)
+            self.published += len(results)
+            if self.on_result is not None:
+                self.on_result(results)
+
+    def _release(self, batch: Batch):
+        self._free.put(batch.letterbox)
+
+    # Control
+
+    def _spawn(self, name: str, target, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def start(self) -> 'DetectionPipeline':
+        self._running = True
+        self._start = time.monotonic()
+        for camera, device in self.cameras.items():
+            subscription = self.service.subscribe(device)
+            self._subscriptions.append(subscription)
+            self._spawn(f'capture {camera}', self._capture, camera, subscription)
+        self._spawn('preprocess', self._preprocess)
+        self._spawn('infer', self._infer)
+        self._spawn('publish', self._publish)
+        return self
+
+    def stop(self):
+        self._running = False
+        for subscription in self._subscriptions:
+            subscription.close()
+        self.frames.close()
+        self.to_infer.close()
+        self.to_publish.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._subscriptions, self._threads = [], []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # Stats
+
+    def busy(self, stage: str) -> float:
+        """Fraction of the time since start() the stage spent working"""
+        elapsed = time.monotonic() - self._start
+        return self._busy[stage] / elapsed if elapsed > 0 else 0.0
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._start
+        latencies = sorted(self._latencies)
+        return {
+            'elapsed': elapsed,
+            'results_per_second': self.published / elapsed if elapsed > 0 else 0.0,
+            'busy': {stage: self.busy(stage) for stage in self.stages},
+            'handoff': {'infer': self.to_infer.occupancy(), 'publish': self.to_publish.occupancy()},
+            'stale': {
+                'capture': sum(s.dropped for s in self._subscriptions),   # ring frames the capture thread missed
+                'preprocess': sum(self.frames.replaced.values()),        # frames replaced before preprocess (never decoded)
+                'infer': self.to_infer.dropped,                          # batches replaced before inference
+                'expired': self.expired,                                 # batches too old when inference took them
+                'publish': self.to_publish.dropped,
+            },
+            'gated': self.gated,
+            'latency_p50': latencies[len(latencies) // 2] if latencies else float('nan'),
+            'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else float('nan'),
+        }
+
+
+def run_serial(detector: YoloDetector, cameras: Dict[str, str], service: CaptureService, seconds: float) -> dict:
+    """The old loop shape (grab, detect, postprocess, repeat) on the same capture service, for comparison"""
+    subscriptions = {camera: service.subscribe(device) for camera, device in cameras.items()}
+    latencies = []
+    try:
+        t0 = time.monotonic()
+        while time.monotonic() - t0 < seconds:
+            frames = [s.get(timeout=1.0) for s in subscriptions.values()]
+            frames = [f for f in frames if f is not None]
+            if not frames:
+                continue
+            detector.detect([f.image() for f in frames])
+            now = time.monotonic()
+            latencies.extend(now - f.timestamp for f in frames)
+        elapsed = time.monotonic() - t0
+    finally:
+        for s in subscriptions.values():
+            s.close()
+    latencies.sort()
+    return {'results_per_second': len(latencies) / elapsed,
+            'latency_p50': latencies[len(latencies) // 2] if latencies else float('nan'),
+            'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else float('nan')}
+
+
+def print_stats(stats: dict):
+    print(f"  Results: {stats['results_per_second']:.1f} frames/s   "
+          f"latency p50 {stats['latency_p50'] * 1e3:.0f} ms, p95 {stats['latency_p95'] * 1e3:.0f} ms")
+    print("  Stage busy: " + ", ".join(f"{stage} {ratio:.0%}" for stage, ratio in stats['busy'].items()))
+    print("  Handoff fill: " + ", ".join(f"{name} {fill:.0%}" for name, fill in stats['handoff'].items()))
+    print("  Stale dropped: " + ", ".join(f"{name} {n}" for name, n in stats['stale'].items()))
+    if stats['gated']:
+        print(f"  Motion gate: {stats['gated']} static frames skipped")
+
+
+def print_results(results: List[DetectionResult]):
+    for result in results:
+        names = collections.Counter(d.class_name for d in result.detections)
+        found = ", ".join(f"{name} x{n}" if n > 1 else name for name, n in sorted(names.items())) or "nothing"
+        print(f"  {result.camera}: {found} ({result.latency * 1e3:.0f} ms)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pipelined multi-camera YOLO detection')
+    parser.add_argument('--model', default=find_model(), help='ONNX model (default: first of MODEL_PATHS found)')
+    parser.add_argument('--test-pattern', action='store_true', help="Use ffmpeg's test video instead of cameras")
+    parser.add_argument('--conf', type=float, default=0.5, help='Confidence threshold (default: 0.5)')
+    parser.add_argument('--benchmark', action='store_true', help='Pipeline vs serial loop')
+    parser.add_argument('--motion-gate', action='store_true', help='Run the model only on frames that changed')
+    parser.add_argument('--crop', action='store_true', help='With --motion-gate, run on the motion region only')
+    parser.add_argument('--seconds', type=float, default=10.0, help='Seconds per benchmark run (default: 10)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("DETECTION PIPELINE")
+    print("=" * 70)
+    print()
+
+    if not args.model or not os.path.exists(args.model):
+        print("[ERROR] No model found; export one with: python export_yolo_model.py --dynamic")
+        sys.exit(1)
+
+    cameras = TEST_CAMERAS if args.test_pattern else CAMERAS
+    detector = YoloDetector(args.model, conf_threshold=args.conf)
+    print(f"  Model: {args.model}")
+    print(f"  Cameras: {', '.join(f'{name}={device}' for name, device in cameras.items())}")
+    print()
+
+    try:
+        if args.benchmark:
+            print(f"Serial loop ({args.seconds:.0f} s)...")
+            serial = run_serial(detector, cameras, SERVICE, args.seconds)
+            print(f"  Results: {serial['results_per_second']:.1f} frames/s   "
+                  f"latency p50 {serial['latency_p50'] * 1e3:.0f} ms, p95 {serial['latency_p95'] * 1e3:.0f} ms")
+            print(f"Pipeline ({args.seconds:.0f} s)...")
+            with DetectionPipeline(detector, cameras) as pipeline:
+                time.sleep(args.seconds)
+                stats = pipeline.stats()
+            print_stats(stats)
+            print()
+            speedup = stats['results_per_second'] / serial['results_per_second']
+            summary = (f"{speedup:.2f}x throughput, p50 latency {stats['latency_p50'] * 1e3:.0f} ms "
+                       f"vs {serial['latency_p50'] * 1e3:.0f} ms serial")
+            if speedup >= 1.0 and stats['latency_p50'] <= serial['latency_p50']:
+                print(f"  [OK] {summary}")
+            else:
+                print(f"  [WARNING] Pipeline regressed against the serial loop: {summary}")
+            return
+
+        start_from_env()
+        print("Press Ctrl+C to stop")
+        gate = MotionGate(crop=args.crop) if args.motion_gate else None
+        with DetectionPipeline(detector, cameras, gate=gate) as pipeline:
+            while True:
+                time.sleep(2.0)
+                print(f"\n[{time.strftime('%H:%M:%S')}]")
+                print_results([pipeline.latest[c] for c in pipeline.cameras if c in pipeline.latest])
+                print_stats(pipeline.stats())
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        SERVICE.stop()
+
+
+if __name__ == '__main__':
+    main()
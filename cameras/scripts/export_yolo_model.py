@@ -1,13 +1,41 @@
 #!/usr/bin/env python3
-"""Export YOLOv8 to ONNX format"""
-from ultralytics import YOLO
+"""
+Export YOLOv8 to ONNX format
+--dynamic exports with a dynamic batch dimension ([N, 3, 640, 640] ->
+[N, 84, 8400]) so yolo_detector.py can run every camera's frame in one
+session.run; the file is saved as yolov8n_dynamic.onnx next to yolov8n.onnx.
+
+Usage:
+  python export_yolo_model.py              # yolov8n.onnx, batch 1
+  python export_yolo_model.py --dynamic    # yolov8n_dynamic.onnx, any batch size
+"""
+import argparse
 import os
+import shutil
+
+from ultralytics import YOLO
+
+parser = argparse.ArgumentParser(description='Export YOLOv8 to ONNX')
+parser.add_argument('--weights', default='yolov8n.pt', help='PyTorch weights (default: yolov8n.pt)')
+parser.add_argument('--dynamic', action='store_true', help='Dynamic batch dimension')
+parser.add_argument('--imgsz', type=int, default=640, help='Input size (default: 640)')
+args = parser.parse_args()
 
-print("Loading YOLOv8n model...")
-model = YOLO("yolov8n.pt")
-print("Exporting to ONNX...")
-model.export(format="onnx", imgsz=640, simplify=True)
+print(f"Loading {args.weights}...")
+model = YOLO(args.weights)
+print("Exporting to ONNX" + (" (dynamic batch)..." if args.dynamic else "..."))
+path = model.export(format="onnx", imgsz=args.imgsz, simplify=True, dynamic=args.dynamic)
+if args.dynamic:
+    dynamic_path = path[:-len('.onnx')] + '_dynamic.onnx'
+    shutil.move(path, dynamic_path)
+    path = dynamic_path
 print("✓ Export complete!")
-print(f"Model saved to: yolov8n.onnx")
-print(f"Size: {os.path.getsize('yolov8n.onnx') / 1024 / 1024:.1f} MB")
+print(f"Model saved to: {path}")
+print(f"Size: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
 
+try:
+    import onnxruntime as ort
+    shape = ort.InferenceSession(path, providers=['CPUExecutionProvider']).get_inputs()[0].shape
+    print(f"Input shape: {shape}")
+except ImportError:
+    pass
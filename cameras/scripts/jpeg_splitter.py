@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Incremental JPEG frame splitter for MJPEG byte streams
+ffmpeg's `-f mjpeg` output and multipart HTTP streams are concatenated JPEGs
+(SOI ff d8 ... EOI ff d9). JpegSplitter takes chunks as they arrive and
+returns exactly the complete frames, each byte examined once:
+  - chunks are appended to one bytearray; consumed frames are removed from
+    its front (O(1) in CPython, no reallocation)
+  - a scan offset remembers how far the EOI search got, so a partial frame
+    is never rescanned when the next chunk arrives
+  - frames are cut with memoryview slices: one copy, straight into the
+    returned bytes object
+
+Markers inside the entropy-coded data are byte-stuffed (ff 00), so the first
+ff d9 after an SOI ends the frame; multipart headers between frames are
+skipped.
+
+Usage:
+  python jpeg_splitter.py --benchmark               # 1280x720@30-sized frames, vs the old splitter
+  python jpeg_splitter.py --file capture.mjpeg     # count the frames in a file
+"""
+
+import os
+import sys
+import time
+from typing import Iterator, List
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+
+READ_SIZE = 65536
+
+
+class JpegSplitter:
+    """feed() chunks, get back the complete JPEG frames they finish"""
+
+    def __init__(self, max_frame: int = 16 * 1024 * 1024):
+        self.buffer = bytearray()
+        self.max_frame = max_frame   # drop a frame whose EOI never comes
+        self.frames = 0
+        self._start = -1             # offset of the current frame's SOI, -1 if none yet
+        self._scan = 0               # where the next marker search starts
+
+    def feed(self, chunk) -> List[bytes]:
+        buffer = self.buffer
+        buffer += chunk
+        frames = []
+        start, scan = self._start, self._scan
+        while True:
+            if start < 0:
+                start = buffer.find(JPEG_SOI, scan)
+                if start < 0:
+                    # Keep a trailing ff: it may be the first half of an SOI
+                    scan = max(scan, len(buffer) - 1)
+                    break
+                scan = start + 2
+            end = buffer.find(JPEG_EOI, scan)
+            if end < 0:
+                scan = max(scan, len(buffer) - 1)
+                if len(buffer) - start > self.max_frame:
+                    start = -1
+                break
+            end += 2
+            with memoryview(buffer) as view:
+                frames.append(bytes(view[start:end]))
+            start, scan = -1, end
+
+        # Drop everything before the current frame (or before the scan point)
+        keep = start if start >= 0 else scan
+        if keep:
+            del buffer[:keep]
+            scan -= keep
+            if start >= 0:
+                start = 0
+        self._start, self._scan = start, scan
+        self.frames += len(frames)
+        return frames
+
+    def reset(self):
+        self.buffer = bytearray()
+        self._start, self._scan = -1, 0
+
+
+def iter_jpegs(stream, read_size: int = READ_SIZE) -> Iterator[bytes]:
+    """JPEG frames from a binary file object (pipe, socket file, open file) until EOF"""
+    splitter = JpegSplitter()
+    read = getattr(stream, 'read1', stream.read)
+    while True:
+        chunk = read(read_size)
+        if not chunk:
+            return
+        yield from splitter.feed(chunk)
+
+
+def _quadratic_split(chunks) -> int:
+    """The splitter simple_video_server.py used before (4 KB reads, full rescans)"""
+    frames = 0
+    frame_data = b''
+    jpeg_start = False
+    for chunk in chunks:
+        frame_data += chunk
+        if JPEG_SOI in frame_data:
+            jpeg_start = True
+            frame_data = frame_data[frame_data.index(JPEG_SOI):]
+        if jpeg_start and JPEG_EOI in frame_data:
+            idx = frame_data.index(JPEG_EOI)
+            frame_data = frame_data[idx + 2:]
+            frames += 1
+    return frames
+
+
+def synthetic_stream(frames: int, frame_size: int = 120000, seed: int = 0) -> bytes:
+    """Concatenated JPEG-shaped frames: SOI, stuffed random payload, EOI"""
+    import random
+    rng = random.Random(seed)
+    body = os.urandom(frame_size).replace(b'\xff', b'\xff\x00')
+    out = bytearray()
+    for _ in range(frames):
+        offset = rng.randrange(0, len(body) // 4)
+        out += JPEG_SOI + body[offset:offset + frame_size - 4] + JPEG_EOI
+    return bytes(out)
+
+
+def benchmark(seconds: int = 10, fps: int = 30, frame_size: int = 120000) -> dict:
+    """CPU to split `seconds` of fps-rate video, new splitter vs the old one"""
+    data = synthetic_stream(seconds * fps, frame_size)
+    results = {'frames': seconds * fps, 'video_seconds': seconds}
+    for name, chunk_size in (('splitter_64k', READ_SIZE), ('splitter_4k', 4096)):
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        splitter = JpegSplitter()
+        t0 = time.process_time()
+        count = sum(len(splitter.feed(c)) for c in chunks)
+        results[name] = (time.process_time() - t0, count)
+    chunks = [data[i:i + 4096] for i in range(0, len(data), 4096)]
+    t0 = time.process_time()
+    count = _quadratic_split(chunks)
+    results['old_4k'] = (time.process_time() - t0, count)
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Incremental JPEG splitter for MJPEG streams')
+    parser.add_argument('--benchmark', action='store_true', help='CPU per second of 1280x720@30 MJPEG')
+    parser.add_argument('--frame-size', type=int, default=120000,
+                       help='Synthetic frame size in bytes (default: 120000, ~1280x720 q:v 3)')
+    parser.add_argument('--file', help='Split an .mjpeg file and report the frames')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("JPEG SPLITTER")
+    print("=" * 70)
+    print()
+
+    if args.file:
+        with open(args.file, 'rb') as f:
+            sizes = [len(frame) for frame in iter_jpegs(f)]
+        if not sizes:
+            print("  [FAIL] No complete JPEG frames")
+            sys.exit(1)
+        print(f"  [OK] {len(sizes)} frames, {min(sizes)}-{max(sizes)} bytes "
+              f"(mean {sum(sizes) / len(sizes):.0f})")
+    elif args.benchmark:
+        r = benchmark(frame_size=args.frame_size)
+        video = r['video_seconds']
+        print(f"  {r['frames']} frames of {args.frame_size} bytes ({video} s at 30 fps)")
+        for name, label in (('splitter_64k', 'JpegSplitter, 64 KB reads'),
+                            ('splitter_4k', 'JpegSplitter, 4 KB reads'),
+                            ('old_4k', 'old splitter, 4 KB reads')):
+            cpu, count = r[name]
+            marker = "[OK]" if count == r['frames'] else "[FAIL]"
+            print(f"  {marker} {label:<28} {cpu / video * 100:6.2f}% of one core  ({count} frames)")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Asyncio MJPEG streaming server
+One event loop serves every client. Frames come from the shared capture
+service (one ffmpeg per camera); a bridge thread per camera hands each new
+frame to the loop, where the multipart part is built once and queued to
+every client of that camera. Each client has its own small send queue and
+writer coroutine: writes go through the non-blocking asyncio transport, and
+a client that can't keep up has its oldest queued frame replaced by the
+newest one, so it only ever slows itself down.
+
+A read task per client notices a disconnect even while no frames flow. If
+the camera's ffmpeg exits, the channel closes its clients (browsers
+reconnect) and drops the subscription, so the next client restarts the
+camera.
+
+Used by simple_video_server.py and camera_stream_server.py.
+
+Usage:
+  python mjpeg_async_server.py                                      # /stream1.mjpg, /stream2.mjpg on :8080
+  python mjpeg_async_server.py --test-pattern --load-test 200 --duration 10   # 200 local clients
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from camera_capture_service import CAMERAS, SERVICE, TEST_PATTERN, CaptureService, mjpeg_part
+
+BOUNDARY = 'jpgboundary'
+QUEUE_SIZE = 2            # frames queued per client before the oldest is dropped
+HEADER_TIMEOUT = 10.0     # seconds to receive the request headers
+
+DEFAULT_ROUTES = {'/stream1.mjpg': CAMERAS['camera1'], '/stream2.mjpg': CAMERAS['camera2']}
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Live Camera Streams</title>
+    <style>
+        body { margin: 0; background: #000; font-family: Arial; }
+        .container { display: flex; width: 100vw; height: 100vh; }
+        .camera { flex: 1; display: flex; flex-direction: column; border: 2px solid #333; }
+        .camera h2 { color: white; text-align: center; margin: 10px; }
+        .camera img { width: 100%; height: calc(100% - 50px); object-fit: contain; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="camera">
+            <h2>Camera 1</h2>
+            <img src="/stream1.mjpg" alt="Camera 1">
+        </div>
+        <div class="camera">
+            <h2>Camera 2</h2>
+            <img src="/stream2.mjpg" alt="Camera 2">
+        </div>
+    </div>
+</body>
+</html>"""
+
+
+class MJPEGClient:
+    """One connected stream client and its send queue"""
+
+    def __init__(self, peer, queue_size: int = QUEUE_SIZE):
+        self.peer = peer
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, part: Optional[bytes]):
+        """Queue a part without waiting; a full queue loses its oldest part"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(part)
+
+    def close(self):
+        """Make the writer coroutine return after what is already queued (None is the sentinel)"""
+        self.offer(None)
+
+
+class CameraChannel:
+    """Clients of one camera, fed from a capture subscription while any are connected"""
+
+    def __init__(self, device: str, service: CaptureService, boundary: str):
+        self.device = device
+        self.service = service
+        self.boundary = boundary
+        self.clients: Set[MJPEGClient] = set()
+        self.frames = 0
+        self._sub = None
+
+    def add(self, client: MJPEGClient):
+        self.clients.add(client)
+        if self._sub is None:
+            self._sub = self.service.subscribe(self.device)
+            loop = asyncio.get_running_loop()
+            threading.Thread(target=self._bridge, args=(self._sub, loop),
+                             name=f'mjpeg {self.device}', daemon=True).start()
+
+    def remove(self, client: MJPEGClient):
+        self.clients.discard(client)
+        if not self.clients and self._sub is not None:
+            self._sub.close()
+            self._sub = None
+
+    def _bridge(self, sub, loop: asyncio.AbstractEventLoop):
+        """Capture thread -> event loop; tells the loop when the camera stops"""
+        try:
+            for frame in sub:
+                loop.call_soon_threadsafe(self._publish, sub, frame.jpeg)
+            loop.call_soon_threadsafe(self._ended, sub)
+        except RuntimeError:   # loop closed
+            pass
+
+    def _ended(self, sub):
+        """Camera stopped (ffmpeg exited): close every client, resubscribe on the next one"""
+        if sub is not self._sub:
+            return      # closed by remove(), nothing is waiting on it
+        self._sub = None
+        sub.close()
+        for client in self.clients:
+            client.close()
+        self.clients.clear()
+
+    def _publish(self, sub, jpeg: bytes):
+        if sub is not self._sub:
+            return
+        part = mjpeg_part(jpeg, self.boundary)   # built once, shared by all clients
+        self.frames += 1
+        for client in self.clients:
+            client.offer(part)
+
+
+class MJPEGServer:
+    """HTTP server: routes map paths to camera devices, pages map paths to HTML"""
+
+    def __init__(self, routes: Optional[Dict[str, str]] = None, pages: Optional[Dict[str, str]] = None,
+                 service: CaptureService = SERVICE, boundary: str = BOUNDARY, queue_size: int = QUEUE_SIZE):
+        self.routes = DEFAULT_ROUTES if routes is None else routes
+        self.pages = {'/': INDEX_HTML} if pages is None else pages
+        self.service = service
+        self.boundary = boundary
+        self.queue_size = queue_size
+        self.channels: Dict[str, CameraChannel] = {}
+
+    def channel(self, device: str) -> CameraChannel:
+        if device not in self.channels:
+            self.channels[device] = CameraChannel(device, self.service, self.boundary)
+        return self.channels[device]
+
+    @property
+    def clients(self) -> int:
+        return sum(len(c.clients) for c in self.channels.values())
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), HEADER_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            parts = request.split(b'\r\n', 1)[0].decode('latin-1').split()
+            method, path = (parts[0], parts[1].split('?', 1)[0]) if len(parts) >= 2 else ('', '')
+
+            if method != 'GET':
+                await self._respond(writer, '405 Method Not Allowed', 'text/plain', b'')
+            elif path in self.routes:
+                await self._stream(reader, writer, self.routes[path])
+            elif path in self.pages:
+                await self._respond(writer, '200 OK', 'text/html', self.pages[path].encode())
+            else:
+                await self._respond(writer, '404 Not Found', 'text/plain', b'')
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes):
+        writer.write((f'HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n'
+                      f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n').encode() + body)
+        await writer.drain()
+
+    async def _stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, device: str):
+        writer.write((f'HTTP/1.0 200 OK\r\n'
+                      f'Content-Type: multipart/x-mixed-replace; boundary={self.boundary}\r\n'
+                      f'Cache-Control: no-cache\r\nPragma: no-cache\r\nConnection: close\r\n\r\n').encode())
+        client = MJPEGClient(writer.get_extra_info('peername'), self.queue_size)
+        channel = self.channel(device)
+        channel.add(client)
+        watcher = asyncio.ensure_future(self._watch(reader, client))
+        try:
+            while True:
+                part = await client.queue.get()
+                if part is None:
+                    break
+                writer.write(part)
+                await writer.drain()
+                client.sent += 1
+        finally:
+            watcher.cancel()
+            channel.remove(client)
+
+    @staticmethod
+    async def _watch(reader: asyncio.StreamReader, client: MJPEGClient):
+        """Close the client when the peer disconnects (stream clients send nothing after the request)"""
+        try:
+            while await reader.read(4096):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        client.close()
+
+    async def serve(self, host: str = '0.0.0.0', port: int = 8080):
+        server = await asyncio.start_server(self.handle, host, port, reuse_address=True, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+    def run(self, host: str = '0.0.0.0', port: int = 8080):
+        """Serve until Ctrl+C"""
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            print("\nStopping server...", flush=True)
+        finally:
+            self.service.stop()
+
+
+async def _load_client(port: int, path: str, boundary: bytes, deadline: float, counts: list, index: int):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.0\r\n\r\n'.encode())
+    await writer.drain()
+    marker = b'--' + boundary
+    tail = b''
+    try:
+        while time.monotonic() < deadline:
+            chunk = await asyncio.wait_for(reader.read(65536), max(0.01, deadline - time.monotonic()))
+            if not chunk:
+                break
+            data = tail + chunk
+            counts[index] += data.count(marker)
+            tail = data[-len(marker) + 1:]
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        writer.close()
+
+
+async def load_test(server: MJPEGServer, port: int, clients: int, duration: float, path: str):
+    """Start the server and N local clients on one loop; (frames per client, camera frames)"""
+    task = asyncio.ensure_future(server.serve('127.0.0.1', port))
+    await asyncio.sleep(0.2)
+    counts = [0] * clients
+    # Let the first client start the camera before measuring
+    await _load_client(port, path, server.boundary.encode(), time.monotonic() + 1.0, [0], 0)
+    channel = server.channel(server.routes[path])
+    frames0 = channel.frames
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(_load_client(port, path, server.boundary.encode(), deadline, counts, i)
+                           for i in range(clients)), return_exceptions=True)
+    camera_frames = channel.frames - frames0
+    await asyncio.sleep(0.5)   # let the handlers see their clients go
+    task.cancel()
+    return counts, camera_frames
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Asyncio MJPEG streaming server')
+    parser.add_argument('--port', type=int, default=8080, help='HTTP port (default: 8080)')
+    parser.add_argument('--test-pattern', action='store_true',
+                       help="Serve ffmpeg's generated test video on /stream1.mjpg")
+    parser.add_argument('--load-test', type=int, metavar='N', help='Run N local clients instead of serving')
+    parser.add_argument('--duration', type=float, default=5.0, help='Load test seconds (default: 5)')
+    args = parser.parse_args()
+
+    routes = dict(DEFAULT_ROUTES)
+    if args.test_pattern:
+        routes['/stream1.mjpg'] = TEST_PATTERN
+    server = MJPEGServer(routes)
+
+    print("=" * 70)
+    print("ASYNC MJPEG SERVER")
+    print("=" * 70)
+    print()
+
+    if args.load_test:
+        cpu0 = time.process_time()
+        counts, camera_frames = asyncio.run(load_test(server, args.port, args.load_test, args.duration, '/stream1.mjpg'))
+        cpu = (time.process_time() - cpu0) / (args.duration + 1.5)
+        SERVICE.stop()
+        fps = sorted(c / args.duration for c in counts)
+        capture = camera_frames / args.duration
+        print(f"  {len(counts)} clients: fps per client min {fps[0]:.1f}  median {fps[len(fps) // 2]:.1f}  "
+              f"max {fps[-1]:.1f}  (camera ~{capture:.1f} fps)")
+        print(f"  Python CPU (server + clients): {cpu * 100:.1f}%")
+        if fps[0] >= 0.9 * capture:
+            print("  [OK] Every client kept up with the camera")
+        else:
+            print("  [WARNING] Clients fell behind the camera (frames were dropped, capture unaffected)")
+        return
+
+    for path, device in routes.items():
+        print(f"  http://0.0.0.0:{args.port}{path} -> {device}")
+    print(f"  Index: http://0.0.0.0:{args.port}/")
+    print("Server ready, waiting for connections...", flush=True)
+    server.run('0.0.0.0', args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,91 +4,61 @@ Live MJPEG streaming server for USB cameras
 Streams both cameras simultaneously via HTTP
 """
 
-import subprocess
 import threading
 import socketserver
 from http import server
 import sys
 import signal
 
+import _paths  # ../../tools on sys.path for metrics
+from metrics import counter, gauge, start_from_env
+
+from camera_capture_service import SERVICE, mjpeg_part
+
+STREAM_BYTES = counter('camera_stream_bytes_total', 'MJPEG bytes sent to clients', ['camera'])
+STREAM_CLIENTS = gauge('camera_stream_clients', 'Connected stream clients', ['camera'])
+
 PORT1 = 8080
 PORT2 = 8081
 
-class StreamingHandler(server.BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/stream.mjpg':
-            self.send_response(200)
-            self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=--jpgboundary')
-            self.end_headers()
-            try:
-                while True:
-                    # Read frame from stdin (piped from ffmpeg)
-                    frame_data = sys.stdin.buffer.read(10240)  # Read in chunks
-                    if not frame_data:
-                        break
-                    self.wfile.write(b'--jpgboundary\r\n')
-                    self.send_header('Content-Type', 'image/jpeg')
-                    self.send_header('Content-Length', str(len(frame_data)))
-                    self.end_headers()
-                    self.wfile.write(frame_data)
-                    self.wfile.write(b'\r\n')
-            except Exception as e:
-                print(f"Stream error: {e}")
-        else:
-            self.send_error(404)
-
 def stream_camera(device, port, camera_name):
     """Stream camera using ffmpeg and Python HTTP server"""
     print(f"Starting {camera_name} stream on port {port}...")
     
-    # FFmpeg command to capture and output MJPEG
-    ffmpeg_cmd = [
-        'ffmpeg',
-        '-f', 'v4l2',
-        '-input_format', 'mjpeg',
-        '-video_size', '1280x720',
-        '-framerate', '30',
-        '-i', device,
-        '-f', 'mjpeg',
-        '-q:v', '3',
-        '-'  # Output to stdout
-    ]
+    sent_bytes = STREAM_BYTES.labels(camera_name)
+    clients = STREAM_CLIENTS.labels(camera_name)
     
     try:
-        # Start ffmpeg
-        ffmpeg_process = subprocess.Popen(
-            ffmpeg_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL
-        )
-        
-        # Create HTTP server that reads from ffmpeg stdout
+        # Clients subscribe to the shared capture: one ffmpeg for the camera,
+        # whole JPEG frames per part, slow clients skip to the newest frame
         class FrameStreamHandler(server.BaseHTTPRequestHandler):
             def do_GET(self):
                 if self.path == '/stream.mjpg':
                     self.send_response(200)
-                    self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=--jpgboundary')
+                    self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=jpgboundary')
                     self.end_headers()
+                    clients.inc()
                     try:
-                        while True:
-                            frame = ffmpeg_process.stdout.read(8192)
-                            if not frame:
-                                break
-                            self.wfile.write(b'--jpgboundary\r\n')
-                            self.send_header('Content-Type', 'image/jpeg')
-                            self.send_header('Content-Length', str(len(frame)))
-                            self.end_headers()
-                            self.wfile.write(frame)
-                            self.wfile.write(b'\r\n')
-                    except:
+                        with SERVICE.subscribe(device) as sub:
+                            for frame in sub:
+                                self.wfile.write(mjpeg_part(frame.jpeg))
+                                sent_bytes.inc(len(frame.jpeg))
+                    except (ConnectionResetError, BrokenPipeError):
                         pass
+                    finally:
+                        clients.dec()
                 else:
                     self.send_error(404)
             
             def log_message(self, format, *args):
                 pass  # Suppress log messages
         
-        httpd = socketserver.TCPServer(('0.0.0.0', port), FrameStreamHandler)
+        # A thread per client: one slow or idle viewer must not block the rest
+        class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+        
+        httpd = ThreadingTCPServer(('0.0.0.0', port), FrameStreamHandler)
         print(f"{camera_name} stream ready at http://0.0.0.0:{port}/stream.mjpg")
         httpd.serve_forever()
         
@@ -113,6 +83,9 @@ def main():
     print("=" * 50)
     print()
     
+    # Local metrics endpoint when METRICS_PORT is set
+    start_from_env()
+    
     # Start both streams in separate threads
     thread1 = threading.Thread(
         target=stream_camera,
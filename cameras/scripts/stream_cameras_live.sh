@@ -26,9 +26,8 @@ stream_camera() {
            -video_size 1280x720 \
            -framerate 30 \
            -i "$device" \
-           -vf "format=yuv420p" \
            -f mjpeg \
-           -q:v 5 \
+           -c:v copy \
            -an \
            - 2>/dev/null | \
     while IFS= read -r line; do
@@ -48,13 +47,13 @@ start_camera1() {
                -framerate 30 \
                -i /dev/video0 \
                -f mjpeg \
-               -q:v 3 \
+               -c:v copy \
                -an \
                - 2>/dev/null | \
         (echo -ne "HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=--boundary\r\n\r\n"; cat -) | \
         nc -l -p $PORT1 2>/dev/null || \
         (echo -ne "HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=--boundary\r\n\r\n"; \
-         ffmpeg -f v4l2 -input_format mjpeg -video_size 1280x720 -framerate 30 -i /dev/video0 -f mjpeg -q:v 3 -an - 2>/dev/null)
+         ffmpeg -f v4l2 -input_format mjpeg -video_size 1280x720 -framerate 30 -i /dev/video0 -f mjpeg -c:v copy -an - 2>/dev/null)
     done
 }
 
@@ -68,13 +67,13 @@ start_camera2() {
                -framerate 30 \
                -i /dev/video2 \
                -f mjpeg \
-               -q:v 3 \
+               -c:v copy \
                -an \
                - 2>/dev/null | \
         (echo -ne "HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=--boundary\r\n\r\n"; cat -) | \
         nc -l -p $PORT2 2>/dev/null || \
         (echo -ne "HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=--boundary\r\n\r\n"; \
-         ffmpeg -f v4l2 -input_format mjpeg -video_size 1280x720 -framerate 30 -i /dev/video2 -f mjpeg -q:v 3 -an - 2>/dev/null)
+         ffmpeg -f v4l2 -input_format mjpeg -video_size 1280x720 -framerate 30 -i /dev/video2 -f mjpeg -c:v copy -an - 2>/dev/null)
     done
 }
 
@@ -113,7 +112,7 @@ class StreamingHandler(BaseHTTPRequestHandler):
              '-framerate', '30',
              '-i', device,
              '-f', 'mjpeg',
-             '-q:v', '3',
+             '-c:v', 'copy',
              '-an',
              '-'],
             stdout=subprocess.PIPE,
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Synchronized multi-camera capture with per-frame timestamps
+cap1.read(); cap2.read() decodes camera 1's frame before it even asks
+camera 2 for one, so the two frames of a pair are a decode (or a whole
+frame period) apart, and nothing records when either was taken.
+SyncedCapture calls grab() on every camera back to back - grab only
+dequeues the driver buffer - and decodes with retrieve() afterwards.
+
+Every frame carries a timestamp in time.monotonic() seconds:
+  v4l2  the kernel's buffer timestamp (CAP_PROP_POS_MSEC with the V4L2
+        backend), taken when the driver received the frame; V4L2 uses
+        CLOCK_MONOTONIC, the same clock as time.monotonic()
+  grab  time.monotonic() when grab() returned, used when there is no
+        usable buffer timestamp (other backends, video files)
+FrameSet.skew is the spread between the oldest and newest frame of one
+set, and stats() keeps its p50 / p95 / max.
+
+USB webcams have no trigger input, so this is software sync: a pair is
+as close as the two cameras' frame phases allow. With max_skew set and
+buffer timestamps available, a camera whose frame is older than the
+newest by more than max_skew is grabbed again (up to RESYNC_GRABS times),
+which skips a frame that sat in the driver queue.
+
+Usage:
+  python synced_capture.py                                   # skew: synced grab vs sequential read()
+  python synced_capture.py --devices /dev/video0 /dev/video2 --seconds 10 --max-skew 0.01
+"""
+
+import collections
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+CAMERAS = {'Camera 1': '/dev/video0', 'Camera 2': '/dev/video2'}
+WIDTH = 640
+HEIGHT = 480
+FPS = 30
+RESYNC_GRABS = 2        # extra grabs per set for a camera that is behind
+SKEW_SAMPLES = 1000     # recent skews kept for stats()
+CLOCK_TOLERANCE = 1.0   # seconds; buffer timestamps further than this from now are not CLOCK_MONOTONIC
+
+
+class TimedFrame(NamedTuple):
+    image: np.ndarray
+    timestamp: float        # time.monotonic() seconds
+    source: str             # 'v4l2' or 'grab'
+    seq: int                # frames delivered by this camera so far
+
+
+class FrameSet(NamedTuple):
+    frames: Dict[str, Optional[TimedFrame]]     # None for a camera that delivered nothing
+    skew: Optional[float]                       # newest - oldest timestamp; None unless every camera delivered
+
+
+class SyncedCapture:
+    """Several cv2.VideoCaptures read as one: grab all, then retrieve all"""
+
+    def __init__(self, cameras: Dict[str, str] = CAMERAS, width: int = WIDTH, height: int = HEIGHT,
+                 fps: Optional[int] = FPS, backend: int = cv2.CAP_V4L2, max_skew: Optional[float] = None):
+        self.max_skew = max_skew
+        self.captures: Dict[str, cv2.VideoCapture] = {}
+        for name, device in cameras.items():
+            cap = cv2.VideoCapture(device, backend)
+            if cap.isOpened():
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+                if fps:
+                    cap.set(cv2.CAP_PROP_FPS, fps)
+                # One driver buffer, so grab() returns a current frame rather than a queued one
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self.captures[name] = cap
+        self.sets = 0
+        self.incomplete = 0
+        self.resyncs = 0
+        self._seq = {name: 0 for name in self.captures}
+        self._sources = collections.Counter()
+        self._skews = collections.deque(maxlen=SKEW_SAMPLES)
+
+    def opened(self) -> Dict[str, bool]:
+        return {name: cap.isOpened() for name, cap in self.captures.items()}
+
+    @staticmethod
+    def timestamp(cap: cv2.VideoCapture, grabbed_at: float) -> Tuple[float, str]:
+        """(timestamp, source) of the frame cap just grabbed"""
+        msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if msec > 0 and abs(msec / 1000.0 - grabbed_at) < CLOCK_TOLERANCE:
+            return msec / 1000.0, 'v4l2'
+        return grabbed_at, 'grab'
+
+    def _resync(self, stamps: Dict[str, Tuple[float, str]]):
+        for _ in range(RESYNC_GRABS):
+            newest = max(ts for ts, _ in stamps.values())
+            late = [name for name, (ts, _) in stamps.items() if newest - ts > self.max_skew]
+            if not late:
+                return
+            for name in late:
+                cap = self.captures[name]
+                if cap.grab():
+                    stamps[name] = self.timestamp(cap, time.monotonic())
+                    self.resyncs += 1
+
+    def read(self) -> FrameSet:
+        # Back to back: nothing is decoded until every camera has its frame
+        stamps: Dict[str, Tuple[float, str]] = {}
+        for name, cap in self.captures.items():
+            if cap.grab():
+                stamps[name] = self.timestamp(cap, time.monotonic())
+
+        if self.max_skew is not None and len(stamps) > 1 and all(s == 'v4l2' for _, s in stamps.values()):
+            self._resync(stamps)
+
+        frames: Dict[str, Optional[TimedFrame]] = {}
+        for name, cap in self.captures.items():
+            frames[name] = None
+            if name in stamps:
+                ok, image = cap.retrieve()
+                if ok:
+                    self._seq[name] += 1
+                    timestamp, source = stamps[name]
+                    frames[name] = TimedFrame(image, timestamp, source, self._seq[name])
+                    self._sources[source] += 1
+        return self._record(frames)
+
+    def _record(self, frames: Dict[str, Optional[TimedFrame]]) -> FrameSet:
+        self.sets += 1
+        skew = None
+        if frames and all(f is not None for f in frames.values()):
+            times = [f.timestamp for f in frames.values()]
+            skew = max(times) - min(times)
+            self._skews.append(skew)
+        else:
+            self.incomplete += 1
+        return FrameSet(frames, skew)
+
+    def stats(self) -> dict:
+        """Frame sets read, incomplete sets, resync grabs, timestamp sources and skew percentiles (seconds)"""
+        skews = sorted(self._skews)
+        return {
+            'sets': self.sets,
+            'incomplete': self.incomplete,
+            'resyncs': self.resyncs,
+            'timestamps': dict(self._sources),
+            'skew_p50': skews[len(skews) // 2] if skews else float('nan'),
+            'skew_p95': skews[int(len(skews) * 0.95)] if skews else float('nan'),
+            'skew_max': skews[-1] if skews else float('nan'),
+        }
+
+    def release(self):
+        for cap in self.captures.values():
+            cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+def read_sequential(capture: SyncedCapture) -> FrameSet:
+    """The old cap1.read(); cap2.read() pattern, timestamped the same way (for comparison)"""
+    frames: Dict[str, Optional[TimedFrame]] = {}
+    for name, cap in capture.captures.items():
+        ok, image = cap.read()
+        frames[name] = None
+        if ok:
+            timestamp, source = capture.timestamp(cap, time.monotonic())
+            capture._seq[name] += 1
+            capture._sources[source] += 1
+            frames[name] = TimedFrame(image, timestamp, source, capture._seq[name])
+    return capture._record(frames)
+
+
+def measure(cameras: Dict[str, str], seconds: float, synced: bool, backend: int = cv2.CAP_V4L2,
+            max_skew: Optional[float] = None) -> dict:
+    with SyncedCapture(cameras, backend=backend, max_skew=max_skew) as capture:
+        t0 = time.monotonic()
+        while time.monotonic() - t0 < seconds:
+            if synced:
+                capture.read()
+            else:
+                read_sequential(capture)
+        stats = capture.stats()
+        stats['fps'] = stats['sets'] / (time.monotonic() - t0)
+        stats['opened'] = capture.opened()
+    return stats
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Synchronized multi-camera capture')
+    parser.add_argument('--devices', nargs='+', default=list(CAMERAS.values()),
+                       help='Camera devices (default: /dev/video0 /dev/video2)')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Seconds per measurement (default: 5)')
+    parser.add_argument('--max-skew', type=float, default=None,
+                       help='Re-grab a camera more than this many seconds behind (default: off)')
+    parser.add_argument('--any-backend', action='store_true',
+                       help='Let OpenCV pick the backend (for video files instead of V4L2 devices)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("SYNCED CAPTURE")
+    print("=" * 70)
+    print()
+
+    cameras = {f'Camera {i + 1}': device for i, device in enumerate(args.devices)}
+    backend = cv2.CAP_ANY if args.any_backend else cv2.CAP_V4L2
+    for mode, synced in (('Sequential read()', False), ('Synced grab/retrieve', True)):
+        r = measure(cameras, args.seconds, synced, backend, args.max_skew if synced else None)
+        if not all(r['opened'].values()):
+            closed = [name for name, ok in r['opened'].items() if not ok]
+            print(f"[ERROR] Could not open: {', '.join(closed)}")
+            return
+        print(f"  {mode:<22} {r['fps']:5.1f} sets/s  skew p50 {r['skew_p50'] * 1e3:6.1f} ms  "
+              f"p95 {r['skew_p95'] * 1e3:6.1f} ms  max {r['skew_max'] * 1e3:6.1f} ms  "
+              f"timestamps {r['timestamps']}" + (f"  resyncs {r['resyncs']}" if r['resyncs'] else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Batched YOLOv8 detector for several cameras
+detect(frames) preprocesses each camera's frame into one NCHW batch, calls
+session.run once, and splits the output back into per-camera detections
+(yolo_postprocess.py). Frames are letterboxed into a reused input tensor
+(yolo_preprocess.py). One run per iteration instead of one per camera
+saves the per-call overhead and lets ONNX Runtime spread the batch over
+its threads.
+
+Batching needs a model exported with a dynamic batch dimension
+(export_yolo_model.py --dynamic -> yolov8n_dynamic.onnx). With a fixed
+batch-1 model detect() falls back to one run per frame, so the same code
+works with either file.
+
+Usage:
+  python yolo_detector.py --model yolov8n_dynamic.onnx --benchmark --cameras 2 4
+"""
+
+import os
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from yolo_postprocess import CONF_THRESHOLD, IOU_THRESHOLD, Detection, postprocess
+from yolo_preprocess import Letterbox
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
+MODEL_PATHS = [
+    os.path.join(MODEL_DIR, 'yolov8n_dynamic.onnx'),
+    os.path.join(MODEL_DIR, 'yolov8n.onnx'),
+    "/tmp/yolov8n.onnx",
+    os.path.expanduser("~/yolov8n.onnx"),
+]
+DEFAULT_INPUT_SIZE = 640
+
+# GPU first where ONNX Runtime was built with it (Jetson); batching pays off most there
+PREFERRED_PROVIDERS = ['CUDAExecutionProvider', 'CPUExecutionProvider']
+
+
+def find_model() -> Optional[str]:
+    """First existing model file, preferring the dynamic-batch export"""
+    for path in MODEL_PATHS:
+        if os.path.exists(path) and os.path.getsize(path) > 1000000:
+            return path
+    return None
+
+
+class YoloDetector:
+    """YOLOv8 ONNX session that detects on a list of frames (one per camera) at once"""
+
+    def __init__(self, model, conf_threshold: float = CONF_THRESHOLD, iou_threshold: float = IOU_THRESHOLD,
+                 providers: Optional[Sequence[str]] = None):
+        if isinstance(model, str):
+            import onnxruntime as ort
+            if providers is None:
+                available = ort.get_available_providers()
+                providers = [p for p in PREFERRED_PROVIDERS if p in available]
+            model = ort.InferenceSession(model, providers=list(providers))
+        self.session = model
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+        inp = model.get_inputs()[0]
+        self.input_name = inp.name
+        self.output_name = model.get_outputs()[0].name
+        batch, _, height, width = inp.shape
+        self.input_size: Tuple[int, int] = (width if isinstance(width, int) else DEFAULT_INPUT_SIZE,
+                                            height if isinstance(height, int) else DEFAULT_INPUT_SIZE)
+        # None = dynamic batch; otherwise the fixed batch size the model accepts
+        self.max_batch: Optional[int] = batch if isinstance(batch, int) else None
+        self.letterbox = Letterbox(self.input_size)
+
+    @property
+    def batched(self) -> bool:
+        return self.max_batch is None or self.max_batch > 1
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        """Raw [N, 84, anchors] output for a preprocessed [N, 3, H, W] batch, in runs the model accepts"""
+        step = len(batch) if self.max_batch is None else max(self.max_batch, 1)
+        outputs = [self.session.run([self.output_name], {self.input_name: batch[start:start + step]})[0]
+                   for start in range(0, len(batch), step)]
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def detect(self, frames: Sequence[np.ndarray]) -> List[List[Detection]]:
+        """Detections per frame, in the order given; one session.run when the model allows it"""
+        # Letterbox each frame into its slot of the reused input tensor (yolo_preprocess.py)
+        self.letterbox.ensure_batch(len(frames))
+        boxes = [self.letterbox(frame, i) for i, frame in enumerate(frames)]
+        output = self.infer(self.letterbox.tensor[:len(frames)])
+        return [postprocess(output[i], self.conf_threshold, self.iou_threshold, boxes[i].scale, boxes[i].pad,
+                            orig_shape=frames[i].shape)
+                for i in range(len(frames))]
+
+    def detect_each(self, frames: Sequence[np.ndarray]) -> List[List[Detection]]:
+        """One session.run per frame (the old per-camera path)"""
+        results = []
+        for frame in frames:
+            results.extend(self.detect([frame]))
+        return results
+
+
+def benchmark(model_path: str, camera_counts: Sequence[int], seconds: float = 5.0,
+              frame_shape: Tuple[int, int, int] = (480, 640, 3)) -> List[dict]:
+    """Frames per second, per-frame runs vs one batched run, for each camera count"""
+    detector = YoloDetector(model_path)
+    rng = np.random.default_rng(0)
+    results = []
+    for cameras in camera_counts:
+        frames = [rng.integers(0, 255, frame_shape, dtype=np.uint8) for _ in range(cameras)]
+        row = {'cameras': cameras}
+        for mode, fn in (('per_frame', detector.detect_each), ('batched', detector.detect)):
+            fn(frames)   # warm-up
+            iterations = 0
+            t0 = time.perf_counter()
+            while time.perf_counter() - t0 < seconds:
+                fn(frames)
+                iterations += 1
+            row[mode] = iterations * cameras / (time.perf_counter() - t0)
+        results.append(row)
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Batched multi-camera YOLOv8 detector')
+    parser.add_argument('--model', default=find_model(), help='ONNX model (default: first of MODEL_PATHS found)')
+    parser.add_argument('--benchmark', action='store_true', help='Per-frame vs batched throughput')
+    parser.add_argument('--cameras', type=int, nargs='+', default=[2, 4],
+                       help='Camera counts to benchmark (default: 2 4)')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Seconds per measurement (default: 5)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("YOLO BATCHED DETECTOR")
+    print("=" * 70)
+    print()
+
+    if not args.model or not os.path.exists(args.model):
+        print("[ERROR] No model found; export one with: python export_yolo_model.py --dynamic")
+        sys.exit(1)
+    if not args.benchmark:
+        parser.print_help()
+        return
+
+    detector = YoloDetector(args.model)
+    print(f"  Model: {args.model}")
+    print(f"  Batch: {'dynamic' if detector.max_batch is None else detector.max_batch}")
+    print(f"  Providers: {', '.join(detector.session.get_providers())}")
+    if not detector.batched:
+        print("  [WARNING] Fixed batch-1 model: batched mode falls back to one run per frame")
+    print()
+    print(f"  {'cameras':>7} {'per-frame fps':>14} {'batched fps':>12} {'speedup':>8}")
+    for r in benchmark(args.model, args.cameras, args.seconds):
+        print(f"  {r['cameras']:>7} {r['per_frame']:>14.1f} {r['batched']:>12.1f} "
+              f"{r['batched'] / r['per_frame']:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
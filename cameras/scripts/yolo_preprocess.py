@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Allocation-free letterbox preprocessing for YOLOv8
+The old prepare_input stretched every frame to 640x640 and allocated at
+each step (resize, cvtColor, astype, divide, transpose, expand_dims).
+Letterbox owns its buffers instead:
+  - a uint8 640x640 canvas, padded with grey (114) only when the frame
+    geometry changes
+  - cv2.resize writes the aspect-preserving resize straight into the
+    canvas (or into a cached buffer that is copied in, when the padding is
+    at the sides)
+  - one fused NumPy pass does BGR -> RGB, HWC -> CHW and the 1/255
+    normalisation, written into a preallocated float32 NCHW tensor
+The scale and padding come back with the tensor so boxes can be mapped to
+the frame (yolo_postprocess.postprocess(scale=..., pad=...)).
+
+Usage:
+  python yolo_preprocess.py --benchmark   # time and allocations vs the old prepare_input
+"""
+
+import time
+from typing import Dict, NamedTuple, Tuple
+
+import cv2
+import numpy as np
+
+INPUT_SIZE = (640, 640)   # (width, height)
+PAD_VALUE = 114
+GEOMETRY_CACHE = 16       # frame shapes remembered (crops can come in many sizes)
+INV_255 = np.float32(1.0 / 255.0)
+
+
+class Geometry(NamedTuple):
+    scale: float
+    pad: Tuple[int, int]        # left, top
+    size: Tuple[int, int]       # resized frame (width, height)
+
+
+class LetterboxResult(NamedTuple):
+    tensor: np.ndarray          # [1, 3, H, W] view of the preallocated input
+    scale: float
+    pad: Tuple[int, int]
+
+
+class Letterbox:
+    """Letterbox frames into reusable NCHW float32 input tensors"""
+
+    def __init__(self, input_size: Tuple[int, int] = INPUT_SIZE, batch: int = 1, pad_value: int = PAD_VALUE):
+        self.input_size = input_size
+        self.pad_value = pad_value
+        width, height = input_size
+        self.canvas = np.full((height, width, 3), pad_value, np.uint8)
+        self.tensor = np.empty((batch, 3, height, width), np.float32)
+        self._geometry: Dict[Tuple[int, int], Geometry] = {}
+        self._canvas_for = None         # frame (h, w) the canvas padding was drawn for
+        self._resized: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def ensure_batch(self, batch: int):
+        if self.tensor.shape[0] < batch:
+            self.tensor = np.empty((batch,) + self.tensor.shape[1:], np.float32)
+
+    def geometry(self, frame_shape) -> Geometry:
+        key = (frame_shape[0], frame_shape[1])
+        geometry = self._geometry.get(key)
+        if geometry is None:
+            if len(self._geometry) >= GEOMETRY_CACHE:
+                self._geometry.clear()
+                self._resized.clear()
+            width, height = self.input_size
+            scale = min(width / key[1], height / key[0])
+            size = (int(round(key[1] * scale)), int(round(key[0] * scale)))
+            pad = ((width - size[0]) // 2, (height - size[1]) // 2)
+            geometry = self._geometry[key] = Geometry(scale, pad, size)
+        return geometry
+
+    def __call__(self, frame: np.ndarray, index: int = 0) -> LetterboxResult:
+        """BGR frame -> tensor[index] (RGB, CHW, [0, 1]); returns that slot as [1, 3, H, W]"""
+        geometry = self.geometry(frame.shape)
+        (left, top), (w, h) = geometry.pad, geometry.size
+        key = (frame.shape[0], frame.shape[1])
+        if self._canvas_for != key:
+            self.canvas[...] = self.pad_value
+            self._canvas_for = key
+
+        region = self.canvas[top:top + h, left:left + w]
+        if region.flags['C_CONTIGUOUS']:
+            # Padding above/below only: the region is whole canvas rows, resize in place
+            cv2.resize(frame, (w, h), dst=region, interpolation=cv2.INTER_LINEAR)
+        else:
+            resized = self._resized.get((w, h))
+            if resized is None:
+                resized = self._resized[(w, h)] = np.empty((h, w, 3), np.uint8)
+            cv2.resize(frame, (w, h), dst=resized, interpolation=cv2.INTER_LINEAR)
+            region[...] = resized
+
+        out = self.tensor[index]
+        np.multiply(self.canvas[:, :, ::-1].transpose(2, 0, 1), INV_255, out=out, casting='unsafe')
+        return LetterboxResult(self.tensor[index:index + 1], geometry.scale, geometry.pad)
+
+
+def prepare_input_stretch(frame, input_size=INPUT_SIZE):
+    """The old prepare_input from the detector scripts (stretch, allocates at every step)"""
+    img_resized = cv2.resize(frame, input_size)
+    img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
+    img_normalized = img_rgb.astype(np.float32) / 255.0
+    img_transposed = np.transpose(img_normalized, (2, 0, 1))
+    return np.expand_dims(img_transposed, axis=0)
+
+
+def benchmark(runs: int = 200, frame_shape=(720, 1280, 3)) -> dict:
+    """p50 time and bytes allocated per call, old prepare_input vs Letterbox"""
+    import tracemalloc
+
+    frame = np.random.default_rng(0).integers(0, 255, frame_shape, dtype=np.uint8)
+    letterbox = Letterbox()
+    results = {}
+    for name, fn in (('stretch', lambda: prepare_input_stretch(frame)), ('letterbox', lambda: letterbox(frame))):
+        fn()
+        samples = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t0)
+        samples.sort()
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {'p50': samples[len(samples) // 2], 'allocated': peak}
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Allocation-free letterbox preprocessing')
+    parser.add_argument('--benchmark', action='store_true', help='Compare with the old prepare_input')
+    parser.add_argument('--runs', type=int, default=200, help='Benchmark runs (default: 200)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("YOLO PREPROCESS")
+    print("=" * 70)
+    print()
+
+    if not args.benchmark:
+        parser.print_help()
+        return
+    r = benchmark(args.runs)
+    for name, label in (('stretch', 'prepare_input (stretch)'), ('letterbox', 'Letterbox')):
+        print(f"  {label:<24} {r[name]['p50'] * 1e3:6.2f} ms  {r[name]['allocated'] / 1e6:6.2f} MB allocated per call")
+    print(f"  [OK] 1280x720 -> 640x640, {r['stretch']['p50'] / r['letterbox']['p50']:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Import path setup for the shared tools
+Makes ../../tools (metrics.py) importable from the scripts in this folder.
+Every module that imports from tools does `import _paths` first, so the
+import works whichever script is the entry point and in any import order.
+Where tools/ is not there (e.g. the copy quick_troubleshoot_responses_jetson.py
+puts on the Jetson, with metrics.py next to the scripts) nothing is added.
+"""
+
+import os
+import sys
+
+TOOLS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+
+if os.path.isdir(TOOLS_DIR) and TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
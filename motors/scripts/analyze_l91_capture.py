@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Offline L91/AT Capture Analyzer (vectorized)
+Segments a capture into frames with NumPy - no per-frame Python loop - and
+prints histograms of CAN IDs, command types (0x20/0x00/0x90), motor byte
+values and payload fields, plus request/response pairing.
+
+Inputs:
+  - raw serial dumps (any file of adapter bytes, e.g. from a port monitor)
+  - recorder captures (*.canlog from can_recorder.py); these carry direction
+    and timestamps, so requests can be paired with responses
+
+Raw files are memory-mapped and scanned in chunks, so multi-GB captures are
+processed in seconds without loading them into RAM.
+
+Usage:
+  python analyze_l91_capture.py capture.bin
+  python analyze_l91_capture.py session.canlog --top 20
+  python analyze_l91_capture.py capture.bin --json summary.json
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from l91_protocol import (CRLF, HEADER_LEN, MAX_DLC, MAX_FRAME_LEN, SPEED_ZERO,
+                          TYPE_EXTENDED, TYPE_JOG, TYPE_STANDARD)
+
+COMMAND_TYPE_NAMES = {
+    TYPE_EXTENDED: 'extended activation (0x20)',
+    TYPE_STANDARD: 'standard (0x00)',
+    TYPE_JOG: 'JOG (0x90)',
+}
+
+DIR_UNKNOWN = 255
+
+# Same fields as can_recorder.RECORD_DTYPE plus the byte offset for raw files. can_id
+# is a native little-endian integer here (the recorder stores the header bytes as
+# '>u4'); load_canlog copies by value, so the CAN IDs compare equal either way.
+FRAME_DTYPE = np.dtype([
+    ('t_ns', '<i8'),
+    ('adapter', 'u1'),
+    ('direction', 'u1'),
+    ('dlc', 'u1'),
+    ('flags', 'u1'),
+    ('can_id', '<u4'),
+    ('data', 'u1', (8,)),
+    ('offset', '<i8'),
+])
+
+CHUNK_SIZE = 256 * 1024 * 1024
+
+
+def _gather(buf, idx, width):
+    """Rows buf[i:i + width] for every i in idx; rows running past the end are zero-padded"""
+    n = buf.size
+    inside = idx + width <= n
+    out = np.zeros((idx.size, width), dtype=np.uint8)
+    if n >= width:
+        out[inside] = sliding_window_view(buf, width)[idx[inside]]
+    if not inside.all():
+        tail_start = max(0, n - width)
+        tail = np.concatenate((buf[tail_start:], np.zeros(width, dtype=np.uint8)))
+        out[~inside] = sliding_window_view(tail, width)[idx[~inside] - tail_start]
+    return out
+
+
+def segment_frames(buf, base_offset=0, final=True):
+    """
+    Vectorized frame segmentation of a uint8 array.
+
+    Returns (frames, consumed). With final=False the last MAX_FRAME_LEN - 1
+    bytes may hold a frame cut by the chunk boundary, so scanning of the next
+    chunk should resume at `consumed`.
+    """
+    n = buf.size
+    safe_end = n if final else max(0, n - (MAX_FRAME_LEN - 1))
+    if n < HEADER_LEN + len(CRLF):
+        return np.empty(0, dtype=FRAME_DTYPE), safe_end
+
+    starts = np.flatnonzero((buf[:-1] == 0x41) & (buf[1:] == 0x54))
+    starts = starts[starts + HEADER_LEN < n]
+    dlc = buf[starts + 6].astype(np.int64)
+    ends = starts + HEADER_LEN + dlc          # position of the CR
+    ok = (dlc <= MAX_DLC) & (ends + 1 < n)
+    starts, dlc, ends = starts[ok], dlc[ok], ends[ok]
+    ok = (buf[ends] == 0x0D) & (buf[ends + 1] == 0x0A)
+    starts, dlc, ends = starts[ok], dlc[ok], ends[ok]
+
+    # Drop "AT" candidates that sit inside an earlier frame's payload
+    if starts.size > 1:
+        prev_end = np.maximum.accumulate(ends + 2)
+        ok = np.concatenate(([True], starts[1:] >= prev_end[:-1]))
+        starts, dlc, ends = starts[ok], dlc[ok], ends[ok]
+
+    ok = starts < safe_end
+    starts, dlc, ends = starts[ok], dlc[ok], ends[ok]
+    consumed = max(safe_end, int(ends[-1]) + 2) if starts.size else safe_end
+
+    # Header + DLC + data of every frame in one gather, then mask bytes past DLC
+    body = _gather(buf, starts + 2, 4 + 1 + MAX_DLC)
+    frames = np.zeros(starts.size, dtype=FRAME_DTYPE)
+    frames['can_id'] = np.ascontiguousarray(body[:, :4]).view('>u4')[:, 0]
+    frames['dlc'] = dlc
+    data = np.ascontiguousarray(body[:, 5:]).view('<u8')[:, 0]
+    shift = (dlc.astype(np.uint64) * np.uint64(8)) & np.uint64(63)
+    mask = np.where(dlc >= MAX_DLC, np.uint64(0xFFFFFFFFFFFFFFFF),
+                    (np.uint64(1) << shift) - np.uint64(1))
+    frames['data'] = (data & mask).view(np.uint8).reshape(-1, MAX_DLC)
+    frames['offset'] = starts + base_offset
+    frames['direction'] = DIR_UNKNOWN
+    return frames, consumed
+
+
+def load_raw(path, chunk_size=CHUNK_SIZE):
+    """Memory-map a raw capture and segment it chunk by chunk"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return np.empty(0, dtype=FRAME_DTYPE)
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+    parts = []
+    pos = 0
+    while pos < size:
+        stop = min(size, pos + chunk_size)
+        final = stop == size
+        frames, consumed = segment_frames(mm[pos:stop], pos, final)
+        parts.append(frames)
+        if final:
+            break
+        pos += consumed if consumed > 0 else stop - pos
+    return np.concatenate(parts) if parts else np.empty(0, dtype=FRAME_DTYPE)
+
+
+def load_canlog(path):
+    """Load a can_recorder.py capture into FRAME_DTYPE"""
+    from can_recorder import FLAG_AT_COMMAND, FLAG_CLOCK, CanCapture
+
+    records = CanCapture(path).records
+    records = records[(records['flags'] & (FLAG_AT_COMMAND | FLAG_CLOCK)) == 0]
+    frames = np.zeros(len(records), dtype=FRAME_DTYPE)
+    for name in ('t_ns', 'adapter', 'direction', 'dlc', 'flags', 'can_id', 'data'):
+        frames[name] = records[name]
+    frames['offset'] = -1
+    return frames
+
+
+def histogram(values, top=None):
+    """(value, count) pairs, most frequent first"""
+    if values.size == 0:
+        return []
+    if values.dtype.kind in 'ui' and values.min() >= 0 and values.max() < 65536:
+        # Small non-negative domain (bytes, command types): O(n) bincount
+        counts = np.bincount(values.astype(np.int64))
+        uniq = np.flatnonzero(counts)
+        counts = counts[uniq]
+    else:
+        uniq, counts = np.unique(values, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    if top:
+        order = order[:top]
+    return [(int(uniq[i]), int(counts[i])) for i in order]
+
+
+def payload_fields(frames):
+    """Decode JOG payloads (flag, speed) for every JOG frame at once"""
+    is_jog = ((frames['can_id'] >> 24) == TYPE_JOG) & (frames['dlc'] == 8)
+    data = frames['data'][is_jog]
+    speed_val = (data[:, 6].astype(np.int32) << 8) | data[:, 7]
+    speed = np.where(speed_val >= 0x8000, speed_val - 0x8000, speed_val - SPEED_ZERO)
+    return {
+        'jog_frames': int(data.shape[0]),
+        'jog_flag': histogram(data[:, 5]),
+        # Speed in thousandths of full scale (JOG speed units are 1/3283)
+        'jog_speed': histogram(np.rint(speed * (1000.0 / 3283.0)).astype(np.int64)),
+        'dlc': histogram(frames['dlc']),
+        'first_data_byte': histogram(frames['data'][:, 0], top=16),
+    }
+
+
+def pair_requests(frames):
+    """
+    Pair each TX frame with the first RX frame that follows it on the same
+    adapter, before the next TX. Returns per-command-type RTT stats (ms).
+    """
+    tx_mask = frames['direction'] == 0
+    rx_mask = frames['direction'] == 1
+    if not tx_mask.any():
+        return None
+
+    rtts, req_types, answered, total = [], [], 0, 0
+    for adapter in np.unique(frames['adapter']):
+        on = frames['adapter'] == adapter
+        tx = frames[on & tx_mask]
+        rx = frames[on & rx_mask]
+        total += tx.size
+        if tx.size == 0 or rx.size == 0:
+            continue
+        owner = np.searchsorted(tx['t_ns'], rx['t_ns'], side='right') - 1
+        valid = owner >= 0
+        owner_ids, first = np.unique(owner[valid], return_index=True)
+        first_rx = rx[valid][first]
+        answered += owner_ids.size
+        rtts.append((first_rx['t_ns'] - tx['t_ns'][owner_ids]) / 1e6)
+        req_types.append(tx['can_id'][owner_ids] >> 24)
+
+    result = {'requests': int(total), 'answered': int(answered), 'by_type': {}}
+    if rtts:
+        rtt = np.concatenate(rtts)
+        types = np.concatenate(req_types)
+        for t in np.unique(types):
+            r = rtt[types == t]
+            result['by_type'][int(t)] = {
+                'count': int(r.size),
+                'median_ms': float(np.median(r)),
+                'p99_ms': float(np.percentile(r, 99)),
+                'max_ms': float(r.max()),
+            }
+    return result
+
+
+def analyze(frames, top=10):
+    """All summaries for a frame array"""
+    can_id = frames['can_id']
+    return {
+        'frames': int(frames.size),
+        'can_ids': histogram(can_id, top),
+        'command_types': histogram(can_id >> 24),
+        'motor_bytes': histogram(can_id & 0xFF, top),
+        'payload': payload_fields(frames),
+        'pairing': pair_requests(frames),
+    }
+
+
+def print_report(summary, elapsed, size):
+    """Print the analysis summary"""
+    print("=" * 70)
+    print("L91 CAPTURE ANALYSIS")
+    print("=" * 70)
+    print()
+    rate = size / elapsed / 1e6 if elapsed > 0 else 0.0
+    print(f"Frames: {summary['frames']}   ({size / 1e6:.1f} MB in {elapsed:.2f}s, {rate:.0f} MB/s)")
+    print()
+
+    print("Command types:")
+    for value, count in summary['command_types']:
+        print(f"  0x{value:02X}  {count:>10}  {COMMAND_TYPE_NAMES.get(value, '')}")
+    print()
+
+    print("CAN IDs (header word):")
+    for value, count in summary['can_ids']:
+        print(f"  0x{value:08X}  {count:>10}")
+    print()
+
+    print("Motor byte values:")
+    for value, count in summary['motor_bytes']:
+        print(f"  0x{value:02X}  {count:>10}")
+    print()
+
+    payload = summary['payload']
+    print("Payload fields:")
+    print(f"  DLC: " + ", ".join(f"{v}:{c}" for v, c in payload['dlc']))
+    if payload['jog_frames']:
+        print(f"  JOG frames: {payload['jog_frames']}")
+        print(f"  JOG flag:   " + ", ".join(f"{v}:{c}" for v, c in payload['jog_flag']))
+        print(f"  JOG speed:  " + ", ".join(f"{v / 1000:+.3f}:{c}" for v, c in payload['jog_speed'][:10]))
+    print()
+
+    pairing = summary['pairing']
+    print("Request/response pairing:")
+    if pairing is None:
+        print("  [INFO] Raw capture has no direction info - use a .canlog capture for pairing")
+    else:
+        print(f"  Requests: {pairing['requests']}, answered: {pairing['answered']}")
+        for ctype, stats in pairing['by_type'].items():
+            print(f"  0x{ctype:02X}: {stats['count']:>8} paired  median {stats['median_ms']:.2f} ms  "
+                  f"p99 {stats['p99_ms']:.2f} ms  max {stats['max_ms']:.2f} ms")
+    print()
+    print("=" * 70)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Vectorized offline L91/AT capture analyzer')
+    parser.add_argument('path', help='Raw capture or .canlog recorder file')
+    parser.add_argument('--top', type=int, default=10, help='Rows per histogram (default: 10)')
+    parser.add_argument('--json', help='Also write the summary to this JSON file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.path.endswith('.canlog'):
+        frames = load_canlog(args.path)
+    else:
+        frames = load_raw(args.path)
+    summary = analyze(frames, args.top)
+    elapsed = time.perf_counter() - start
+
+    print_report(summary, elapsed, os.path.getsize(args.path))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"[OK] Summary written to {args.json}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+        sys.exit(1)
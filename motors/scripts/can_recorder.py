@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Binary CAN traffic recorder with indexed, memory-mapped replay
+Every TX/RX frame goes into a compact fixed-size record log instead of
+response.hex()[:80] printouts, so captures can be filtered with NumPy.
+
+Files for a capture "session.canlog":
+  session.canlog           records (RECORD_DTYPE, 24 bytes each, append-only)
+  session.canlog.json      adapter names (adapter id -> port), session settings
+  session.canlog.idx.npz   sidecar index by time and CAN ID (rebuilt when stale)
+
+Usage:
+  python can_recorder.py record session.canlog /dev/ttyUSB0 /dev/ttyUSB1
+  python can_recorder.py index session.canlog
+  python can_recorder.py show session.canlog --motor 0x34 --start 1.5 --end 3.0
+"""
+
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from l91_protocol import Frame, encode_frame, parse_frames
+
+RECORD_DTYPE = np.dtype([
+    ('t_ns', '<i8'),      # time.monotonic_ns()
+    ('adapter', 'u1'),    # adapter id (see .json sidecar)
+    ('direction', 'u1'),  # DIR_TX / DIR_RX
+    ('dlc', 'u1'),
+    ('flags', 'u1'),      # FLAG_*
+    ('can_id', '>u4'),    # 4 L91 header bytes (e.g. 0x2007e834)
+    ('data', 'u1', (8,)),
+])
+RECORD_SIZE = RECORD_DTYPE.itemsize
+RECORD_STRUCT = struct.Struct('<qBBBB4s8s')
+assert RECORD_STRUCT.size == RECORD_SIZE == 24
+
+DIR_TX = 0
+DIR_RX = 1
+
+FLAG_AT_COMMAND = 0x01   # raw adapter command (AT+AT, AT+A0); bytes in data
+FLAG_CLOCK = 0x02        # control loop clock; can_id CLOCK_NOW / CLOCK_DT, data = float64
+
+CLOCK_NOW = 0            # the tick's time.monotonic() value
+CLOCK_DT = 1             # the dt passed to the tick
+
+TIME_INDEX_STRIDE = 4096
+
+
+def _meta_path(path):
+    return path + '.json'
+
+
+def _index_path(path):
+    return path + '.idx.npz'
+
+
+class CanRecorder:
+    """Append-only recorder shared by any number of L91Adapter instances"""
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.adapters: Dict[int, str] = {}
+        self.session: Dict[str, object] = {}
+        if os.path.exists(_meta_path(path)):
+            with open(_meta_path(path)) as f:
+                meta = json.load(f)
+            self.adapters = {int(k): v for k, v in meta['adapters'].items()}
+            self.session = meta.get('session', {})
+        self._file = open(path, 'ab')
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.records = 0
+
+    def register_adapter(self, port: str, adapter_id: Optional[int] = None) -> int:
+        """Return the id for a port, assigning the next free one if needed"""
+        with self._lock:
+            for aid, name in self.adapters.items():
+                if name == port:
+                    return aid
+            if adapter_id is None or adapter_id in self.adapters:
+                adapter_id = max(self.adapters, default=-1) + 1
+            self.adapters[adapter_id] = port
+            self._write_meta()
+            return adapter_id
+
+    def annotate(self, **session):
+        """Store session settings (e.g. controller gains) in the .json sidecar for replay"""
+        with self._lock:
+            self.session.update(session)
+            self._write_meta()
+
+    def _write_meta(self):
+        with open(_meta_path(self.path), 'w') as f:
+            json.dump({'record_size': RECORD_SIZE,
+                       'adapters': {str(k): v for k, v in self.adapters.items()},
+                       'session': self.session}, f, indent=2)
+
+    def record(self, adapter_id: int, direction: int, can_id: int, data: bytes, flags: int = 0):
+        """Append one record"""
+        self._append([(adapter_id, direction, can_id, data, flags)])
+
+    def record_tx(self, adapter_id: int, raw: bytes):
+        """Record bytes written to an adapter (frames, or an AT+ command)"""
+        frames = parse_frames(raw)
+        if frames:
+            self._append([(adapter_id, DIR_TX, f.can_id, f.data, 0) for f in frames])
+        else:
+            self._append([(adapter_id, DIR_TX, 0, raw[:8], FLAG_AT_COMMAND)])
+
+    def record_clock(self, adapter_id: int, now: float, dt: float):
+        """Record a control tick's clock, so session_replay.py can reproduce it exactly"""
+        self._append([(adapter_id, DIR_TX, CLOCK_NOW, struct.pack('<d', now), FLAG_CLOCK),
+                      (adapter_id, DIR_TX, CLOCK_DT, struct.pack('<d', dt), FLAG_CLOCK)])
+
+    def record_rx(self, adapter_id: int, frames: Iterable[Frame]):
+        """Record frames parsed from an adapter's RX stream"""
+        self._append([(adapter_id, DIR_RX, f.can_id, f.data, 0) for f in frames])
+
+    def _append(self, entries):
+        pack = RECORD_STRUCT.pack
+        with self._lock:
+            t_ns = time.monotonic_ns()
+            self._file.write(b''.join(
+                pack(t_ns, aid, direction, len(data), flags, can_id.to_bytes(4, 'big'), bytes(data))
+                for aid, direction, can_id, data, flags in entries))
+            self.records += len(entries)
+            if time.monotonic() - self._last_flush > self.flush_interval:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+
+    def close(self, build=True):
+        """Flush, close and (optionally) write the sidecar index"""
+        with self._lock:
+            self._file.close()
+        if build:
+            build_index(self.path)
+
+
+def build_index(path: str) -> Dict[str, np.ndarray]:
+    """Build and save the sidecar index for a capture"""
+    n = os.path.getsize(path) // RECORD_SIZE
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(n,)) if n else \
+        np.empty(0, dtype=RECORD_DTYPE)
+
+    index = {'count': np.array(n, dtype=np.int64),
+             'time_marks': np.ascontiguousarray(records['t_ns'][::TIME_INDEX_STRIDE])}
+    for name, keys in (('can_id', records['can_id'].astype(np.uint32)),
+                       ('motor', (records['can_id'] & 0xFF).astype(np.uint32))):
+        order = np.argsort(keys, kind='stable').astype(np.int64)
+        values, starts = np.unique(keys[order], return_index=True)
+        index[f'{name}_order'] = order
+        index[f'{name}_values'] = values
+        index[f'{name}_starts'] = np.append(starts, n).astype(np.int64)
+
+    np.savez(_index_path(path), **index)
+    return index
+
+
+class CanCapture:
+    """Memory-mapped reader for a .canlog capture"""
+
+    def __init__(self, path: str):
+        self.path = path
+        n = os.path.getsize(path) // RECORD_SIZE
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(n,)) if n else \
+            np.empty(0, dtype=RECORD_DTYPE)
+        self.adapters: Dict[int, str] = {}
+        self.session: Dict[str, object] = {}
+        if os.path.exists(_meta_path(path)):
+            with open(_meta_path(path)) as f:
+                meta = json.load(f)
+            self.adapters = {int(k): v for k, v in meta['adapters'].items()}
+            self.session = meta.get('session', {})
+        self.index = self._load_index()
+
+    def _load_index(self):
+        idx_path = _index_path(self.path)
+        if os.path.exists(idx_path):
+            with np.load(idx_path) as data:
+                index = {k: data[k] for k in data.files}
+            if int(index['count']) == len(self.records):
+                return index
+        return build_index(self.path)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def t0_ns(self) -> int:
+        return int(self.records['t_ns'][0]) if len(self.records) else 0
+
+    def _time_bounds(self, start_ns=None, end_ns=None):
+        """Record index range [lo, hi) for a time window, via the sparse time marks"""
+        marks = self.index['time_marks']
+        t = self.records['t_ns']
+        lo, hi = 0, len(self.records)
+        if start_ns is not None:
+            block = max(0, int(np.searchsorted(marks, start_ns, 'left')) - 1)
+            base = block * TIME_INDEX_STRIDE
+            lo = base + int(np.searchsorted(t[base:base + 2 * TIME_INDEX_STRIDE], start_ns, 'left'))
+        if end_ns is not None:
+            block = max(0, int(np.searchsorted(marks, end_ns, 'left')) - 1)
+            base = block * TIME_INDEX_STRIDE
+            hi = base + int(np.searchsorted(t[base:base + 2 * TIME_INDEX_STRIDE], end_ns, 'left'))
+        return lo, max(lo, hi)
+
+    def time_range(self, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """Records between start and end seconds after the first record (zero-copy slice)"""
+        start_ns = None if start is None else self.t0_ns + int(start * 1e9)
+        end_ns = None if end is None else self.t0_ns + int(end * 1e9)
+        lo, hi = self._time_bounds(start_ns, end_ns)
+        return self.records[lo:hi]
+
+    def _rows_for(self, name, value):
+        values = self.index[f'{name}_values']
+        pos = int(np.searchsorted(values, value))
+        if pos >= len(values) or values[pos] != value:
+            return np.empty(0, dtype=np.int64)
+        starts = self.index[f'{name}_starts']
+        return self.index[f'{name}_order'][starts[pos]:starts[pos + 1]]
+
+    def select(self, can_id: Optional[int] = None, motor: Optional[int] = None,
+               start: Optional[float] = None, end: Optional[float] = None,
+               direction: Optional[int] = None, adapter: Optional[int] = None) -> np.ndarray:
+        """Records matching every given filter, in time order"""
+        if can_id is None and motor is None:
+            rows = self.time_range(start, end)
+        else:
+            idx = self._rows_for('can_id', can_id) if can_id is not None else self._rows_for('motor', motor)
+            if motor is not None and can_id is not None and (can_id & 0xFF) != motor:
+                idx = idx[:0]
+            if start is not None or end is not None:
+                start_ns = None if start is None else self.t0_ns + int(start * 1e9)
+                end_ns = None if end is None else self.t0_ns + int(end * 1e9)
+                lo, hi = self._time_bounds(start_ns, end_ns)
+                idx = idx[(idx >= lo) & (idx < hi)]
+            rows = self.records[idx]
+
+        if direction is not None:
+            rows = rows[rows['direction'] == direction]
+        if adapter is not None:
+            rows = rows[rows['adapter'] == adapter]
+        return rows
+
+    def can_ids(self) -> np.ndarray:
+        """Distinct CAN IDs with their record counts"""
+        values = self.index['can_id_values']
+        return np.rec.fromarrays([values, np.diff(self.index['can_id_starts'])],
+                                 names='can_id,count')
+
+    @staticmethod
+    def to_bytes(rows: np.ndarray) -> List[bytes]:
+        """Re-encode records as the raw bytes that were on the wire"""
+        out = []
+        for row in rows:
+            if row['flags'] & FLAG_CLOCK:
+                continue
+            data = bytes(row['data'][:row['dlc']])
+            out.append(data if row['flags'] & FLAG_AT_COMMAND else encode_frame(int(row['can_id']), data))
+        return out
+
+
+def _print_rows(capture: CanCapture, rows: np.ndarray, limit: int):
+    t0 = capture.t0_ns
+    for row in rows[:limit]:
+        direction = 'TX' if row['direction'] == DIR_TX else 'RX'
+        data = bytes(row['data'][:row['dlc']])
+        adapter = capture.adapters.get(int(row['adapter']), str(row['adapter']))
+        if row['flags'] & FLAG_AT_COMMAND:
+            desc = f"adapter command {data!r}"
+        elif row['flags'] & FLAG_CLOCK:
+            desc = f"loop clock {'now' if row['can_id'] == CLOCK_NOW else 'dt'}={struct.unpack('<d', data)[0]:.6f}"
+        else:
+            desc = f"CAN ID 0x{int(row['can_id']):08X}  Data: {data.hex()}"
+        print(f"  {(row['t_ns'] - t0) / 1e9:12.6f}s  {adapter:<14} {direction}  {desc}")
+    if len(rows) > limit:
+        print(f"  ... {len(rows) - limit} more")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Binary CAN traffic recorder / reader')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help='Passively record RX traffic from adapters')
+    rec.add_argument('path')
+    rec.add_argument('ports', nargs='+', help='Adapter serial ports')
+    rec.add_argument('--no-init', action='store_true', help='Skip AT+AT / AT+A0')
+
+    idx = sub.add_parser('index', help='(Re)build the sidecar index')
+    idx.add_argument('path')
+
+    show = sub.add_parser('show', help='Print records matching filters')
+    show.add_argument('path')
+    show.add_argument('--can-id', type=lambda v: int(v, 0))
+    show.add_argument('--motor', type=lambda v: int(v, 0), help='Motor byte value, e.g. 0x34')
+    show.add_argument('--start', type=float, help='Seconds from capture start')
+    show.add_argument('--end', type=float, help='Seconds from capture start')
+    show.add_argument('--limit', type=int, default=50)
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from l91_adapter import L91Adapter
+
+        recorder = CanRecorder(args.path)
+        adapters = [L91Adapter(port, recorder=recorder) for port in args.ports]
+        print("=" * 70)
+        print(f"RECORDING to {args.path} (Ctrl+C to stop)")
+        print("=" * 70)
+        try:
+            for adapter in adapters:
+                if adapter.connect(initialize=not args.no_init):
+                    print(f"  [OK] {adapter.port} (adapter {adapter.adapter_id})")
+            adapters = [a for a in adapters if a.ser is not None]
+            while adapters:
+                for adapter in adapters:
+                    adapter.read_frames()
+                time.sleep(0.001)
+        except KeyboardInterrupt:
+            print("\n\n[INTERRUPTED] Stopped by user")
+        finally:
+            for adapter in adapters:
+                adapter.disconnect()
+            recorder.close()
+            print(f"  {recorder.records} records written")
+
+    elif args.command == 'index':
+        index = build_index(args.path)
+        print(f"[OK] Indexed {int(index['count'])} records, "
+              f"{len(index['can_id_values'])} CAN IDs, {len(index['motor_values'])} motor bytes")
+
+    elif args.command == 'show':
+        capture = CanCapture(args.path)
+        rows = capture.select(can_id=args.can_id, motor=args.motor, start=args.start, end=args.end)
+        print(f"{len(rows)} of {len(capture)} records match")
+        _print_rows(capture, rows, args.limit)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
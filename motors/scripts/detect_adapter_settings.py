@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Auto-detect serial baud rate and CAN bit timing on every USB-CAN adapter
+Replaces the manual passes of launchers/test_can_bitrates.sh and
+test_slcan_setup.sh for the L91 adapters: all adapters are probed at the
+same time (one thread each), and each one stops at the first setting that
+gets a motor reply. Results go to the discovery cache (discovery_cache.py)
+and are tried first next time, so a known adapter comes up in one attempt.
+
+Per adapter:
+  1. Baud: send AT+AT at each candidate baud until the adapter answers
+     (if it never answers, every baud is tried in step 2)
+  2. CAN setting: send AT+A<n> for each candidate n, then activation frames
+     to the probe motors; the first setting with a motor reply wins
+
+Usage:
+  python detect_adapter_settings.py                           # all ttyUSB/ttyACM/COM ports
+  python detect_adapter_settings.py /dev/ttyUSB0 /dev/ttyUSB1
+  python detect_adapter_settings.py COM6 --motors 6 8
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import serial
+
+from discovery_cache import DiscoveryCache
+from l91_protocol import (
+    CMD_AT_AT, COMM_TYPE_FAULT, COMM_TYPE_FEEDBACK, FrameParser, activation_frame,
+    byte_val_for_motor, can_setting_command,
+)
+
+BAUD_CANDIDATES = [921600, 115200, 460800, 230400, 1000000, 2000000]
+CAN_SETTING_CANDIDATES = list(range(0x00, 0x09))   # AT+A0 (1 Mbps) first
+PROBE_MOTORS = list(range(1, 15))                   # Motor ID table in CAN_BUS_PROTOCOL.md
+
+AT_REPLY_WAIT = 0.1
+SETTING_WAIT = 0.05
+MOTOR_REPLY_WAIT = 0.15
+
+# Comm types a motor answers with; anything else (e.g. the adapter echoing our
+# activation frames, comm type 4) is not a reply
+REPLY_COMM_TYPES = (COMM_TYPE_FEEDBACK, COMM_TYPE_FAULT)
+
+
+class DetectResult(NamedTuple):
+    port: str
+    baudrate: Optional[int]
+    can_setting: Optional[int]
+    motors: List[int]
+    attempts: int
+    elapsed: float
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.motors)
+
+
+def list_candidate_ports() -> List[str]:
+    """Serial ports that look like USB-CAN adapters"""
+    try:
+        from serial.tools import list_ports
+    except ImportError:
+        return []
+    ports = []
+    for info in list_ports.comports():
+        name = info.device
+        if 'ttyUSB' in name or 'ttyACM' in name or name.upper().startswith('COM'):
+            ports.append(name)
+    return sorted(ports)
+
+
+def _first(preferred, candidates: Sequence) -> list:
+    """candidates with the preferred value (if any) moved to the front"""
+    if preferred is None:
+        return list(candidates)
+    return [preferred] + [c for c in candidates if c != preferred]
+
+
+def _exchange(ser: serial.Serial, data: bytes, wait: float) -> bytes:
+    """Write data and collect everything that arrives within wait seconds"""
+    ser.reset_input_buffer()
+    ser.write(data)
+    reply = bytearray()
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        waiting = ser.in_waiting
+        if waiting:
+            reply.extend(ser.read(waiting))
+        else:
+            time.sleep(0.002)
+    return bytes(reply)
+
+
+def adapter_answers(reply: bytes) -> bool:
+    """Does an AT+AT reply look like it came from an adapter at the right baud?"""
+    if not reply:
+        return False
+    if b'OK' in reply or b'AT' in reply:
+        return True
+    # At the wrong baud the reply (if any) is line noise, not text
+    printable = sum(32 <= b < 127 or b in (0x0d, 0x0a) for b in reply)
+    return printable >= 0.8 * len(reply)
+
+
+def reply_motors(reply: bytes, motors: Sequence[int]) -> List[int]:
+    """Probed motors that answered in a byte string (feedback / fault frames, arbitration ID bits 8-15)"""
+    probed = set(motors)
+    found = set()
+    for frame in FrameParser().feed(reply):
+        if frame.comm_type in REPLY_COMM_TYPES:
+            motor = (frame.arbitration_id >> 8) & 0xFF
+            if motor in probed:
+                found.add(motor)
+    return sorted(found)
+
+
+def detect_adapter(port: str, motors: Sequence[int] = PROBE_MOTORS,
+                   bauds: Sequence[int] = BAUD_CANDIDATES,
+                   settings: Sequence[int] = CAN_SETTING_CANDIDATES,
+                   cached: Optional[dict] = None,
+                   stop_event: Optional[threading.Event] = None) -> DetectResult:
+    """Find a working baud + CAN setting on one adapter"""
+    start = time.monotonic()
+    cached = cached or {}
+    bauds = _first(cached.get('baudrate'), bauds)
+    settings = _first(cached.get('can_setting'), settings)
+    known = list(cached.get('motors', []))
+    motors = known + [m for m in motors if m not in known]
+    probe = b''.join(activation_frame(byte_val_for_motor(m)) for m in motors)
+    attempts = 0
+
+    def result(baud=None, setting=None, found=()):
+        return DetectResult(port, baud, setting, list(found), attempts, time.monotonic() - start)
+
+    # Step 1: which baud does the adapter answer AT+AT on?
+    answered = []
+    for baud in bauds:
+        if stop_event is not None and stop_event.is_set():
+            return result()
+        try:
+            with serial.Serial(port, baud, timeout=0) as ser:
+                if adapter_answers(_exchange(ser, CMD_AT_AT, AT_REPLY_WAIT)):
+                    answered.append(baud)
+                    break
+        except (serial.SerialException, OSError):
+            return result()
+    baud_order = answered or bauds
+
+    # Step 2: CAN setting, confirmed by a motor reply
+    for baud in baud_order:
+        try:
+            with serial.Serial(port, baud, timeout=0) as ser:
+                _exchange(ser, CMD_AT_AT, AT_REPLY_WAIT)
+                for setting in settings:
+                    if stop_event is not None and stop_event.is_set():
+                        return result()
+                    attempts += 1
+                    _exchange(ser, can_setting_command(setting), SETTING_WAIT)
+                    found = reply_motors(_exchange(ser, probe, MOTOR_REPLY_WAIT), motors)
+                    if found:
+                        return result(baud, setting, found)
+        except (serial.SerialException, OSError):
+            return result()
+
+    # Adapter answered but no motor did: still worth remembering the baud
+    return result(answered[0] if answered else None)
+
+
+def detect_all(ports: Sequence[str], motors: Sequence[int] = PROBE_MOTORS,
+               cache: Optional[DiscoveryCache] = None,
+               bauds: Sequence[int] = BAUD_CANDIDATES,
+               settings: Sequence[int] = CAN_SETTING_CANDIDATES,
+               stop_event: Optional[threading.Event] = None) -> Dict[str, DetectResult]:
+    """Probe every port concurrently; successful results are written to the cache"""
+    if not ports:
+        return {}
+    if stop_event is None:
+        stop_event = threading.Event()
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        futures = {port: pool.submit(detect_adapter, port, motors, bauds, settings,
+                                     cache.get(port) if cache else None, stop_event)
+                   for port in ports}
+        try:
+            results = {port: future.result() for port, future in futures.items()}
+        except KeyboardInterrupt:
+            # Workers check the event before each attempt, so the pool shuts down promptly
+            stop_event.set()
+            raise
+
+    if cache is not None:
+        for port, r in results.items():
+            if r.ok:
+                cache.update(port, baudrate=r.baudrate, can_setting=r.can_setting, motors=r.motors)
+            elif r.baudrate is not None:
+                cache.update(port, baudrate=r.baudrate)
+        cache.save()
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Detect baud rate and CAN setting on USB-CAN adapters')
+    parser.add_argument('ports', nargs='*', help='Serial ports (default: all ttyUSB/ttyACM/COM ports)')
+    parser.add_argument('--motors', type=int, nargs='+', default=PROBE_MOTORS,
+                       help='Motor CAN IDs to probe (default: 1-14)')
+    parser.add_argument('--bauds', type=int, nargs='+', default=BAUD_CANDIDATES,
+                       help='Serial baud candidates, in order')
+    parser.add_argument('--settings', type=lambda v: int(v, 0), nargs='+', default=CAN_SETTING_CANDIDATES,
+                       help='AT+A<n> setting candidates, in order (default: 0x00-0x08)')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore and do not update the discovery cache')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("USB-CAN ADAPTER AUTO-DETECT")
+    print("=" * 70)
+    print()
+
+    ports = args.ports or list_candidate_ports()
+    if not ports:
+        print("[ERROR] No serial ports found")
+        sys.exit(1)
+    cache = None if args.no_cache else DiscoveryCache()
+    print(f"  Probing {len(ports)} port(s) concurrently: {', '.join(ports)}")
+    print()
+
+    start = time.monotonic()
+    try:
+        results = detect_all(ports, args.motors, cache, args.bauds, args.settings)
+    except KeyboardInterrupt:
+        print("[WARNING] Interrupted, nothing saved")
+        sys.exit(1)
+    elapsed = time.monotonic() - start
+
+    for port, r in results.items():
+        if r.ok:
+            print(f"  [OK] {port}: baud={r.baudrate} AT+A 0x{r.can_setting:02x} "
+                  f"motors={r.motors} ({r.attempts} attempts, {r.elapsed:.1f} s)")
+        elif r.baudrate is not None:
+            print(f"  [WARNING] {port}: adapter answers at {r.baudrate} baud but no motor replied "
+                  f"({r.attempts} attempts, {r.elapsed:.1f} s)")
+        else:
+            print(f"  [FAIL] {port}: no adapter reply ({r.elapsed:.1f} s)")
+
+    print()
+    found = sum(r.ok for r in results.values())
+    print(f"  {found}/{len(results)} adapters configured in {elapsed:.1f} s")
+    if cache is not None:
+        print(f"  Saved to {cache.path}")
+    sys.exit(0 if found else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Discovery cache for USB-CAN adapters and the motors found on them
+A small JSON file remembering, per adapter, the serial baud rate and AT+A<n>
+CAN setting that worked and which motors answered. Later bring-ups try the
+cached settings first; health checks use the cached motor lists.
+
+Adapters are keyed by port, and also carry the USB serial number when the OS
+reports one, so an adapter that re-enumerates on a different ttyUSB/COM port
+is still recognised.
+
+Location: $L91_DISCOVERY_CACHE, or ~/.l91_discovery.json
+
+Usage:
+  python discovery_cache.py            # print the cache
+  python discovery_cache.py --clear
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_PATH = os.environ.get('L91_DISCOVERY_CACHE',
+                              os.path.join(os.path.expanduser('~'), '.l91_discovery.json'))
+
+
+def usb_serial_number(port: str) -> Optional[str]:
+    """USB serial number of a serial port, if pyserial can see one"""
+    try:
+        from serial.tools import list_ports
+    except ImportError:
+        return None
+    for info in list_ports.comports():
+        if info.device == port:
+            return info.serial_number
+    return None
+
+
+class DiscoveryCache:
+    """JSON-backed adapter settings and motor lists"""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.adapters: Dict[str, dict] = {}
+        self.load()
+
+    def load(self):
+        """Read the cache file (a missing or unreadable file means an empty cache)"""
+        try:
+            with open(self.path) as f:
+                self.adapters = json.load(f).get('adapters', {})
+        except (OSError, ValueError):
+            self.adapters = {}
+
+    def save(self):
+        """Write the cache atomically (write a temp file, then rename)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'adapters': self.adapters}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def get(self, port: str) -> Optional[dict]:
+        """Entry for a port, falling back to a match on USB serial number"""
+        entry = self.adapters.get(port)
+        if entry is not None:
+            return entry
+        serial_number = usb_serial_number(port)
+        if serial_number:
+            for entry in self.adapters.values():
+                if entry.get('serial_number') == serial_number:
+                    return entry
+        return None
+
+    def update(self, port: str, **fields) -> dict:
+        """Merge fields into a port's entry (stamped with the update time)"""
+        entry = self.adapters.setdefault(port, {'port': port})
+        entry.update(fields)
+        entry['updated'] = time.time()
+        if 'serial_number' not in entry:
+            entry['serial_number'] = usb_serial_number(port)
+        return entry
+
+    def motors(self, port: str) -> List[int]:
+        """Motor ids last seen on a port"""
+        entry = self.get(port)
+        return list(entry.get('motors', [])) if entry else []
+
+    def known_ports(self) -> List[str]:
+        return sorted(self.adapters)
+
+    def clear(self):
+        self.adapters = {}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Show or clear the USB-CAN discovery cache')
+    parser.add_argument('--path', default=DEFAULT_PATH, help=f'Cache file (default: {DEFAULT_PATH})')
+    parser.add_argument('--clear', action='store_true', help='Remove all entries')
+    args = parser.parse_args()
+
+    cache = DiscoveryCache(args.path)
+    if args.clear:
+        cache.clear()
+        cache.save()
+        print(f"[OK] Cleared {args.path}")
+        return
+
+    print("=" * 70)
+    print(f"DISCOVERY CACHE: {args.path}")
+    print("=" * 70)
+    if not cache.adapters:
+        print("  (empty)")
+        return
+    for port in cache.known_ports():
+        entry = cache.adapters[port]
+        updated = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.get('updated', 0)))
+        setting = entry.get('can_setting')
+        print(f"  {port}: baud={entry.get('baudrate')} "
+              f"can_setting={'-' if setting is None else f'0x{setting:02x}'} "
+              f"motors={entry.get('motors', [])} serial={entry.get('serial_number')} ({updated})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+ESP32 CAN-to-L91 Bridge Latency Probe
+Sends speed commands to the ESP32 bridge over CAN and timestamps the matching
+L91 JOG frame on a serial tap of the bridge's Serial2 TX line.
+
+Wiring:
+  - CAN: host SocketCAN interface (can0) on the same bus as the ESP32 TWAI pins
+  - Tap: USB-serial adapter RX -> ESP32 GPIO 16 (Serial2 TX), GND -> GND
+
+By default only zero-speed (stop) commands are sent, so the motors on the
+bridge do not move while probing.
+
+Note: the measured time includes the host's own USB latency on both the CAN
+interface and the tap adapter. Pass --console to also collect the firmware's
+self-reported "Bridge: ... CAN->L91 avg=..us max=..us" line for comparison.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import serial
+
+try:
+    import can
+except ImportError:
+    can = None
+
+BAUD = 921600
+CONSOLE_BAUD = 921600
+JOG_PREFIX = bytes([0x41, 0x54, 0x90, 0x07, 0xe8])  # AT 90 07 e8
+
+
+def wait_for_jog(tap, can_id, buf, timeout):
+    """Read the tap until a JOG frame for can_id appears; returns perf_counter() or None"""
+    pattern = JOG_PREFIX + bytes([can_id])
+    deadline = time.perf_counter() + timeout
+
+    while time.perf_counter() < deadline:
+        chunk = tap.read(tap.in_waiting or 1)
+        if not chunk:
+            continue
+        now = time.perf_counter()
+        buf.extend(chunk)
+        idx = buf.find(pattern)
+        if idx != -1:
+            del buf[:idx + len(pattern)]
+            return now
+        # Keep only a tail long enough to hold a split prefix
+        if len(buf) > 64:
+            del buf[:-len(pattern)]
+
+    return None
+
+
+def read_bridge_status(console_port, wait=6.0):
+    """
+    Collect the firmware's periodic 'Bridge:' status line from the USB console.
+    The console also carries the binary IMU stream, so the line is preceded by
+    frame bytes rather than a newline: search for the prefix anywhere and read
+    up to the next newline (the firmware writes the whole line in one write).
+    """
+    prefix = b'Bridge:'
+    try:
+        with serial.Serial(console_port, CONSOLE_BAUD, timeout=0.2) as console:
+            deadline = time.time() + wait
+            line_buf = b''
+            while time.time() < deadline:
+                line_buf += console.read(256)
+                start = line_buf.find(prefix)
+                if start < 0:
+                    line_buf = line_buf[-(len(prefix) - 1):]   # keep a prefix split across reads
+                    continue
+                end = line_buf.find(b'\n', start)
+                if end >= 0:
+                    return line_buf[start:end].decode(errors='replace').strip()
+                line_buf = line_buf[start:start + 256]
+    except serial.SerialException as e:
+        print(f"  [WARNING] Cannot read console {console_port}: {e}")
+    return None
+
+
+def run_probe(channel, tap_port, can_id, count, speed_byte, interval, timeout):
+    """Send count CAN commands and return the list of CAN-in to L91-out latencies (seconds)"""
+    bus = can.interface.Bus(channel=channel, interface='socketcan')
+    tap = serial.Serial(tap_port, BAUD, timeout=0.001)
+    latencies = []
+    missed = 0
+    buf = bytearray()
+
+    try:
+        tap.reset_input_buffer()
+        msg = can.Message(arbitration_id=can_id, data=[speed_byte & 0xFF], is_extended_id=False)
+
+        for i in range(count):
+            buf.clear()
+            t_send = time.perf_counter()
+            bus.send(msg)
+            t_seen = wait_for_jog(tap, can_id, buf, timeout)
+
+            if t_seen is None:
+                missed += 1
+            else:
+                latencies.append(t_seen - t_send)
+
+            time.sleep(interval)
+    finally:
+        tap.close()
+        bus.shutdown()
+
+    return latencies, missed
+
+
+def print_summary(latencies, missed):
+    """Print latency distribution in milliseconds"""
+    print()
+    print("=" * 70)
+    print("CAN-IN -> L91-OUT LATENCY (host measured)")
+    print("=" * 70)
+    print()
+
+    if not latencies:
+        print("[FAIL] No L91 frames seen on the tap")
+        print("Check the tap wiring (GPIO 16 -> adapter RX) and that the bridge is running.")
+        return
+
+    ms = sorted(x * 1000.0 for x in latencies)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+
+    print(f"  Samples:  {len(ms)} (missed {missed})")
+    print(f"  Min:      {ms[0]:.3f} ms")
+    print(f"  Median:   {statistics.median(ms):.3f} ms")
+    print(f"  Mean:     {statistics.fmean(ms):.3f} ms")
+    print(f"  P99:      {p99:.3f} ms")
+    print(f"  Max:      {ms[-1]:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure ESP32 bridge CAN-in to L91-out latency')
+    parser.add_argument('--channel', default='can0',
+                       help='SocketCAN interface connected to the bridge (default: can0)')
+    parser.add_argument('--tap', default='/dev/ttyUSB2',
+                       help='Serial port tapping ESP32 Serial2 TX (default: /dev/ttyUSB2)')
+    parser.add_argument('--console', default=None,
+                       help='ESP32 USB console port, to read the firmware latency summary')
+    parser.add_argument('--can-id', type=lambda v: int(v, 0), default=0x0C,
+                       help='Bridge motor CAN ID 0x0C-0x0E (default: 0x0C)')
+    parser.add_argument('--count', type=int, default=200,
+                       help='Number of commands to send (default: 200)')
+    parser.add_argument('--speed-byte', type=int, default=0,
+                       help='Signed speed byte -127..127 (default: 0 = stop, motor stays still)')
+    parser.add_argument('--interval', type=float, default=0.01,
+                       help='Pause between commands in seconds (default: 0.01)')
+    parser.add_argument('--timeout', type=float, default=0.2,
+                       help='Per-command wait for the L91 frame in seconds (default: 0.2)')
+    args = parser.parse_args()
+
+    if can is None:
+        print("[ERROR] python-can is required: pip install python-can")
+        sys.exit(1)
+
+    print("=" * 70)
+    print("ESP32 CAN-TO-L91 BRIDGE LATENCY PROBE")
+    print("=" * 70)
+    print()
+    print(f"CAN interface: {args.channel}")
+    print(f"Serial2 tap:   {args.tap} @ {BAUD}")
+    print(f"Motor CAN ID:  0x{args.can_id:02X}, speed byte {args.speed_byte}")
+    print()
+
+    latencies, missed = run_probe(args.channel, args.tap, args.can_id, args.count,
+                                  args.speed_byte, args.interval, args.timeout)
+    print_summary(latencies, missed)
+
+    if args.console:
+        print()
+        status = read_bridge_status(args.console)
+        if status:
+            print(f"  Firmware: {status}")
+        else:
+            print("  Firmware: no 'Bridge:' status line received")
+
+    print()
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+        sys.exit(1)
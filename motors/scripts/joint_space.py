@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Joint-space velocity API on top of the motor registry
+Callers set named joint velocities (rad/s) as one vector; the registry
+supplies each joint's motor, byte value and adapter. Every call encodes all
+JOG frames in one NumPy step into a frame buffer whose rows are grouped by
+adapter, then writes one contiguous slice per adapter.
+
+Adapters are written back-to-back from the calling thread: a write returns
+once the bytes are in the OS serial buffer, so the adapters transmit at the
+same time, and handing the writes to threads would cost more than the whole
+update. The writes go through MotorRegistry.jog_burst, so each device's
+last JOG frame and speed are tracked in the registry as for single jog()
+calls, and a port whose frames are all unchanged is skipped until the
+registry's hold_refresh has passed (see motor_registry.py).
+
+Default joint map: the recommended ID assignment in
+docs/MOTOR_CONFIGURATION_GUIDE.md (motors configured to single CAN IDs),
+15 joints split over the two Jetson adapters.
+
+Usage:
+  python joint_space.py --benchmark                        # per-call overhead, no hardware
+  python joint_space.py --bus /dev/ttyUSB0:1,2,3,4,9,10,11,12 --bus /dev/ttyUSB1:5,6,7,8,13,14,15 \\
+      --set head_pan=0.2 --duration 1
+"""
+
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from l91_protocol import jog_frame
+from motor_controller import JOG_FLAG_OFFSET, JOG_FULL_SCALE, JOG_SPEED_OFFSET, encode_jog_speeds
+from motor_registry import MotorRegistry
+
+import _paths  # ../../tools on sys.path for metrics
+from metrics import histogram
+
+CALL_SECONDS = histogram('joint_space_call_seconds', 'JointSpace.set_velocities() overhead')
+
+# Joint name -> motor CAN ID (docs/MOTOR_CONFIGURATION_GUIDE.md, "Recommended ID Assignment")
+JOINT_MAP: Dict[str, int] = {
+    'left_shoulder_pan': 1,
+    'left_shoulder_pitch': 2,
+    'left_elbow': 3,
+    'left_wrist': 4,
+    'right_shoulder_pan': 5,
+    'right_shoulder_pitch': 6,
+    'right_elbow': 7,
+    'right_wrist': 8,
+    'head_pan': 9,
+    'head_tilt': 10,
+    'waist': 11,
+    'aux_12': 12,
+    'aux_13': 13,
+    'aux_14': 14,
+    'aux_15': 15,
+}
+
+# Left arm, head and waist on USB0; right arm and the rest on USB1
+DEFAULT_PORTS: Dict[int, str] = {m: '/dev/ttyUSB0' for m in (1, 2, 3, 4, 9, 10, 11, 12)}
+DEFAULT_PORTS.update({m: '/dev/ttyUSB1' for m in (5, 6, 7, 8, 13, 14, 15)})
+
+OVERHEAD_TARGET = 100e-6   # seconds per 15-joint update
+
+Velocities = Union[Sequence[float], np.ndarray, Mapping[str, float]]
+
+
+class JointSpace:
+    """Named joint velocities -> JOG frames on the right adapters"""
+
+    def __init__(self, registry: MotorRegistry, joints: Optional[Mapping[str, int]] = None,
+                 jog_full_scale: float = JOG_FULL_SCALE):
+        joints = JOINT_MAP if joints is None else joints
+        self.registry = registry
+        self.names: List[str] = list(joints)
+        self.jog_full_scale = jog_full_scale
+
+        routes = [registry.route(joints[name]) for name in self.names]
+        devices = {}
+        for name, route in zip(self.names, routes):
+            other = devices.setdefault(route.device, name)
+            if other != name:
+                raise ValueError(f"Joints '{other}' and '{name}' address the same motor "
+                                 f"({route.port}, byte 0x{route.byte_val:02x})")
+
+        # Frame rows are grouped by port; _order[row] is the joint index of that row
+        # and _slices holds (port, first row, end row, registry states of those rows)
+        self.ports: List[str] = []
+        for route in routes:
+            if route.port not in self.ports:
+                self.ports.append(route.port)
+        self._order = np.array(sorted(range(len(routes)), key=lambda j: self.ports.index(routes[j].port)),
+                               dtype=np.intp)
+        self._row_of = {self.names[j]: row for row, j in enumerate(self._order)}
+        self._slices = []
+        row = 0
+        for port in self.ports:
+            count = sum(1 for r in routes if r.port == port)
+            states = [registry.state(routes[j].motor) for j in self._order[row:row + count]]
+            self._slices.append((port, row, row + count, states))
+            row += count
+
+        self._frames = np.frombuffer(
+            b''.join(jog_frame(routes[j].byte_val, 0.0, 1) for j in self._order),
+            dtype=np.uint8).reshape(len(routes), -1).copy()
+        self._velocity = np.zeros(len(routes))      # row order
+        self.group = registry.define_group('joint_space', [joints[name] for name in self.names])
+        self.calls = 0
+        self.writes = 0
+        self.skipped = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.names)
+
+    @property
+    def velocities(self) -> Dict[str, float]:
+        """Last commanded velocity per joint (rad/s)"""
+        return {name: float(self._velocity[self._row_of[name]]) for name in self.names}
+
+    def set_velocities(self, velocities: Velocities) -> int:
+        """Command joint velocities in rad/s: a vector in joint order, or {name: value} for a subset
+
+        Returns the number of adapter writes made.
+        """
+        start = time.perf_counter()
+        if isinstance(velocities, Mapping):
+            for name, value in velocities.items():
+                self._velocity[self._row_of[name]] = value
+        else:
+            self._velocity[:] = np.asarray(velocities, dtype=float)[self._order]
+
+        speeds = np.clip(self._velocity / self.jog_full_scale, -1.0, 1.0)
+        values = encode_jog_speeds(speeds)
+        frames = self._frames
+        frames[:, JOG_FLAG_OFFSET] = speeds != 0.0
+        frames[:, JOG_SPEED_OFFSET] = values >> 8
+        frames[:, JOG_SPEED_OFFSET + 1] = values & 0xFF
+
+        writes = 0
+        jog_burst = self.registry.jog_burst
+        for port, lo, hi, states in self._slices:
+            if jog_burst(port, states, frames[lo:hi].tobytes(), speeds[lo:hi].tolist()):
+                writes += 1
+            else:
+                self.skipped += 1
+
+        self.calls += 1
+        self.writes += writes
+        CALL_SECONDS.observe(time.perf_counter() - start)
+        return writes
+
+    def stop(self):
+        """Stop every joint with one burst per adapter"""
+        self._velocity[:] = 0.0
+        return self.registry.broadcast(self.group.name, 'stop')
+
+
+class _NullAdapter:
+    """Adapter stand-in for --benchmark: accepts writes and does nothing"""
+
+    def write(self, data: bytes):
+        pass
+
+    def send_many(self, frames):
+        pass
+
+    def flush(self):
+        pass
+
+
+def benchmark(calls: int, hold_refresh: float = 0.0) -> Dict[str, float]:
+    """Per-call set_velocities() overhead for the 15-joint map against no-op adapters"""
+    registry = MotorRegistry.from_can_ids(DEFAULT_PORTS, hold_refresh=hold_refresh)
+    for port in set(DEFAULT_PORTS.values()):
+        registry.attach(port, _NullAdapter())
+    joints = JointSpace(registry)
+
+    rng = np.random.default_rng(0)
+    commands = rng.uniform(-2.0, 2.0, size=(calls, joints.size))
+    samples = np.empty(calls)
+    for i in range(calls):
+        t0 = time.perf_counter()
+        joints.set_velocities(commands[i])
+        samples[i] = time.perf_counter() - t0
+    samples.sort()
+    return {
+        'joints': joints.size,
+        'calls': calls,
+        'p50': samples[calls // 2],
+        'p99': samples[min(calls - 1, int(calls * 0.99))],
+        'max': samples[-1],
+    }
+
+
+def parse_velocity(spec: str):
+    """'head_pan=0.2' -> ('head_pan', 0.2)"""
+    name, _, value = spec.partition('=')
+    if not value:
+        raise ValueError(f"Velocity must be JOINT=RAD_PER_S, got {spec!r}")
+    return name, float(value)
+
+
+def main():
+    import argparse
+    from l91_adapter import L91Adapter, parse_bus
+
+    parser = argparse.ArgumentParser(description='Joint-space velocity commands over the motor registry')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Measure per-call overhead for the 15-joint map (no hardware)')
+    parser.add_argument('--calls', type=int, default=20000, help='Benchmark calls (default: 20000)')
+    parser.add_argument('--bus', action='append', metavar='PORT:M1,M2',
+                       help='Adapter and the motor CAN IDs on it (default: the Jetson split)')
+    parser.add_argument('--set', action='append', default=[], metavar='JOINT=RAD_PER_S',
+                       help='Joint velocity to command (repeatable)')
+    parser.add_argument('--duration', type=float, default=1.0,
+                       help='Seconds to hold the velocities before stopping (default: 1)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("JOINT SPACE")
+    print("=" * 70)
+    print()
+
+    if args.benchmark:
+        r = benchmark(args.calls)
+        print(f"  {r['joints']} joints, {r['calls']} calls: p50 {r['p50'] * 1e6:.1f} us  "
+              f"p99 {r['p99'] * 1e6:.1f} us  max {r['max'] * 1e6:.1f} us")
+        marker = "[OK]" if r['p50'] < OVERHEAD_TARGET else "[WARNING]"
+        print(f"  {marker} Target: < {OVERHEAD_TARGET * 1e6:.0f} us per update")
+        return
+
+    if args.bus:
+        ports = {}
+        for spec in args.bus:
+            port, motors = parse_bus(spec)
+            ports.update({m: port for m in motors})
+    else:
+        ports = DEFAULT_PORTS
+    registry = MotorRegistry.from_can_ids(ports)
+    joints = JointSpace(registry, {n: m for n, m in JOINT_MAP.items() if m in ports})
+
+    adapters = []
+    try:
+        for port in joints.ports:
+            adapter = L91Adapter(port)
+            if not adapter.connect():
+                return
+            registry.attach(port, adapter)
+            adapters.append(adapter)
+        registry.broadcast(joints.group.name, 'activate')
+
+        joints.set_velocities(dict(parse_velocity(s) for s in args.set))
+        for name, value in joints.velocities.items():
+            if value:
+                print(f"  {name:<22} {value:+.3f} rad/s")
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+    finally:
+        if len(adapters) == len(joints.ports):
+            result = joints.stop()
+            print(f"  [OK] Stopped {result.frames} joints in {result.time_to_last_frame * 1000:.2f} ms")
+        registry.close()
+        for adapter in adapters:
+            adapter.disconnect()
+
+
+if __name__ == '__main__':
+    main()
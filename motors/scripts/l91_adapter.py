@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+USB-CAN adapter connection speaking the L91 protocol over serial
+Wraps the connect / AT+AT / AT+A0 / send / read-response sequence that the
+motor scripts repeat, and optionally logs every TX/RX frame to a CanRecorder. With tracing enabled
+(motor_trace.py) each write and read is recorded as trace spans. Ports get the
+low-latency settings from serial_tuning.py on connect.
+"""
+
+import select
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import serial
+
+from l91_protocol import (
+    CAN_SETTING_1M, CMD_AT_AT, Frame, FrameParser, can_setting_command, parse_frames,
+)
+from motor_trace import TRACER
+from serial_tuning import tune
+
+import _paths  # ../../tools on sys.path for metrics
+from metrics import counter, gauge
+
+TX_BYTES = counter('l91_tx_bytes_total', 'Bytes written to the USB-CAN adapter', ['port'])
+TX_WRITES = counter('l91_tx_writes_total', 'Serial writes to the USB-CAN adapter', ['port'])
+RX_FRAMES = counter('l91_rx_frames_total', 'Frames parsed from the USB-CAN adapter', ['port'])
+RX_SKIPPED = gauge('l91_rx_skipped_bytes', 'RX bytes that were not part of a frame', ['port'])
+
+BAUD = 921600
+
+
+class L91Adapter:
+    """One USB-CAN adapter (e.g. /dev/ttyUSB0, COM6)"""
+
+    def __init__(self, port: str, baudrate: int = BAUD, adapter_id: int = 0,
+                 recorder=None, timeout: float = 0.01, can_setting: int = CAN_SETTING_1M,
+                 low_latency: bool = True):
+        self.port = port
+        self.baudrate = baudrate
+        self.can_setting = can_setting
+        self.adapter_id = adapter_id
+        self.recorder = recorder
+        self.timeout = timeout
+        self.ser: Optional[serial.Serial] = None
+        self.low_latency = low_latency
+        self.tuning = None      # serial_tuning.TuningResult once connected
+        self.parser = FrameParser()
+        self._awaiting = {}     # motor id -> trace span id of the unanswered write
+        self._trace_seq = 0
+        self._tx_bytes = TX_BYTES.labels(port)
+        self._tx_writes = TX_WRITES.labels(port)
+        self._rx_frames = RX_FRAMES.labels(port)
+        RX_SKIPPED.labels(port).set_function(lambda parser=self.parser: parser.skipped_bytes)
+        if recorder is not None:
+            self.adapter_id = recorder.register_adapter(port, adapter_id)
+
+    def connect(self, initialize: bool = True) -> bool:
+        """Open the serial port and (optionally) run AT+AT / AT+A0"""
+        try:
+            self.ser = serial.Serial(self.port, self.baudrate, timeout=self.timeout)
+            if self.low_latency:
+                self.tuning = tune(self.ser, self.port)
+            time.sleep(0.5)
+            if initialize:
+                self.initialize()
+            return True
+        except Exception as e:
+            print(f"  [FAIL] Cannot connect to {self.port}: {e}")
+            return False
+
+    def initialize(self, settle: float = 0.3):
+        """Send AT+AT and the AT+A<n> bit-timing command, draining the replies"""
+        for cmd in (CMD_AT_AT, can_setting_command(self.can_setting)):
+            self.write(cmd)
+            time.sleep(settle)
+            self.drain()
+
+    def write(self, data: bytes):
+        """Write raw bytes (one or more frames, or an AT+ command)"""
+        if TRACER.enabled:
+            self._write_traced(data)
+        else:
+            self.ser.write(data)
+        self._tx_writes.inc()
+        self._tx_bytes.inc(len(data))
+        if self.recorder is not None:
+            self.recorder.record_tx(self.adapter_id, data)
+
+    def _write_traced(self, data: bytes):
+        t0 = time.perf_counter_ns()
+        self.ser.write(data)
+        t1 = time.perf_counter_ns()
+        self.ser.flush()
+        t2 = time.perf_counter_ns()
+        TRACER.complete('enqueue', t0, t1, args={'port': self.port, 'bytes': len(data)})
+        TRACER.complete('write', t1, t2, args={'port': self.port})
+        for frame in parse_frames(data):
+            motor = frame.byte_val >> 3
+            previous = self._awaiting.pop(motor, None)
+            if previous is not None:
+                TRACER.async_end(f'motor {motor}', previous, t2, reply=False)
+            self._trace_seq += 1
+            span_id = f'{self.port}:{motor}:{self._trace_seq}'
+            self._awaiting[motor] = span_id
+            TRACER.async_begin(f'motor {motor}', span_id, t2, can_id=f'{frame.can_id:08x}')
+
+    def send(self, frame: bytes):
+        """Send one frame"""
+        self.write(frame)
+
+    def send_many(self, frames: Iterable[bytes]):
+        """Send several frames as a single write"""
+        with TRACER.span('encode'):
+            payload = b''.join(frames)
+        self.write(payload)
+
+    def read_frames(self, timeout: float = 0.0) -> List[Frame]:
+        """Return frames that are already waiting; with timeout > 0, wait for at least one"""
+        deadline = time.monotonic() + timeout
+        while True:
+            waiting = self.ser.in_waiting
+            if waiting:
+                if TRACER.enabled:
+                    frames = self._read_traced(waiting)
+                else:
+                    frames = self.parser.feed(self.ser.read(waiting))
+                if frames:
+                    self._rx_frames.inc(len(frames))
+                    if self.recorder is not None:
+                        self.recorder.record_rx(self.adapter_id, frames)
+                    return frames
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            self._wait_readable(remaining)
+
+    def _wait_readable(self, timeout: float):
+        """Sleep until RX data arrives (select on POSIX) or timeout passes"""
+        try:
+            select.select([self.ser.fileno()], [], [], timeout)
+        except (OSError, ValueError, AttributeError):
+            time.sleep(min(timeout, 0.001))
+
+    def _read_traced(self, waiting: int) -> List[Frame]:
+        t0 = time.perf_counter_ns()
+        if not self.parser.buffered:
+            TRACER.instant('first_rx_byte', ts_ns=t0, port=self.port, bytes=waiting)
+        data = self.ser.read(waiting)
+        t1 = time.perf_counter_ns()
+        frames = self.parser.feed(data)
+        t2 = time.perf_counter_ns()
+        TRACER.complete('decode', t1, t2, args={'port': self.port, 'frames': len(frames)})
+        for frame in frames:
+            TRACER.instant('frame_complete', ts_ns=t2, can_id=f'{frame.can_id:08x}')
+            span_id = self._awaiting.pop((frame.arbitration_id >> 8) & 0xFF, None)
+            if span_id is not None:
+                TRACER.async_end(f'motor {(frame.arbitration_id >> 8) & 0xFF}', span_id, t2, reply=True)
+        return frames
+
+    def read_response(self, timeout: float = 1.0, quiet: float = 0.2) -> List[Frame]:
+        """Collect frames until nothing new arrives for `quiet` seconds"""
+        frames = []
+        start = time.monotonic()
+        last_data = start
+        while time.monotonic() - start < timeout:
+            new = self.read_frames()
+            if new:
+                frames.extend(new)
+                last_data = time.monotonic()
+            elif frames and time.monotonic() - last_data > quiet:
+                break
+            else:
+                time.sleep(0.005)
+        return frames
+
+    def transact(self, frame: bytes, timeout: float = 1.0, quiet: float = 0.2) -> List[Frame]:
+        """Send a frame and collect its response frames"""
+        self.drain()
+        self.send(frame)
+        return self.read_response(timeout, quiet)
+
+    def flush(self):
+        """Block until written bytes have left the OS serial buffer"""
+        if self.ser:
+            self.ser.flush()
+
+    def drain(self):
+        """Discard anything waiting in the RX buffer (still recorded)"""
+        if self.ser:
+            while self.ser.in_waiting > 0:
+                self.read_frames()
+                time.sleep(0.01)
+
+    def disconnect(self):
+        """Close serial connection"""
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+
+def parse_bus(spec: str) -> Tuple[str, List[int]]:
+    """'/dev/ttyUSB0:6,7' -> ('/dev/ttyUSB0', [6, 7]); COM ports work the same way"""
+    port, _, motors = spec.rpartition(':')
+    if not port or not motors:
+        raise ValueError(f"Bus spec must be PORT:MOTOR[,MOTOR...], got {spec!r}")
+    return port, [int(m) for m in motors.split(',')]
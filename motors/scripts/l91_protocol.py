@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+L91 protocol helpers shared by the motor scripts
+Frame encoding/parsing and JOG speed encoding, as documented in CAN_BUS_PROTOCOL.md.
+Used by the recorder, controller, runtime, registry and health tools; the
+older standalone test/move scripts still build their frames inline.
+
+Frame layout on the USB-CAN adapter serial line:
+  41 54 | 4 header bytes | DLC | data (DLC bytes) | 0d 0a
+   "AT"    e.g. 20 07 e8 34
+
+The 4 header bytes are handled as one big-endian word, called can_id below
+(e.g. 0x2007e834). Its top byte is the command type (0x20 extended activation,
+0x00 standard activation, 0x90 JOG) and its low byte is the motor byte value
+(0x34 for Motor 6, 0x44 for Motor 8, ...).
+
+The adapter packs the 29-bit CAN arbitration ID as (id << 3) | 0x04, which is
+why byte values are motor_id * 8 + 4. Motor replies use the same packing:
+  41 54 10 00 37 ec 08 ...  ->  arbitration ID 0x020006fd
+  comm type 2 (feedback), motor 6, host 0xfd
+Feedback data is assumed to be four big-endian u16 fields (position,
+velocity, torque, temperature * 10), the first three mapping linearly onto
+the ranges below. UNVERIFIED: this is the RobStride private-protocol
+feedback layout (comm type 2), not something CAN_BUS_PROTOCOL.md documents.
+The only reply captured there, 10 00 37 ec 08 00 c4 56 00 02 03 09 07, is a
+LoadParams response and decodes as nonsense (-12.5 rad, 231.1 C), so treat
+decode_feedback output as provisional until it is checked against a motor.
+"""
+
+import struct
+from typing import List, NamedTuple, Optional
+
+AT_PREFIX = b'AT'
+CRLF = b'\r\n'
+MAX_DLC = 8
+HEADER_LEN = 7   # AT + 4 header bytes + DLC
+MIN_FRAME_LEN = HEADER_LEN + len(CRLF)
+MAX_FRAME_LEN = HEADER_LEN + MAX_DLC + len(CRLF)
+
+# Adapter initialization (AT+AT, then AT+A0 = 1 Mbps CAN)
+CMD_AT_AT = bytes.fromhex("41542b41540d0a")
+CMD_AT_A0 = bytes.fromhex("41542b41000d0a")
+ADAPTER_INIT = (CMD_AT_AT, CMD_AT_A0)
+
+# AT+A<n>: the byte after "AT+A" selects the CAN bit timing (0x00 = 1 Mbps)
+CAN_SETTING_1M = 0x00
+
+BASE_ADDRESS = 0x07e8
+
+# Command types (top header byte)
+TYPE_STANDARD = 0x00
+TYPE_EXTENDED = 0x20
+TYPE_JOG = 0x90
+
+# Arbitration ID packing used by the adapter for extended frames
+EXT_ID_FLAG = 0x04
+COMM_TYPE_FEEDBACK = 0x02
+
+# Feedback ranges (Robstride 02; pass rs03 ranges to decode_feedback for 03 motors)
+FEEDBACK_POSITION_RANGE = 4.0 * 3.141592653589793   # rad, +/-
+FEEDBACK_VELOCITY_RANGE = 44.0                       # rad/s, +/-
+FEEDBACK_TORQUE_RANGE = 17.0                         # Nm, +/-
+RS03_VELOCITY_RANGE = 20.0
+RS03_TORQUE_RANGE = 60.0
+
+COMM_TYPE_FAULT = 0x15
+
+# Feedback status byte (arbitration ID bits 16-23): fault bits 0-5, mode bits 6-7
+FAULT_BITS = (
+    (0x01, 'undervoltage'),
+    (0x02, 'overcurrent'),
+    (0x04, 'overtemperature'),
+    (0x08, 'magnetic_encoder'),
+    (0x10, 'hall_encoder'),
+    (0x20, 'uncalibrated'),
+)
+MODES = ('reset', 'calibration', 'run', 'unknown')
+
+JOG_COMMAND = 0x0570
+SPEED_SCALE = 3283.0
+SPEED_ZERO = 0x7fff
+
+
+class Frame(NamedTuple):
+    """One L91 frame; can_id is the 4 header bytes as a big-endian word"""
+    can_id: int
+    data: bytes
+
+    @property
+    def command_type(self) -> int:
+        return (self.can_id >> 24) & 0xFF
+
+    @property
+    def byte_val(self) -> int:
+        return self.can_id & 0xFF
+
+    @property
+    def arbitration_id(self) -> int:
+        return self.can_id >> 3
+
+    @property
+    def comm_type(self) -> int:
+        return (self.can_id >> 27) & 0x1F
+
+    def encode(self) -> bytes:
+        return encode_frame(self.can_id, self.data)
+
+
+class Feedback(NamedTuple):
+    """Decoded motor feedback (comm type 2) frame"""
+    motor_id: int
+    position: float      # rad
+    velocity: float      # rad/s
+    torque: float        # Nm
+    temperature: float   # C
+    status: int          # arbitration ID bits 16-23 (fault bits and mode)
+
+    @property
+    def faults(self) -> List[str]:
+        return [name for bit, name in FAULT_BITS if self.status & bit]
+
+    @property
+    def mode(self) -> str:
+        return MODES[(self.status >> 6) & 0x03]
+
+
+def make_can_id(command_type: int, byte_val: int, address: int = BASE_ADDRESS) -> int:
+    """Build the 4 header bytes for a command type and motor byte value"""
+    return ((command_type & 0xFF) << 24) | ((address & 0xFFFF) << 8) | (byte_val & 0xFF)
+
+
+def can_setting_command(setting: int) -> bytes:
+    """AT+A<setting> bit-timing command (setting 0x00 is CMD_AT_A0)"""
+    return b'AT+A' + bytes([setting & 0xFF]) + CRLF
+
+
+def byte_val_for_motor(motor_id: int) -> int:
+    """Motor CAN ID to the header byte value (Motor 6 -> 0x34)"""
+    return ((motor_id << 3) | EXT_ID_FLAG) & 0xFF
+
+
+def motor_for_byte_val(byte_val: int) -> int:
+    """Header byte value to motor CAN ID (0x34 -> Motor 6)"""
+    return (byte_val & 0xFF) >> 3
+
+
+def encode_frame(can_id: int, data: bytes) -> bytes:
+    """Encode AT + header + DLC + data + CRLF"""
+    if len(data) > MAX_DLC:
+        raise ValueError(f"L91 frame data is limited to {MAX_DLC} bytes, got {len(data)}")
+    return AT_PREFIX + struct.pack('>IB', can_id, len(data)) + bytes(data) + CRLF
+
+
+def encode_speed(speed: float) -> int:
+    """Normalized speed (-1.0 to 1.0) to the 16-bit JOG speed value"""
+    if speed == 0.0:
+        speed_val = SPEED_ZERO
+    elif speed > 0.0:
+        speed_val = 0x8000 + int(speed * SPEED_SCALE)
+    else:
+        speed_val = SPEED_ZERO + int(speed * SPEED_SCALE)
+    return max(0, min(0xFFFF, speed_val))
+
+
+def decode_speed(speed_val: int) -> float:
+    """Inverse of encode_speed (to within one count)"""
+    if speed_val == SPEED_ZERO:
+        return 0.0
+    if speed_val >= 0x8000:
+        return (speed_val - 0x8000) / SPEED_SCALE
+    return (speed_val - SPEED_ZERO) / SPEED_SCALE
+
+
+def activation_frame(byte_val: int, extended: bool = True) -> bytes:
+    """Activation command: extended (AT 20 ... 08 00 c4 ...) or standard (AT 00 ... 01 00)"""
+    if extended:
+        return encode_frame(make_can_id(TYPE_EXTENDED, byte_val), b'\x00\xc4\x00\x00\x00\x00\x00\x00')
+    return encode_frame(make_can_id(TYPE_STANDARD, byte_val), b'\x00')
+
+
+def jog_frame(byte_val: int, speed: float, flag: Optional[int] = None) -> bytes:
+    """JOG command (extended format); flag defaults to 1 for non-zero speed, else 0"""
+    if flag is None:
+        flag = 0 if speed == 0.0 else 1
+    speed_val = encode_speed(speed)
+    data = struct.pack('>HHBBH', JOG_COMMAND, 0x0000, 0x07, flag, speed_val)
+    return encode_frame(make_can_id(TYPE_JOG, byte_val), data)
+
+
+def stop_frame(byte_val: int) -> bytes:
+    """JOG command with speed 0.0 and flag 0"""
+    return jog_frame(byte_val, 0.0, 0)
+
+
+def _u16_to_range(value: int, span: float) -> float:
+    return value * (2.0 * span / 65535.0) - span
+
+
+def is_feedback(frame: Frame) -> bool:
+    """True for a motor feedback reply (comm type 2, 8 data bytes)"""
+    return frame.comm_type == COMM_TYPE_FEEDBACK and len(frame.data) == 8
+
+
+def decode_feedback(frame: Frame,
+                    velocity_range: float = FEEDBACK_VELOCITY_RANGE,
+                    torque_range: float = FEEDBACK_TORQUE_RANGE) -> Optional[Feedback]:
+    """Decode a feedback reply; returns None for any other frame (layout unverified, see module docstring)"""
+    if not is_feedback(frame):
+        return None
+    pos, vel, torque, temp = struct.unpack('>HHHH', frame.data)
+    arb = frame.arbitration_id
+    return Feedback(
+        motor_id=(arb >> 8) & 0xFF,
+        position=_u16_to_range(pos, FEEDBACK_POSITION_RANGE),
+        velocity=_u16_to_range(vel, velocity_range),
+        torque=_u16_to_range(torque, torque_range),
+        temperature=temp / 10.0,
+        status=(arb >> 16) & 0xFF,
+    )
+
+
+def feedback_frame(motor_id: int, position: float, velocity: float = 0.0,
+                   torque: float = 0.0, temperature: float = 25.0,
+                   host_id: int = 0xFD, status: int = 0) -> bytes:
+    """Encode a feedback reply (for simulation and replay; inverse of decode_feedback)"""
+    def to_u16(value, span):
+        return max(0, min(0xFFFF, int(round((value + span) * 65535.0 / (2.0 * span)))))
+
+    arb = (COMM_TYPE_FEEDBACK << 24) | ((status & 0xFF) << 16) | ((motor_id & 0xFF) << 8) | (host_id & 0xFF)
+    data = struct.pack('>HHHH',
+                       to_u16(position, FEEDBACK_POSITION_RANGE),
+                       to_u16(velocity, FEEDBACK_VELOCITY_RANGE),
+                       to_u16(torque, FEEDBACK_TORQUE_RANGE),
+                       max(0, min(0xFFFF, int(round(temperature * 10.0)))))
+    return encode_frame((arb << 3) | EXT_ID_FLAG, data)
+
+
+class FrameParser:
+    """
+    Incremental parser for the adapter's RX byte stream.
+
+    feed() returns complete frames and keeps any partial frame for the next
+    call. Bytes that are not part of an AT frame (e.g. "OK" replies to AT+AT)
+    are skipped and counted in skipped_bytes.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.skipped_bytes = 0
+
+    @property
+    def buffered(self) -> int:
+        """Bytes of a partial frame held for the next feed()"""
+        return len(self._buf)
+
+    def feed(self, data: bytes) -> List[Frame]:
+        buf = self._buf
+        buf.extend(data)
+        frames = []
+        pos = 0
+        end = len(buf)
+
+        while True:
+            idx = buf.find(AT_PREFIX, pos)
+            if idx == -1:
+                # Keep a trailing 'A' that may start the next prefix
+                keep = end - 1 if end > pos and buf[end - 1] == 0x41 else end
+                self.skipped_bytes += keep - pos
+                pos = keep
+                break
+
+            self.skipped_bytes += idx - pos
+            if idx + HEADER_LEN > end:
+                pos = idx
+                break
+
+            dlc = buf[idx + 6]
+            frame_end = idx + HEADER_LEN + dlc + len(CRLF)
+            if dlc > MAX_DLC:
+                pos = idx + 1
+                self.skipped_bytes += 1
+                continue
+            if frame_end > end:
+                pos = idx
+                break
+            if buf[frame_end - 2:frame_end] != CRLF:
+                pos = idx + 1
+                self.skipped_bytes += 1
+                continue
+
+            can_id = int.from_bytes(buf[idx + 2:idx + 6], 'big')
+            frames.append(Frame(can_id, bytes(buf[idx + HEADER_LEN:frame_end - 2])))
+            pos = frame_end
+
+        del buf[:pos]
+        return frames
+
+
+def parse_frames(data: bytes) -> List[Frame]:
+    """Parse every complete frame in a byte string"""
+    return FrameParser().feed(data)
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Closed-loop joint controller on decoded motor feedback
+Runs a per-joint PID (position error -> JOG velocity) at a fixed rate. Every
+tick decodes all new feedback frames, computes the commands for every joint in
+one NumPy step, and sends one write per adapter.
+
+Control law per joint (all joints at once):
+  u = v_ff + kp * e + ki * integral(e) + kd * (v_ff - v)      [rad/s]
+  e = target - position
+With ki = kd = 0 this is velocity feed-forward plus P. u is clipped to
+max_velocity and converted to the normalized JOG speed with jog_full_scale
+(rad/s at speed 1.0). Joints whose feedback is older than feedback_timeout
+are commanded to 0.
+The feedback layout comes from l91_protocol.decode_feedback and is not yet
+verified against a real motor (see the l91_protocol docstring).
+
+Usage:
+  python motor_controller.py --simulate 15                 # timing benchmark, no hardware
+  python motor_controller.py --port /dev/ttyUSB0 --motors 6 --target 0.5
+  python motor_controller.py --port /dev/ttyUSB0 --motors 6 --target 0.5 --record session.canlog
+"""
+
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from l91_protocol import (
+    COMM_TYPE_FEEDBACK, FEEDBACK_POSITION_RANGE, FEEDBACK_TORQUE_RANGE,
+    FEEDBACK_VELOCITY_RANGE, SPEED_SCALE, SPEED_ZERO, Frame, byte_val_for_motor,
+    feedback_frame, jog_frame, parse_frames, stop_frame,
+)
+from motor_trace import TRACER
+
+import _paths  # ../../tools on sys.path for metrics
+from metrics import counter, histogram, start_from_env
+
+LOOP_COMPUTE = histogram('motor_loop_compute_seconds', 'Control math per tick (decode, PID, encode)')
+LOOP_TICK = histogram('motor_loop_tick_seconds', 'Whole control tick including serial I/O')
+LOOP_OVERRUNS = counter('motor_loop_overruns_total', 'Ticks that took longer than the period')
+
+JOG_FULL_SCALE = 10.0   # rad/s at JOG speed 1.0 (calibrate per motor type)
+
+# Byte offsets of the JOG flag and speed inside an encoded JOG frame
+JOG_FLAG_OFFSET = 12
+JOG_SPEED_OFFSET = 13
+
+
+# One feedback reply as a contiguous record: the 4 header bytes, then the data as
+# position, velocity, torque, temperature * 10. That data layout is
+# l91_protocol.decode_feedback's, which is unverified (see there).
+FEEDBACK_RECORD_DTYPE = np.dtype([
+    ('can_id', '>u4'),
+    ('fields', '>u2', (4,)),
+])
+FEEDBACK_RECORD = struct.Struct('>I8s')
+assert FEEDBACK_RECORD.size == FEEDBACK_RECORD_DTYPE.itemsize
+
+
+def decode_feedback_records(records: np.ndarray,
+                            velocity_range: float = FEEDBACK_VELOCITY_RANGE,
+                            torque_range: float = FEEDBACK_TORQUE_RANGE) -> Dict[str, np.ndarray]:
+    """Vectorized decode_feedback over a FEEDBACK_RECORD_DTYPE array (non-feedback records are dropped)"""
+    # Byte-swap to native once; arithmetic on big-endian arrays is several times slower
+    can_ids = records['can_id'].astype(np.uint32)
+    ours = (can_ids >> 27) == COMM_TYPE_FEEDBACK
+    raw = records['fields'][ours].astype(np.float64)
+    ranges = np.array([FEEDBACK_POSITION_RANGE, velocity_range, torque_range])
+    values = raw[:, :3] * (ranges * (2.0 / 65535.0)) - ranges
+    return {
+        'motor_id': ((can_ids[ours] >> 11) & 0xFF).astype(np.intp),
+        'position': values[:, 0],
+        'velocity': values[:, 1],
+        'torque': values[:, 2],
+        'temperature': raw[:, 3] / 10.0,
+    }
+
+
+def decode_feedback_arrays(frames: Sequence[Frame],
+                           velocity_range: float = FEEDBACK_VELOCITY_RANGE,
+                           torque_range: float = FEEDBACK_TORQUE_RANGE) -> Dict[str, np.ndarray]:
+    """Vectorized decode_feedback over a list of frames (non-feedback frames are dropped)"""
+    # One pass packs every 8-byte frame into a contiguous record buffer; everything else is NumPy
+    pack = FEEDBACK_RECORD.pack
+    buf = b''.join([pack(f.can_id, f.data) for f in frames if len(f.data) == 8])
+    records = np.frombuffer(buf, dtype=FEEDBACK_RECORD_DTYPE)
+    return decode_feedback_records(records, velocity_range, torque_range)
+
+
+def encode_jog_speeds(speeds: np.ndarray) -> np.ndarray:
+    """Vectorized encode_speed: normalized speeds -> 16-bit JOG speed values"""
+    counts = np.trunc(speeds * SPEED_SCALE)
+    values = np.where(speeds > 0.0, 0x8000 + counts, SPEED_ZERO + counts)
+    return np.clip(values, 0, 0xFFFF).astype(np.uint16)
+
+
+class LoopTimer:
+    """Per-tick compute time (control math only), busy time (whole tick incl. I/O) and period"""
+
+    def __init__(self, period: float, capacity: int = 100000):
+        self.period = period
+        self.capacity = capacity
+        self.compute = np.zeros(capacity)
+        self.busy = np.zeros(capacity)
+        self.intervals = np.zeros(capacity)
+        self.ticks = 0
+        self.overruns = 0
+        self._last_start = None
+
+    def record(self, start: float, end: float, compute: float):
+        i = self.ticks % self.capacity
+        self.compute[i] = compute
+        self.busy[i] = end - start
+        self.intervals[i] = start - self._last_start if self._last_start is not None else self.period
+        self._last_start = start
+        if end - start > self.period:
+            self.overruns += 1
+        self.ticks += 1
+
+    def summary(self) -> Dict[str, float]:
+        n = min(self.ticks, self.capacity)
+        if n == 0:
+            return {'ticks': 0}
+        compute = self.compute[:n] * 1e6
+        busy = self.busy[:n] * 1e6
+        jitter = (self.intervals[:n] - self.period) * 1e6
+        return {
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'compute_p50_us': float(np.percentile(compute, 50)),
+            'compute_p99_us': float(np.percentile(compute, 99)),
+            'compute_max_us': float(compute.max()),
+            'busy_p50_us': float(np.percentile(busy, 50)),
+            'busy_p99_us': float(np.percentile(busy, 99)),
+            'busy_max_us': float(busy.max()),
+            'period_us': self.period * 1e6,
+            'jitter_std_us': float(jitter.std()),
+            'jitter_max_us': float(np.abs(jitter).max()),
+        }
+
+    def print_summary(self, title: str = "LOOP TIMING"):
+        s = self.summary()
+        print()
+        print("=" * 70)
+        print(title)
+        print("=" * 70)
+        if not s['ticks']:
+            print("  No ticks recorded")
+            return
+        print(f"  Ticks:        {s['ticks']}  (overruns: {s['overruns']})")
+        print(f"  Period:       {s['period_us']:.0f} us")
+        print(f"  Compute:      p50={s['compute_p50_us']:.1f} us  p99={s['compute_p99_us']:.1f} us  "
+              f"max={s['compute_max_us']:.1f} us")
+        print(f"  Tick (+I/O):  p50={s['busy_p50_us']:.1f} us  p99={s['busy_p99_us']:.1f} us  "
+              f"max={s['busy_max_us']:.1f} us")
+        print(f"  Jitter:       std={s['jitter_std_us']:.1f} us  max={s['jitter_max_us']:.1f} us")
+        budget = 100.0 * s['compute_p99_us'] / s['period_us']
+        marker = "[OK]" if budget < 25.0 else "[WARNING]"
+        print(f"  {marker} p99 compute uses {budget:.1f}% of the period")
+
+
+class JointController:
+    """Vectorized PID over a fixed set of motors"""
+
+    def __init__(self, motor_ids: Sequence[int], kp=2.0, ki=0.0, kd=0.0,
+                 max_velocity: float = 2.0, jog_full_scale: float = JOG_FULL_SCALE,
+                 integral_limit: float = 1.0, feedback_timeout: float = 0.1):
+        self.motor_ids = np.asarray(motor_ids, dtype=np.intp)
+        n = self.motor_ids.size
+        self.kp = np.broadcast_to(np.asarray(kp, dtype=float), n).copy()
+        self.ki = np.broadcast_to(np.asarray(ki, dtype=float), n).copy()
+        self.kd = np.broadcast_to(np.asarray(kd, dtype=float), n).copy()
+        self.max_velocity = np.broadcast_to(np.asarray(max_velocity, dtype=float), n).copy()
+        self.jog_full_scale = jog_full_scale
+        self.integral_limit = integral_limit
+        self.feedback_timeout = feedback_timeout
+
+        self.target = np.zeros(n)
+        self.velocity_ff = np.zeros(n)
+        self.position = np.zeros(n)
+        self.velocity = np.zeros(n)
+        self.torque = np.zeros(n)
+        self.temperature = np.zeros(n)
+        self.feedback_time = np.full(n, -np.inf)
+        self.integral = np.zeros(n)
+        self.command = np.zeros(n)      # rad/s
+
+        # motor id -> joint index (-1 = not ours)
+        self._joint_of = np.full(256, -1, dtype=np.intp)
+        self._joint_of[self.motor_ids] = np.arange(n)
+
+        # Pre-encoded JOG frames; each tick only patches flag and speed bytes
+        self._frames = np.frombuffer(
+            b''.join(jog_frame(byte_val_for_motor(int(m)), 0.0, 1) for m in self.motor_ids),
+            dtype=np.uint8).reshape(n, -1).copy()
+
+    @property
+    def size(self) -> int:
+        return self.motor_ids.size
+
+    def set_target(self, position, velocity_ff=None):
+        """Set target positions (rad) and optional feed-forward velocities (rad/s)"""
+        self.target[:] = position
+        self.velocity_ff[:] = 0.0 if velocity_ff is None else velocity_ff
+
+    def update_feedback(self, frames: Sequence[Frame], now: float) -> int:
+        """Apply decoded feedback frames; returns how many belonged to our joints"""
+        if not frames:
+            return 0
+        fb = decode_feedback_arrays(frames)
+        joints = self._joint_of[fb['motor_id']]
+        ours = joints >= 0
+        joints = joints[ours]
+        if joints.size == 0:
+            return 0
+        # Later frames win on duplicate joints (fancy assignment keeps the last write)
+        self.position[joints] = fb['position'][ours]
+        self.velocity[joints] = fb['velocity'][ours]
+        self.torque[joints] = fb['torque'][ours]
+        self.temperature[joints] = fb['temperature'][ours]
+        self.feedback_time[joints] = now
+        return int(joints.size)
+
+    def step(self, dt: float, now: float) -> np.ndarray:
+        """Compute the velocity command (rad/s) for every joint"""
+        error = self.target - self.position
+        u = (self.velocity_ff + self.kp * error + self.ki * self.integral
+             + self.kd * (self.velocity_ff - self.velocity))
+
+        # Conditional integration: only integrate joints that are not saturated
+        saturated = np.abs(u) >= self.max_velocity
+        self.integral += np.where(saturated, 0.0, error * dt)
+        np.clip(self.integral, -self.integral_limit, self.integral_limit, out=self.integral)
+
+        u = np.clip(u, -self.max_velocity, self.max_velocity)
+        u[now - self.feedback_time > self.feedback_timeout] = 0.0
+        self.command = u
+        return u
+
+    def encode(self, command: Optional[np.ndarray] = None) -> np.ndarray:
+        """JOG frames for a command vector, one (n, frame_len) uint8 row per joint"""
+        command = self.command if command is None else command
+        speeds = np.clip(command / self.jog_full_scale, -1.0, 1.0)
+        values = encode_jog_speeds(speeds)
+        frames = self._frames
+        frames[:, JOG_FLAG_OFFSET] = speeds != 0.0
+        frames[:, JOG_SPEED_OFFSET] = values >> 8
+        frames[:, JOG_SPEED_OFFSET + 1] = values & 0xFF
+        return frames
+
+
+class ControlLoop:
+    """Fixed-rate loop driving one JointController over one or more adapters"""
+
+    def __init__(self, controller: JointController, buses: Dict[object, List[int]],
+                 rate_hz: float = 200.0):
+        """buses maps an adapter (L91Adapter or compatible) to the motor ids on it"""
+        self.controller = controller
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.timer = LoopTimer(self.period)
+        self.buses = []
+        for adapter, motors in buses.items():
+            joints = controller._joint_of[np.asarray(motors, dtype=np.intp)]
+            if (joints < 0).any():
+                raise ValueError(f"Motors {motors} are not all in the controller")
+            self.buses.append((adapter, joints))
+        # Record the loop clock alongside the frames when the adapters are being recorded
+        self._recorder = next(((a.recorder, a.adapter_id) for a, _ in self.buses
+                               if getattr(a, 'recorder', None) is not None), None)
+
+    def tick(self, dt: float, now: Optional[float] = None) -> float:
+        """One read / compute / write cycle; returns the compute time (now: clock override for replay)"""
+        if now is None:
+            now = time.monotonic()
+        if self._recorder is not None:
+            self._recorder[0].record_clock(self._recorder[1], now, dt)
+        frames = []
+        for adapter, _ in self.buses:
+            frames.extend(adapter.read_frames())
+        t0 = time.perf_counter()
+        with TRACER.span('decode', 'control', frames=len(frames)):
+            self.controller.update_feedback(frames, now)
+        with TRACER.span('control', 'control'):
+            self.controller.step(dt, now)
+        with TRACER.span('encode', 'control'):
+            rows = self.controller.encode()
+            payloads = [rows[joints].tobytes() for _, joints in self.buses]
+        compute = time.perf_counter() - t0
+        for (adapter, _), payload in zip(self.buses, payloads):
+            adapter.write(payload)
+        return compute
+
+    def run(self, duration: Optional[float] = None, on_tick=None, stop_event=None):
+        """
+        Run until duration elapses, stop_event is set, or forever.
+        Deadlines are absolute so jitter does not accumulate.
+        """
+        start = time.perf_counter()
+        deadline = start
+        last = start
+        try:
+            while duration is None or time.perf_counter() - start < duration:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                t0 = time.perf_counter()
+                compute = self.tick(t0 - last if t0 > last else self.period)
+                last = t0
+                if on_tick is not None:
+                    on_tick(self)
+                t1 = time.perf_counter()
+                self.timer.record(t0, t1, compute)
+                LOOP_COMPUTE.observe(compute)
+                LOOP_TICK.observe(t1 - t0)
+                if t1 - t0 > self.period:
+                    LOOP_OVERRUNS.inc()
+
+                deadline += self.period
+                remaining = deadline - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)
+                else:
+                    deadline = time.perf_counter()   # fell behind; don't try to catch up
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Send JOG stop to every joint"""
+        for adapter, joints in self.buses:
+            adapter.write(b''.join(stop_frame(byte_val_for_motor(int(m)))
+                                   for m in self.controller.motor_ids[joints]))
+
+    def settings(self) -> dict:
+        """Controller and bus settings, as stored in a capture for session_replay.py"""
+        c = self.controller
+        return {
+            'tool': 'motor_controller',
+            'rate_hz': self.rate_hz,
+            'motors': c.motor_ids.tolist(),
+            'buses': {str(getattr(adapter, 'adapter_id', i)): c.motor_ids[joints].tolist()
+                      for i, (adapter, joints) in enumerate(self.buses)},
+            'target': c.target.tolist(),
+            'velocity_ff': c.velocity_ff.tolist(),
+            'kp': c.kp.tolist(), 'ki': c.ki.tolist(), 'kd': c.kd.tolist(),
+            'max_velocity': c.max_velocity.tolist(),
+            'jog_full_scale': c.jog_full_scale,
+            'integral_limit': c.integral_limit,
+            'feedback_timeout': c.feedback_timeout,
+        }
+
+
+class SimulatedBus:
+    """
+    Adapter stand-in for benchmarking: every JOG frame written moves a
+    first-order motor model, which answers with a feedback frame.
+    """
+
+    def __init__(self, motor_ids: Sequence[int], jog_full_scale: float = JOG_FULL_SCALE,
+                 time_constant: float = 0.02, recorder=None, port: str = 'sim'):
+        self.jog_full_scale = jog_full_scale
+        self.recorder = recorder
+        self.adapter_id = recorder.register_adapter(port) if recorder is not None else 0
+        self.time_constant = time_constant
+        self.position = {int(m): 0.0 for m in motor_ids}
+        self.velocity = {int(m): 0.0 for m in motor_ids}
+        self._last = time.monotonic()
+        self._pending = []
+
+    def write(self, data: bytes):
+        if self.recorder is not None:
+            self.recorder.record_tx(self.adapter_id, data)
+        now = time.monotonic()
+        dt = now - self._last
+        self._last = now
+        alpha = min(1.0, dt / self.time_constant)
+        for frame in parse_frames(data):
+            motor = (frame.can_id & 0xFF) >> 3
+            if motor not in self.position:
+                continue
+            speed_val = int.from_bytes(frame.data[6:8], 'big')
+            if speed_val >= 0x8000:
+                target = (speed_val - 0x8000) / SPEED_SCALE
+            else:
+                target = (speed_val - SPEED_ZERO) / SPEED_SCALE
+            v = self.velocity[motor] + alpha * (target * self.jog_full_scale - self.velocity[motor])
+            self.velocity[motor] = v
+            self.position[motor] += v * dt
+            self._pending.append(feedback_frame(motor, self.position[motor], v))
+
+    def read_frames(self, timeout: float = 0.0) -> List[Frame]:
+        data, self._pending = b''.join(self._pending), []
+        frames = parse_frames(data)
+        if self.recorder is not None and frames:
+            self.recorder.record_rx(self.adapter_id, frames)
+        return frames
+
+
+def run_simulation(joints: int, rate_hz: float, duration: float, kp: float, ki: float, kd: float,
+                   recorder=None):
+    """Controller timing benchmark against simulated motors (optionally recorded for replay)"""
+    motor_ids = list(range(1, joints + 1))
+    controller = JointController(motor_ids, kp=kp, ki=ki, kd=kd)
+    split = (joints + 1) // 2
+    buses = {
+        SimulatedBus(motor_ids[:split], recorder=recorder, port='sim0'): motor_ids[:split],
+        SimulatedBus(motor_ids[split:], recorder=recorder, port='sim1'): motor_ids[split:],
+    }
+    loop = ControlLoop(controller, {b: m for b, m in buses.items() if m}, rate_hz)
+    controller.set_target(np.linspace(-1.0, 1.0, joints))
+    if recorder is not None:
+        recorder.annotate(**loop.settings())
+
+    print(f"  Simulating {joints} joints on {len(loop.buses)} buses at {rate_hz:.0f} Hz "
+          f"for {duration:.1f} s...")
+    loop.run(duration)
+    loop.timer.print_summary(f"LOOP TIMING ({joints} joints, simulated)")
+
+    error = np.abs(controller.target - controller.position)
+    print(f"  Final position error: max={error.max():.4f} rad  mean={error.mean():.4f} rad")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Closed-loop joint controller on motor feedback')
+    parser.add_argument('--simulate', type=int, metavar='JOINTS',
+                       help='Run against N simulated motors (timing benchmark)')
+    parser.add_argument('--port', help='USB-CAN adapter port (e.g. /dev/ttyUSB0)')
+    parser.add_argument('--motors', type=int, nargs='+', help='Motor CAN IDs on the port (e.g. 6)')
+    parser.add_argument('--target', type=float, nargs='+', default=[0.0],
+                       help='Target position(s) in rad (one value or one per motor)')
+    parser.add_argument('--rate', type=float, default=200.0, help='Loop rate in Hz (default: 200)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Run time in seconds (default: 5)')
+    parser.add_argument('--kp', type=float, default=2.0, help='Position gain, 1/s (default: 2.0)')
+    parser.add_argument('--ki', type=float, default=0.0, help='Integral gain, 1/s^2 (default: 0)')
+    parser.add_argument('--kd', type=float, default=0.0, help='Velocity error gain (default: 0)')
+    parser.add_argument('--max-velocity', type=float, default=2.0,
+                       help='Velocity command limit in rad/s (default: 2.0)')
+    parser.add_argument('--metrics-port', type=int,
+                       help='Serve Prometheus metrics on this local port (default: $METRICS_PORT)')
+    parser.add_argument('--record', metavar='PATH',
+                       help='Record the session to a .canlog capture (replay with session_replay.py)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("CLOSED-LOOP JOINT CONTROLLER")
+    print("=" * 70)
+    print()
+    start_from_env(args.metrics_port)
+
+    recorder = None
+    if args.record:
+        from can_recorder import CanRecorder
+        recorder = CanRecorder(args.record)
+
+    if args.simulate:
+        try:
+            run_simulation(args.simulate, args.rate, args.duration, args.kp, args.ki, args.kd, recorder)
+        finally:
+            if recorder is not None:
+                recorder.close()
+                print(f"  [OK] Recorded {recorder.records} records to {args.record}")
+        return
+
+    if not args.port or not args.motors:
+        parser.error("--port and --motors are required unless --simulate is given")
+
+    from l91_adapter import L91Adapter
+    from l91_protocol import activation_frame
+
+    adapter = L91Adapter(args.port, recorder=recorder)
+    if not adapter.connect():
+        sys.exit(1)
+    print(f"  [OK] Connected to {args.port}")
+
+    try:
+        for motor in args.motors:
+            adapter.transact(activation_frame(byte_val_for_motor(motor)))
+        print(f"  [OK] Activated motors {args.motors}")
+
+        controller = JointController(args.motors, kp=args.kp, ki=args.ki, kd=args.kd,
+                                     max_velocity=args.max_velocity)
+        controller.set_target(args.target if len(args.target) > 1 else args.target[0])
+        loop = ControlLoop(controller, {adapter: args.motors}, args.rate)
+        if recorder is not None:
+            recorder.annotate(**loop.settings())
+
+        # Prime feedback with a zero-speed command so the first tick has positions
+        loop.tick(loop.period)
+        time.sleep(0.05)
+
+        print(f"  Running at {args.rate:.0f} Hz for {args.duration:.1f} s "
+              f"(targets {controller.target.tolist()} rad)...")
+        loop.run(args.duration)
+        loop.timer.print_summary()
+        for i, motor in enumerate(args.motors):
+            print(f"  Motor {motor}: position={controller.position[i]:+.3f} rad  "
+                  f"velocity={controller.velocity[i]:+.3f} rad/s  temp={controller.temperature[i]:.1f} C")
+
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
+    finally:
+        adapter.disconnect()
+        if recorder is not None:
+            recorder.close()
+            print(f"  [OK] Recorded {recorder.records} records to {args.record}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Concurrent motor health check for every adapter and motor
+Probes all known motors on all USB-CAN adapters at once: one thread per
+adapter, and on each adapter all activation probes go out in one write. The
+replies give per-motor RTT, fault bits and mode (from the feedback status
+byte), fault frames and last-seen time, collected into one structured report.
+
+Run once, or periodically in the background (HealthMonitor). One probe per
+motor per interval is ~17 bytes on the serial line, so a 5 s interval costs
+about 3.4 B/s per motor.
+
+The probe is the activation (LoadParams) frame, not a read-only query:
+CAN_BUS_PROTOCOL.md documents no read request these motors are known to
+answer, and activation is the frame they reliably reply to. Re-sending it
+every interval is safe for this tool because
+  - it carries no speed or position (data 00 c4 00 00 00 00 00 00), so it
+    cannot start motion; motors only move on JOG frames
+  - it is what every control script sends before its first command, and
+    motor_registry re-sends it whenever a motor drops out of run mode
+  - the checker opens the adapter ports itself, so it is not meant to run
+    on an adapter a control loop is driving
+Do not point --interval at a port another process is commanding: the
+activation frames would interleave with its JOG frames.
+
+Motors to check come from --bus, else the discovery cache
+(detect_adapter_settings.py), else every Jetson default motor on every
+Jetson default port - so a motor that moved to the other adapter still shows up.
+
+Usage:
+  python motor_health.py                                  # one check, print report
+  python motor_health.py --bus /dev/ttyUSB0:6 --bus /dev/ttyUSB1:8
+  python motor_health.py --interval 5 --json health.json  # background loop
+"""
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from discovery_cache import DiscoveryCache
+from l91_adapter import L91Adapter, parse_bus
+from l91_protocol import (
+    COMM_TYPE_FAULT, activation_frame, byte_val_for_motor, decode_feedback,
+)
+
+import _paths  # ../../tools on sys.path for metrics
+from metrics import counter, gauge, histogram, start_from_env
+
+CHECKS = counter('motor_health_checks_total', 'Health check rounds')
+MOTOR_UP = gauge('motor_up', '1 if the motor answered OK in the last health check', ['port', 'motor'])
+MOTOR_RTT = histogram('motor_health_rtt_seconds', 'Probe to first reply', ['port', 'motor'])
+MOTOR_ERROR_FRAMES = counter('motor_error_frames_total', 'Fault frames received', ['port', 'motor'])
+
+JETSON_PORTS = ['/dev/ttyUSB0', '/dev/ttyUSB1']
+JETSON_MOTORS = [6, 8]
+
+REPLY_WINDOW = 0.2   # seconds to wait for replies after the probe write
+INIT_SETTLE = 0.1
+
+STATE_OK = 'ok'
+STATE_FAULT = 'fault'
+STATE_NO_REPLY = 'no_reply'
+STATE_ADAPTER_DOWN = 'adapter_down'
+
+
+class MotorStatus(NamedTuple):
+    port: str
+    motor_id: int
+    state: str
+    rtt_ms: Optional[float]
+    error_frames: int
+    faults: List[str]
+    mode: Optional[str]
+    position: Optional[float]
+    temperature: Optional[float]
+    last_seen: Optional[float]     # epoch seconds of the last reply (kept across checks)
+
+
+class HealthReport(NamedTuple):
+    time: float
+    duration: float
+    motors: List[MotorStatus]
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.motors) and all(m.state == STATE_OK for m in self.motors)
+
+    def locations(self) -> Dict[int, List[str]]:
+        """Ports each motor answered OK on"""
+        found: Dict[int, List[str]] = {}
+        for m in self.motors:
+            ports = found.setdefault(m.motor_id, [])
+            if m.state == STATE_OK:
+                ports.append(m.port)
+        return found
+
+    @property
+    def all_found(self) -> bool:
+        """Every motor answered OK on at least one port (for probe-everywhere mode)"""
+        return bool(self.motors) and all(self.locations().values())
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for m in self.motors:
+            counts[m.state] = counts.get(m.state, 0) + 1
+        return counts
+
+    def to_dict(self) -> dict:
+        return {
+            'time': self.time,
+            'duration': self.duration,
+            'ok': self.ok,
+            'counts': self.counts(),
+            'motors': [m._asdict() for m in self.motors],
+        }
+
+
+def probe_bus(adapter: L91Adapter, motors: Sequence[int],
+              window: float = REPLY_WINDOW) -> Dict[int, dict]:
+    """
+    Probe every motor on one adapter with a single write.
+    Returns {motor_id: {'rtt', 'feedback', 'error_frames'}} for motors that
+    replied or sent fault frames. RTTs are from the write, so later motors in
+    the batch include the bus time of the frames ahead of them.
+    """
+    adapter.drain()
+    wanted = set(motors)
+    replies: Dict[int, dict] = {}
+    t_send = time.monotonic()
+    # Activation doubles as the liveness probe (no setpoint; see the module docstring)
+    adapter.send_many(activation_frame(byte_val_for_motor(m)) for m in motors)
+
+    deadline = t_send + window
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        for frame in adapter.read_frames(timeout=remaining):
+            now = time.monotonic()
+            motor = (frame.arbitration_id >> 8) & 0xFF
+            if motor not in wanted:
+                continue
+            entry = replies.setdefault(motor, {'rtt': None, 'feedback': None, 'error_frames': 0})
+            if frame.comm_type == COMM_TYPE_FAULT:
+                entry['error_frames'] += 1
+                continue
+            if entry['rtt'] is None:
+                entry['rtt'] = now - t_send
+            feedback = decode_feedback(frame)
+            if feedback is not None:
+                entry['feedback'] = feedback
+        if all(replies.get(m, {}).get('rtt') is not None for m in wanted):
+            break
+    return replies
+
+
+class HealthChecker:
+    """Keeps one adapter per port open and checks all their motors concurrently"""
+
+    def __init__(self, buses: Dict[str, List[int]], cache: Optional[DiscoveryCache] = None,
+                 window: float = REPLY_WINDOW):
+        self.buses = {port: list(motors) for port, motors in buses.items()}
+        self.cache = cache
+        self.window = window
+        self.adapters: Dict[str, Optional[L91Adapter]] = {}
+        self.last_seen: Dict[tuple, float] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.buses)))
+
+    def _open(self, port: str) -> Optional[L91Adapter]:
+        entry = self.cache.get(port) if self.cache else None
+        kwargs = {}
+        if entry and entry.get('baudrate'):
+            kwargs['baudrate'] = entry['baudrate']
+        if entry and entry.get('can_setting') is not None:
+            kwargs['can_setting'] = entry['can_setting']
+        adapter = L91Adapter(port, **kwargs)
+        if not adapter.connect(initialize=False):
+            return None
+        adapter.initialize(settle=INIT_SETTLE)
+        return adapter
+
+    def connect(self) -> Dict[str, bool]:
+        """Open and initialize every adapter concurrently"""
+        ports = [p for p in self.buses if self.adapters.get(p) is None]
+        for port, adapter in zip(ports, self._pool.map(self._open, ports)):
+            self.adapters[port] = adapter
+        return {port: adapter is not None for port, adapter in self.adapters.items()}
+
+    def _check_port(self, port: str) -> List[MotorStatus]:
+        motors = self.buses[port]
+        adapter = self.adapters.get(port)
+        replies = {}
+        if adapter is not None:
+            try:
+                replies = probe_bus(adapter, motors, self.window)
+            except Exception:
+                # Unplugged mid-run: drop the adapter so the next check reopens it
+                adapter.disconnect()
+                self.adapters[port] = adapter = None
+
+        now = time.time()
+        statuses = []
+        for motor in motors:
+            reply = replies.get(motor)
+            feedback = reply['feedback'] if reply else None
+            rtt = reply['rtt'] if reply else None
+            error_frames = reply['error_frames'] if reply else 0
+            faults = feedback.faults if feedback else []
+            if rtt is not None:
+                self.last_seen[(port, motor)] = now
+
+            if adapter is None:
+                state = STATE_ADAPTER_DOWN
+            elif rtt is None and not error_frames:
+                state = STATE_NO_REPLY
+            elif faults or error_frames:
+                state = STATE_FAULT
+            else:
+                state = STATE_OK
+
+            MOTOR_UP.labels(port, motor).set(1 if state == STATE_OK else 0)
+            if rtt is not None:
+                MOTOR_RTT.labels(port, motor).observe(rtt)
+            if error_frames:
+                MOTOR_ERROR_FRAMES.labels(port, motor).inc(error_frames)
+
+            statuses.append(MotorStatus(
+                port=port,
+                motor_id=motor,
+                state=state,
+                rtt_ms=None if rtt is None else rtt * 1000.0,
+                error_frames=error_frames,
+                faults=faults,
+                mode=feedback.mode if feedback else None,
+                position=feedback.position if feedback else None,
+                temperature=feedback.temperature if feedback else None,
+                last_seen=self.last_seen.get((port, motor)),
+            ))
+        return statuses
+
+    def check(self) -> HealthReport:
+        """One concurrent probe of every motor on every adapter"""
+        start = time.monotonic()
+        self.connect()
+        motors: List[MotorStatus] = []
+        for statuses in self._pool.map(self._check_port, list(self.buses)):
+            motors.extend(statuses)
+        CHECKS.inc()
+        return HealthReport(time.time(), time.monotonic() - start, motors)
+
+    def close(self):
+        for adapter in self.adapters.values():
+            if adapter is not None:
+                adapter.disconnect()
+        self.adapters = {}
+        self._pool.shutdown(wait=False)
+
+
+class HealthMonitor(threading.Thread):
+    """Runs HealthChecker.check() every interval seconds in the background"""
+
+    def __init__(self, checker: HealthChecker, interval: float = 5.0,
+                 on_report: Optional[Callable[[HealthReport], None]] = None):
+        super().__init__(name='motor-health', daemon=True)
+        self.checker = checker
+        self.interval = interval
+        self.on_report = on_report
+        self.latest: Optional[HealthReport] = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.latest = self.checker.check()
+                if self.on_report is not None:
+                    self.on_report(self.latest)
+            except Exception as e:
+                print(f"  [ERROR] Health check failed: {e}")
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_event.set()
+        self.join(timeout)
+
+
+def default_buses(cache: Optional[DiscoveryCache]) -> Dict[str, List[int]]:
+    """Motors from the discovery cache, else every Jetson motor on every Jetson port"""
+    if cache is not None:
+        buses = {port: cache.motors(port) for port in cache.known_ports()}
+        buses = {port: motors for port, motors in buses.items() if motors}
+        if buses:
+            return buses
+    return {port: list(JETSON_MOTORS) for port in JETSON_PORTS}
+
+
+def print_report(report: HealthReport):
+    print()
+    print("=" * 70)
+    print(time.strftime("HEALTH REPORT %Y-%m-%d %H:%M:%S", time.localtime(report.time)))
+    print("=" * 70)
+    for m in report.motors:
+        marker = {STATE_OK: '[OK]', STATE_FAULT: '[FAULT]'}.get(m.state, '[FAIL]')
+        detail = []
+        if m.rtt_ms is not None:
+            detail.append(f"rtt={m.rtt_ms:.1f} ms")
+        if m.mode is not None:
+            detail.append(f"mode={m.mode}")
+        if m.temperature is not None:
+            detail.append(f"temp={m.temperature:.1f} C")
+        if m.faults:
+            detail.append(f"faults={','.join(m.faults)}")
+        if m.error_frames:
+            detail.append(f"error_frames={m.error_frames}")
+        if m.state != STATE_OK and m.last_seen is not None:
+            detail.append(f"last_seen={time.time() - m.last_seen:.0f} s ago")
+        print(f"  {marker:<8} {m.port} Motor {m.motor_id:<3} {m.state:<13} {'  '.join(detail)}")
+    locations = ', '.join(f"{motor} -> {'/'.join(ports) or 'not found'}"
+                          for motor, ports in sorted(report.locations().items()))
+    print(f"  Motor locations: {locations}")
+    counts = ', '.join(f"{k}={v}" for k, v in sorted(report.counts().items()))
+    print(f"  Checked {len(report.motors)} motor(s) in {report.duration * 1000:.0f} ms ({counts})")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Concurrent health check of all motors on all adapters')
+    parser.add_argument('--bus', action='append', default=[], metavar='PORT:MOTORS',
+                       help='Adapter and motor ids, e.g. /dev/ttyUSB0:6,8 (repeat per adapter)')
+    parser.add_argument('--interval', type=float,
+                       help='Repeat every N seconds until Ctrl+C (default: run once)')
+    parser.add_argument('--window', type=float, default=REPLY_WINDOW,
+                       help=f'Reply window per check in seconds (default: {REPLY_WINDOW})')
+    parser.add_argument('--json', metavar='PATH', help='Write the latest report as JSON')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read the discovery cache')
+    parser.add_argument('--metrics-port', type=int,
+                       help='Serve Prometheus metrics on this local port (default: $METRICS_PORT)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("MOTOR HEALTH CHECK")
+    print("=" * 70)
+    start_from_env(args.metrics_port)
+
+    cache = None if args.no_cache else DiscoveryCache()
+    buses = dict(parse_bus(spec) for spec in args.bus) if args.bus else default_buses(cache)
+    for port, motors in buses.items():
+        print(f"  {port}: motors {motors}")
+
+    def emit(report: HealthReport):
+        print_report(report)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report.to_dict(), f, indent=2)
+
+    checker = HealthChecker(buses, cache, args.window)
+    try:
+        if args.interval is None:
+            report = checker.check()
+            emit(report)
+            # Without --bus every motor is probed on every port; one OK reply per motor is enough
+            sys.exit(0 if (report.ok if args.bus else report.all_found) else 1)
+
+        n_motors = sum(len(m) for m in buses.values())
+        print(f"  Checking every {args.interval:.1f} s (~{17 * n_motors / args.interval:.0f} B/s probe traffic)")
+        monitor = HealthMonitor(checker, args.interval, emit)
+        monitor.start()
+        while monitor.is_alive():
+            time.sleep(0.5)
+
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+    finally:
+        checker.close()
+
+
+if __name__ == '__main__':
+    main()
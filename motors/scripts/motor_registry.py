@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Central motor registry: routing, activation state and redundant-command suppression
+One place that knows, for each motor number, its header byte value, frame
+format (extended / standard) and adapter port - the Motor ID table in
+CAN_BUS_PROTOCOL.md - instead of every script hard-coding them.
+
+Lookups are dict hits: motor -> route for commands, (port, CAN ID) -> device
+for replies. Motors whose byte values collide on one port (the table maps
+both 5 and 13 to 0x6c, 2 and 10 to 0x54, 4 and 12 to 0x64) are the same
+physical device on the wire; they share one state entry and are reported
+as aliases.
+
+Per device the registry remembers activation and the last JOG frame sent:
+  - activate() is skipped if the device is already active in this adapter
+    session (a feedback frame in 'reset' mode clears that, e.g. after a
+    power cycle)
+  - jog() skips a frame identical to the previous one unless hold_refresh
+    seconds have passed, so a steady hold costs one frame per refresh
+    instead of one per control tick
+  - jog_burst() does the same for several motors on one port written as
+    one payload (joint_space.py): skipped only if every frame repeats
+  - stop() is never suppressed
+
+Named groups (define_group) precompute their stop / activate / zero-speed
+frames as one burst per adapter; broadcast() writes the bursts to all
+adapters in parallel and reports time-to-last-frame, instead of one
+stop_motor() call (write, flush, 100 ms sleep) per motor.
+
+Usage:
+  python motor_registry.py                                  # routing table + aliases
+  python motor_registry.py --port 6=/dev/ttyUSB0 --port 8=/dev/ttyUSB1
+  python motor_registry.py --demo                           # hold-loop traffic with/without suppression
+  python motor_registry.py --port 6=/dev/ttyUSB0 --port 8=/dev/ttyUSB1 --broadcast stop
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from discovery_cache import DiscoveryCache
+from l91_protocol import (
+    Frame, activation_frame, byte_val_for_motor, decode_feedback, jog_frame, parse_frames, stop_frame,
+)
+
+import _paths  # ../../tools on sys.path for metrics
+from metrics import counter, histogram
+
+# Motor ID table from CAN_BUS_PROTOCOL.md: motor -> (byte value, extended format)
+MOTOR_TABLE: Dict[int, Tuple[int, bool]] = {
+    1: (0x0c, True),
+    2: (0x54, False),
+    3: (0x1c, True),
+    4: (0x64, False),
+    5: (0x6c, False),
+    6: (0x34, True),
+    7: (0x3c, True),
+    8: (0x44, True),
+    9: (0x4c, True),
+    10: (0x54, True),
+    11: (0x9c, False),
+    12: (0x64, True),
+    13: (0x6c, True),
+    14: (0x74, True),
+}
+
+# Jetson wiring from CAN_BUS_PROTOCOL.md
+JETSON_PORTS = {6: '/dev/ttyUSB0', 8: '/dev/ttyUSB1'}
+
+HOLD_REFRESH = 1.0   # seconds; identical JOG frames are resent at most this often
+
+SENT = counter('motor_registry_frames_sent_total', 'Frames sent through the registry', ['kind'])
+SUPPRESSED = counter('motor_registry_frames_suppressed_total', 'Redundant frames not sent', ['kind'])
+BROADCAST_SECONDS = histogram('motor_group_broadcast_seconds', 'Group broadcast time to last frame', ['kind'])
+
+GROUP_COMMANDS = ('stop', 'activate', 'zero')
+
+
+class MotorRoute(NamedTuple):
+    motor: int
+    port: str
+    byte_val: int
+    extended: bool
+
+    @property
+    def can_id(self) -> int:
+        """CAN ID the motor answers from (byte value without the adapter's flag bits)"""
+        return self.byte_val >> 3
+
+    @property
+    def device(self) -> Tuple[str, int]:
+        """Physical device key: aliases share it"""
+        return (self.port, self.byte_val)
+
+
+class DeviceState:
+    """What the registry knows about one physical device"""
+    __slots__ = ('motors', 'active', 'last_jog', 'last_jog_time', 'last_speed',
+                 'last_seen', 'feedback')
+
+    def __init__(self):
+        self.motors: List[int] = []
+        self.active = False
+        self.last_jog: Optional[bytes] = None
+        self.last_jog_time = 0.0
+        self.last_speed: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        self.feedback = None
+
+
+class GroupResult(NamedTuple):
+    group: str
+    command: str
+    frames: int
+    port_seconds: Dict[str, float]    # per adapter: start of broadcast -> burst flushed
+    time_to_last_frame: float
+
+
+class MotorGroup:
+    """Named set of motors with its command bursts precomputed per adapter"""
+
+    def __init__(self, name: str, routes: List[MotorRoute]):
+        self.name = name
+        self.motors = [r.motor for r in routes]
+        self.devices: List[Tuple[str, int]] = []
+        by_port: Dict[str, List[MotorRoute]] = {}
+        for route in routes:
+            if route.device not in self.devices:    # aliases are one device: one frame each
+                self.devices.append(route.device)
+                by_port.setdefault(route.port, []).append(route)
+        builders = {
+            'stop': lambda r: stop_frame(r.byte_val),
+            'activate': lambda r: activation_frame(r.byte_val, r.extended),
+            'zero': lambda r: jog_frame(r.byte_val, 0.0, 1),    # hold at zero speed, JOG mode on
+        }
+        self.bursts: Dict[str, Dict[str, bytes]] = {
+            command: {port: b''.join(build(r) for r in port_routes) for port, port_routes in by_port.items()}
+            for command, build in builders.items()
+        }
+        self.frames = {port: len(port_routes) for port, port_routes in by_port.items()}
+
+
+class MotorRegistry:
+    """Routes commands to adapters and drops redundant ones"""
+
+    def __init__(self, hold_refresh: float = HOLD_REFRESH):
+        self.hold_refresh = hold_refresh
+        self.routes: Dict[int, MotorRoute] = {}
+        self.devices: Dict[Tuple[str, int], DeviceState] = {}
+        self._by_reply: Dict[Tuple[str, int], DeviceState] = {}
+        self.adapters: Dict[str, object] = {}
+        self.sent = 0
+        self.suppressed = 0
+        self._sent_kind = {k: SENT.labels(k) for k in ('activate', 'jog', 'stop')}
+        self._suppressed_kind = {k: SUPPRESSED.labels(k) for k in ('activate', 'jog')}
+        self._broadcast_seconds = {k: BROADCAST_SECONDS.labels(k) for k in GROUP_COMMANDS}
+        self.groups: Dict[str, MotorGroup] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_table(cls, ports: Dict[int, str], **kwargs) -> 'MotorRegistry':
+        """Registry for the given motor -> port assignment, using MOTOR_TABLE"""
+        registry = cls(**kwargs)
+        for motor, port in ports.items():
+            byte_val, extended = MOTOR_TABLE[motor]
+            registry.register(motor, port, byte_val, extended)
+        return registry
+
+    @classmethod
+    def from_can_ids(cls, ports: Dict[int, str], **kwargs) -> 'MotorRegistry':
+        """Registry for motors configured to single CAN IDs (extended format, byte = ID << 3 | 4)"""
+        registry = cls(**kwargs)
+        for motor, port in ports.items():
+            registry.register(motor, port, byte_val_for_motor(motor), True)
+        return registry
+
+    @classmethod
+    def from_cache(cls, cache: DiscoveryCache, **kwargs) -> 'MotorRegistry':
+        """Assign table motors to ports by the CAN IDs the discovery cache saw there"""
+        ports = {}
+        for port in cache.known_ports():
+            seen = set(cache.motors(port))
+            for motor, (byte_val, _) in MOTOR_TABLE.items():
+                if byte_val >> 3 in seen and motor not in ports:
+                    ports[motor] = port
+        return cls.from_table(ports, **kwargs)
+
+    def register(self, motor: int, port: str, byte_val: int, extended: bool = True) -> MotorRoute:
+        route = MotorRoute(motor, port, byte_val, extended)
+        old = self.routes.get(motor)
+        if old is not None:
+            self.devices[old.device].motors.remove(motor)
+        self.routes[motor] = route
+        state = self.devices.get(route.device)
+        if state is None:
+            state = self.devices[route.device] = DeviceState()
+            self._by_reply[(port, route.can_id)] = state
+        state.motors.append(motor)
+        return route
+
+    def aliases(self) -> List[List[int]]:
+        """Groups of motor numbers that address the same device"""
+        return [sorted(s.motors) for s in self.devices.values() if len(s.motors) > 1]
+
+    def route(self, motor: int) -> MotorRoute:
+        try:
+            return self.routes[motor]
+        except KeyError:
+            raise KeyError(f"Motor {motor} is not registered") from None
+
+    def state(self, motor: int) -> DeviceState:
+        return self.devices[self.route(motor).device]
+
+    def attach(self, port: str, adapter):
+        """Use an adapter (L91Adapter or compatible) for a port; resets that port's activation state"""
+        self.adapters[port] = adapter
+        for (device_port, _), state in self.devices.items():
+            if device_port == port:
+                state.active = False
+                state.last_jog = None
+
+    def _send(self, route: MotorRoute, frame: bytes, kind: str):
+        self.adapters[route.port].send(frame)
+        self.sent += 1
+        self._sent_kind[kind].inc()
+
+    def _suppress(self, kind: str, frames: int = 1):
+        self.suppressed += frames
+        self._suppressed_kind[kind].inc(frames)
+
+    def activate(self, motor: int, force: bool = False) -> bool:
+        """Send activation unless the device is already active; returns True if sent"""
+        route = self.route(motor)
+        state = self.devices[route.device]
+        if state.active and not force:
+            self._suppress('activate')
+            return False
+        self._send(route, activation_frame(route.byte_val, route.extended), 'activate')
+        state.active = True
+        return True
+
+    def jog(self, motor: int, speed: float, flag: Optional[int] = None) -> bool:
+        """Send a JOG frame unless it repeats the last one within hold_refresh; returns True if sent"""
+        route = self.route(motor)
+        state = self.devices[route.device]
+        frame = jog_frame(route.byte_val, speed, flag)
+        now = time.monotonic()
+        if frame == state.last_jog and now - state.last_jog_time < self.hold_refresh:
+            self._suppress('jog')
+            return False
+        self._send(route, frame, 'jog')
+        state.last_jog = frame
+        state.last_jog_time = now
+        state.last_speed = speed
+        return True
+
+    def jog_burst(self, port: str, states: Sequence[DeviceState], payload: bytes,
+                  speeds: Sequence[float]) -> bool:
+        """
+        JOG frames for several devices on one port as one write.
+        payload holds one equal-length frame per device, in states order
+        (states from state(motor), looked up once by the caller). It is
+        skipped like jog() when every frame repeats its device's last one
+        within hold_refresh; otherwise written whole and recorded in each
+        device's state. Returns True if sent.
+        """
+        size = len(payload) // len(states)
+        frames = [payload[i:i + size] for i in range(0, len(payload), size)]
+        now = time.monotonic()
+        if all(frame == state.last_jog and now - state.last_jog_time < self.hold_refresh
+               for frame, state in zip(frames, states)):
+            self._suppress('jog', len(states))
+            return False
+        self.adapters[port].write(payload)
+        self.sent += len(states)
+        self._sent_kind['jog'].inc(len(states))
+        for frame, state, speed in zip(frames, states, speeds):
+            state.last_jog = frame
+            state.last_jog_time = now
+            state.last_speed = speed
+        return True
+
+    def stop(self, motor: int):
+        """JOG stop; always sent"""
+        route = self.route(motor)
+        state = self.devices[route.device]
+        frame = stop_frame(route.byte_val)
+        self._send(route, frame, 'stop')
+        state.last_jog = frame
+        state.last_jog_time = time.monotonic()
+        state.last_speed = 0.0
+
+    def define_group(self, name: str, motors: Optional[Iterable[int]] = None) -> MotorGroup:
+        """Create (or replace) a named group; all registered motors if motors is None"""
+        motors = sorted(self.routes) if motors is None else list(motors)
+        group = self.groups[name] = MotorGroup(name, [self.route(m) for m in motors])
+        return group
+
+    def _burst(self, adapter, payload: bytes, start: float) -> float:
+        adapter.send_many((payload,))
+        adapter.flush()
+        return time.perf_counter() - start
+
+    def broadcast(self, name: str, command: str = 'stop') -> GroupResult:
+        """Send a group's precomputed burst to all of its adapters at once"""
+        group = self.groups[name]
+        bursts = group.bursts[command]
+        ports = list(bursts)
+        start = time.perf_counter()
+        if len(ports) == 1:
+            seconds = [self._burst(self.adapters[ports[0]], bursts[ports[0]], start)]
+        else:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='broadcast')
+            futures = [self._pool.submit(self._burst, self.adapters[p], bursts[p], start) for p in ports]
+            seconds = [f.result() for f in futures]
+
+        kind = 'jog' if command == 'zero' else command
+        now = time.monotonic()
+        for device in group.devices:
+            state = self.devices[device]
+            if command == 'activate':
+                state.active = True
+            else:
+                state.last_jog = stop_frame(device[1]) if command == 'stop' else jog_frame(device[1], 0.0, 1)
+                state.last_jog_time = now
+                state.last_speed = 0.0
+        frames = sum(group.frames.values())
+        self.sent += frames
+        self._sent_kind[kind].inc(frames)
+        port_seconds = dict(zip(ports, seconds))
+        result = GroupResult(name, command, frames, port_seconds, max(seconds) if seconds else 0.0)
+        self._broadcast_seconds[command].observe(result.time_to_last_frame)
+        return result
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def on_frames(self, port: str, frames: Iterable[Frame]) -> int:
+        """Update device state from received frames; returns how many matched a device"""
+        matched = 0
+        now = time.monotonic()
+        for frame in frames:
+            state = self._by_reply.get((port, (frame.arbitration_id >> 8) & 0xFF))
+            if state is None:
+                continue
+            matched += 1
+            state.last_seen = now
+            feedback = decode_feedback(frame)
+            if feedback is not None:
+                state.feedback = feedback
+                if feedback.mode == 'reset':
+                    # Motor dropped out of run mode (power cycle, fault reset): activate again
+                    state.active = False
+        return matched
+
+    def poll(self) -> int:
+        """Read waiting frames from every attached adapter into the device state"""
+        return sum(self.on_frames(port, adapter.read_frames()) for port, adapter in self.adapters.items())
+
+
+class _CountingAdapter:
+    """Adapter stand-in for --demo: counts frames instead of sending them"""
+
+    def __init__(self):
+        self.frames = 0
+
+    def send(self, frame: bytes):
+        self.frames += 1
+
+    def send_many(self, frames):
+        self.frames += sum(len(parse_frames(f)) for f in frames)
+
+    def flush(self):
+        pass
+
+    def read_frames(self, timeout: float = 0.0):
+        return []
+
+
+def run_demo(rate_hz: float, duration: float):
+    """Hold-loop bus traffic with and without suppression (no hardware)"""
+    results = {}
+    for label, suppress in (('no suppression', False), ('suppression', True)):
+        registry = MotorRegistry.from_table(JETSON_PORTS, hold_refresh=HOLD_REFRESH if suppress else 0.0)
+        adapters = {port: _CountingAdapter() for port in set(JETSON_PORTS.values())}
+        for port, adapter in adapters.items():
+            registry.attach(port, adapter)
+
+        start = time.monotonic()
+        ticks = 0
+        while time.monotonic() - start < duration:
+            for motor in JETSON_PORTS:
+                registry.activate(motor, force=not suppress)
+                # Move for the first half, then hold position (speed 0)
+                registry.jog(motor, 0.05 if ticks < rate_hz * duration / 2 else 0.0)
+            ticks += 1
+            time.sleep(1.0 / rate_hz)
+        results[label] = (sum(a.frames for a in adapters.values()), registry.suppressed, ticks)
+
+    for label, (frames, suppressed, ticks) in results.items():
+        print(f"  {label:<15} {frames:>6} frames sent, {suppressed:>6} suppressed ({ticks} ticks)")
+    baseline = results['no suppression'][0]
+    reduced = results['suppression'][0]
+    print(f"  [OK] Bus traffic reduced by {100.0 * (baseline - reduced) / max(1, baseline):.1f}%")
+
+
+def parse_assignment(spec: str) -> Tuple[int, str]:
+    """'6=/dev/ttyUSB0' -> (6, '/dev/ttyUSB0')"""
+    motor, _, port = spec.partition('=')
+    if not port:
+        raise ValueError(f"Port assignment must be MOTOR=PORT, got {spec!r}")
+    return int(motor), port
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Motor routing table and command suppression')
+    parser.add_argument('--port', action='append', default=[], metavar='MOTOR=PORT',
+                       help='Assign a motor to an adapter port (repeatable)')
+    parser.add_argument('--cache', action='store_true',
+                       help='Assign motors from the discovery cache instead')
+    parser.add_argument('--broadcast', choices=GROUP_COMMANDS,
+                       help='Connect the adapters and send this command to all assigned motors as one group')
+    parser.add_argument('--demo', action='store_true',
+                       help='Compare hold-loop traffic with and without suppression')
+    parser.add_argument('--rate', type=float, default=100.0, help='Demo loop rate in Hz (default: 100)')
+    parser.add_argument('--duration', type=float, default=4.0, help='Demo duration in seconds (default: 4)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("MOTOR REGISTRY")
+    print("=" * 70)
+    print()
+
+    if args.demo:
+        run_demo(args.rate, args.duration)
+        return
+
+    if args.cache:
+        registry = MotorRegistry.from_cache(DiscoveryCache())
+    elif args.port:
+        registry = MotorRegistry.from_table(dict(parse_assignment(s) for s in args.port))
+    else:
+        # Whole table on one placeholder port, to show the aliases
+        registry = MotorRegistry.from_table({m: 'bus' for m in MOTOR_TABLE})
+
+    print(f"  {'motor':>5}  {'port':<16} {'byte':>6}  {'format':<9} {'CAN ID':>6}")
+    for motor in sorted(registry.routes):
+        r = registry.routes[motor]
+        print(f"  {motor:>5}  {r.port:<16} 0x{r.byte_val:02x}  {'extended' if r.extended else 'standard':<9} "
+              f"{r.can_id:>6}")
+    print()
+    for group in registry.aliases():
+        print(f"  [WARNING] Motors {group} share one device (same port and byte value)")
+
+    if args.broadcast:
+        print()
+        broadcast_all(registry, args.broadcast)
+
+
+def print_group_result(result: GroupResult):
+    print(f"  [OK] {result.command} -> group '{result.group}': {result.frames} frames, "
+          f"time to last frame {result.time_to_last_frame * 1000:.2f} ms")
+    for port, seconds in result.port_seconds.items():
+        print(f"       {port:<16} {seconds * 1000:.2f} ms")
+
+
+def broadcast_all(registry: MotorRegistry, command: str) -> bool:
+    """Connect every assigned adapter and broadcast one command to all motors"""
+    from l91_adapter import L91Adapter
+
+    adapters = []
+    for port in sorted({r.port for r in registry.routes.values()}):
+        adapter = L91Adapter(port)
+        if not adapter.connect():
+            for a in adapters:
+                a.disconnect()
+            return False
+        registry.attach(port, adapter)
+        adapters.append(adapter)
+    try:
+        registry.define_group('all')
+        print_group_result(registry.broadcast('all', command))
+        return True
+    finally:
+        registry.close()
+        for adapter in adapters:
+            adapter.disconnect()
+
+
+if __name__ == '__main__':
+    main()
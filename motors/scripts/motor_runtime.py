@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Multi-process motor runtime: one worker process per USB-CAN adapter
+Each worker owns one adapter and runs its own ControlLoop (motor_controller.py),
+pinned to its own core, so serial I/O, feedback decoding and control math for
+different buses never wait on one interpreter lock. The coordinator exchanges
+setpoints and telemetry with the workers through one shared-memory block.
+
+Shared memory layout (one block, two NumPy structured arrays):
+  joints[n_joints]  motor_id, bus, target, velocity_ff      <- coordinator writes
+                    position, velocity, torque, temperature,
+                    feedback_time, command                    <- worker writes
+  buses[n_buses]    pid, core, ticks, overruns, timing stats  <- worker writes
+
+Every field has a single writer and is a naturally aligned 8-byte value, so
+no locking is needed; a reader may see one joint's fields from different ticks.
+
+The same runtime also has a threaded mode (one thread per adapter, same
+arrays) so the two can be benchmarked against each other.
+
+Usage:
+  python motor_runtime.py --benchmark                        # simulated buses, both modes
+  python motor_runtime.py --bus /dev/ttyUSB0:6 --bus /dev/ttyUSB1:8 --target 0.5
+"""
+
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import _paths  # ../../tools on sys.path for metrics
+from l91_adapter import parse_bus
+from metrics import gauge, start_from_env
+from motor_controller import ControlLoop, JointController, SimulatedBus
+
+JOINT_DTYPE = np.dtype([
+    ('motor_id', '<i8'),
+    ('bus', '<i8'),
+    ('target', '<f8'),
+    ('velocity_ff', '<f8'),
+    ('position', '<f8'),
+    ('velocity', '<f8'),
+    ('torque', '<f8'),
+    ('temperature', '<f8'),
+    ('feedback_time', '<f8'),
+    ('command', '<f8'),
+])
+
+BUS_DTYPE = np.dtype([
+    ('pid', '<i8'),
+    ('core', '<i8'),
+    ('running', '<i8'),
+    ('ticks', '<i8'),
+    ('overruns', '<i8'),
+    ('compute_p99_us', '<f8'),
+    ('busy_p99_us', '<f8'),
+    ('jitter_std_us', '<f8'),
+    ('jitter_max_us', '<f8'),
+])
+
+STATS_INTERVAL = 1.0   # seconds between worker stats updates
+
+
+def _views(buf, n_joints: int, n_buses: int):
+    """Structured array views over a shared buffer"""
+    joints = np.ndarray(n_joints, dtype=JOINT_DTYPE, buffer=buf)
+    buses = np.ndarray(n_buses, dtype=BUS_DTYPE, buffer=buf, offset=n_joints * JOINT_DTYPE.itemsize)
+    return joints, buses
+
+
+def _block_size(n_joints: int, n_buses: int) -> int:
+    return n_joints * JOINT_DTYPE.itemsize + n_buses * BUS_DTYPE.itemsize
+
+
+def pin_to_core(core: Optional[int]) -> bool:
+    """Pin the calling process to one core (Linux only); returns True on success"""
+    if core is None or not hasattr(os, 'sched_setaffinity'):
+        return False
+    try:
+        os.sched_setaffinity(0, {core})
+        return True
+    except OSError:
+        return False
+
+
+def plan_cores(n_buses: int) -> List[Optional[int]]:
+    """One core per bus, keeping the first available core for the coordinator"""
+    if not hasattr(os, 'sched_getaffinity'):
+        return [None] * n_buses
+    cores = sorted(os.sched_getaffinity(0))
+    workers = cores[1:] or cores
+    return [workers[i % len(workers)] for i in range(n_buses)]
+
+
+def _bus_loop(bus_index: int, port: str, rate_hz: float, joints, buses, stop_event,
+              simulate: bool, gains: Dict[str, float]):
+    """Body of one bus worker (process or thread)"""
+    rows = np.flatnonzero(joints['bus'] == bus_index)
+    motor_ids = joints['motor_id'][rows].tolist()
+
+    if simulate:
+        adapter = SimulatedBus(motor_ids)
+    else:
+        from l91_adapter import L91Adapter
+        from l91_protocol import activation_frame, byte_val_for_motor
+        adapter = L91Adapter(port, adapter_id=bus_index)
+        if not adapter.connect():
+            return
+        for motor in motor_ids:
+            adapter.transact(activation_frame(byte_val_for_motor(motor)))
+
+    controller = JointController(motor_ids, **gains)
+    loop = ControlLoop(controller, {adapter: motor_ids}, rate_hz)
+    stats_every = max(1, int(rate_hz * STATS_INTERVAL))
+    bus = buses[bus_index:bus_index + 1]
+
+    def exchange(loop_):
+        # Setpoints in for the next tick, telemetry out from this one
+        controller.target[:] = joints['target'][rows]
+        controller.velocity_ff[:] = joints['velocity_ff'][rows]
+        joints['position'][rows] = controller.position
+        joints['velocity'][rows] = controller.velocity
+        joints['torque'][rows] = controller.torque
+        joints['temperature'][rows] = controller.temperature
+        joints['feedback_time'][rows] = controller.feedback_time
+        joints['command'][rows] = controller.command
+        if loop_.timer.ticks % stats_every == 0:
+            _publish_stats(bus, loop_.timer)
+
+    bus['running'] = 1
+    try:
+        loop.run(on_tick=exchange, stop_event=stop_event)
+    finally:
+        _publish_stats(bus, loop.timer)
+        bus['running'] = 0
+        if not simulate:
+            adapter.disconnect()
+
+
+def _publish_stats(bus, timer):
+    s = timer.summary()
+    if not s['ticks']:
+        return
+    bus['ticks'] = s['ticks']
+    bus['overruns'] = s['overruns']
+    bus['compute_p99_us'] = s['compute_p99_us']
+    bus['busy_p99_us'] = s['busy_p99_us']
+    bus['jitter_std_us'] = s['jitter_std_us']
+    bus['jitter_max_us'] = s['jitter_max_us']
+
+
+def bus_worker(bus_index: int, port: str, rate_hz: float, shm_name: str, n_joints: int,
+               n_buses: int, core: Optional[int], stop_event, simulate: bool,
+               gains: Dict[str, float]):
+    """Process entry point (module level so it also works with the spawn start method)"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    joints, buses = _views(shm.buf, n_joints, n_buses)
+    try:
+        buses['pid'][bus_index] = os.getpid()
+        buses['core'][bus_index] = core if pin_to_core(core) else -1
+        _bus_loop(bus_index, port, rate_hz, joints, buses, stop_event, simulate, gains)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Views must be gone before the mapping can be closed
+        del joints, buses
+        shm.close()
+
+
+class MotorRuntime:
+    """Coordinator for one control loop per bus, as processes or threads"""
+
+    def __init__(self, buses: Dict[str, Sequence[int]], rate_hz: float = 200.0,
+                 mode: str = 'process', simulate: bool = False,
+                 gains: Optional[Dict[str, float]] = None):
+        if mode not in ('process', 'thread'):
+            raise ValueError(f"mode must be 'process' or 'thread', got {mode!r}")
+        self.ports = list(buses)
+        self.rate_hz = rate_hz
+        self.mode = mode
+        self.simulate = simulate
+        self.gains = gains or {}
+
+        motors = [(i, m) for i, port in enumerate(self.ports) for m in buses[port]]
+        self.n_joints = len(motors)
+        self.n_buses = len(self.ports)
+
+        self._shm = None
+        if mode == 'process':
+            self._shm = shared_memory.SharedMemory(create=True, size=_block_size(self.n_joints, self.n_buses))
+            buf = self._shm.buf
+        else:
+            buf = bytearray(_block_size(self.n_joints, self.n_buses))
+        self.joints, self.buses = _views(buf, self.n_joints, self.n_buses)
+        self.joints[:] = 0
+        self.buses[:] = 0
+        self.joints['bus'] = [b for b, _ in motors]
+        self.joints['motor_id'] = [m for _, m in motors]
+        self.joints['feedback_time'] = -np.inf
+
+        self._row = {int(m): i for i, m in enumerate(self.joints['motor_id'])}
+        self._workers = []
+        self._stop = mp.Event() if mode == 'process' else threading.Event()
+
+    def start(self):
+        """Start one worker per bus"""
+        cores = plan_cores(self.n_buses) if self.mode == 'process' else [None] * self.n_buses
+        for i, port in enumerate(self.ports):
+            if self.mode == 'process':
+                worker = mp.Process(
+                    target=bus_worker, name=f"bus-{i}", daemon=True,
+                    args=(i, port, self.rate_hz, self._shm.name, self.n_joints, self.n_buses,
+                          cores[i], self._stop, self.simulate, self.gains))
+            else:
+                worker = threading.Thread(
+                    target=_bus_loop, name=f"bus-{i}", daemon=True,
+                    args=(i, port, self.rate_hz, self.joints, self.buses, self._stop,
+                          self.simulate, self.gains))
+            worker.start()
+            self._workers.append(worker)
+
+    def wait_running(self, timeout: float = 5.0) -> bool:
+        """Wait until every worker has entered its loop"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.buses['running'].all():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def set_target(self, targets: Dict[int, float], velocity_ff: Optional[Dict[int, float]] = None):
+        """Set target position (rad) per motor id, optionally with feed-forward velocity"""
+        for motor, position in targets.items():
+            self.joints['target'][self._row[motor]] = position
+        for motor, velocity in (velocity_ff or {}).items():
+            self.joints['velocity_ff'][self._row[motor]] = velocity
+
+    def set_targets(self, positions: np.ndarray):
+        """Set every target at once (order of the joints array)"""
+        self.joints['target'] = positions
+
+    def telemetry(self) -> np.ndarray:
+        """Snapshot (copy) of the joint table"""
+        return self.joints.copy()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the workers (each sends JOG stop on exit) and release shared memory"""
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout)
+            if self.mode == 'process' and worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        stats = self.buses.copy()
+        if self._shm is not None:
+            # Drop our views before closing, or the buffer cannot be released
+            self.joints = self.joints.copy()
+            self.buses = stats
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        return stats
+
+    def export_metrics(self):
+        """Publish the workers' shared-memory stats as gauges (worker processes have their own registries)"""
+        for field in ('ticks', 'overruns', 'busy_p99_us', 'jitter_std_us', 'jitter_max_us'):
+            metric = gauge(f'motor_runtime_{field}', f'Bus worker {field} (from shared memory)', ['bus', 'port'])
+            for i, port in enumerate(self.ports):
+                metric.labels(i, port).set_function(lambda i=i, field=field: float(self.buses[field][i]))
+        position = gauge('motor_position_radians', 'Last feedback position', ['motor'])
+        for motor, row in self._row.items():
+            position.labels(motor).set_function(lambda row=row: float(self.joints['position'][row]))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def coordinator_load(duration: float, runtime: MotorRuntime, work: int) -> int:
+    """
+    Stand-in for the rest of the application (telemetry decoding, planning,
+    vision glue): pure-Python work interleaved with setpoint updates.
+    Returns how many iterations were completed.
+    """
+    n = runtime.n_joints
+    phase = np.linspace(0.0, np.pi, n)
+    iterations = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        t = time.perf_counter() - start
+        runtime.set_targets(0.5 * np.sin(2.0 * np.pi * 0.5 * t + phase))
+        acc = 0
+        for i in range(work):
+            acc += i * i
+        runtime.telemetry()
+        iterations += 1
+    return iterations
+
+
+def benchmark(mode: str, n_buses: int, joints: int, rate_hz: float, duration: float, work: int):
+    """Run simulated buses in one mode; returns (bus stats, coordinator iterations/s)"""
+    per_bus = [list(range(1 + b * joints // n_buses, 1 + (b + 1) * joints // n_buses))
+               for b in range(n_buses)]
+    buses = {f"sim{b}": motors for b, motors in enumerate(per_bus)}
+    runtime = MotorRuntime(buses, rate_hz, mode=mode, simulate=True)
+    runtime.start()
+    try:
+        if not runtime.wait_running():
+            print(f"  [FAIL] {mode} workers did not start")
+        iterations = coordinator_load(duration, runtime, work)
+    finally:
+        stats = runtime.stop()
+    return stats, iterations / duration
+
+
+def print_benchmark(results, rate_hz: float, duration: float):
+    print()
+    print("=" * 70)
+    print("BENCHMARK")
+    print("=" * 70)
+    expected = rate_hz * duration
+    print(f"  {'mode':<8} {'bus':>3} {'ticks':>7} {'rate':>8} {'overrun':>7} "
+          f"{'p99 tick':>9} {'jit std':>8} {'jit max':>9} {'core':>5}")
+    for mode, (stats, coord_rate) in results.items():
+        for i, b in enumerate(stats):
+            print(f"  {mode:<8} {i:>3} {b['ticks']:>7} {b['ticks'] / duration:>6.0f}Hz {b['overruns']:>7} "
+                  f"{b['busy_p99_us']:>7.0f}us {b['jitter_std_us']:>6.0f}us {b['jitter_max_us']:>7.0f}us "
+                  f"{b['core'] if mode == 'process' else '-':>5}")
+        print(f"  {mode:<8} coordinator: {coord_rate:.0f} iterations/s")
+    print()
+    print(f"  Target: {rate_hz:.0f} Hz per bus ({expected:.0f} ticks in {duration:.0f} s)")
+    if len(results) == 2:
+        thread_jit = np.mean(results['thread'][0]['jitter_std_us'])
+        proc_jit = np.mean(results['process'][0]['jitter_std_us'])
+        marker = "[OK]" if proc_jit <= thread_jit else "[WARNING]"
+        print(f"  {marker} Mean jitter std: process {proc_jit:.0f} us vs thread {thread_jit:.0f} us")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='One control-loop process per USB-CAN adapter')
+    parser.add_argument('--bus', action='append', default=[], metavar='PORT:MOTORS',
+                       help='Adapter and its motor ids, e.g. /dev/ttyUSB0:6 (repeat per adapter)')
+    parser.add_argument('--mode', choices=['process', 'thread'], default='process',
+                       help='Worker type (default: process)')
+    parser.add_argument('--rate', type=float, default=200.0, help='Loop rate per bus in Hz (default: 200)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Run time in seconds (default: 5)')
+    parser.add_argument('--target', type=float, default=0.0, help='Target position for all motors in rad')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Compare process vs thread mode on simulated buses')
+    parser.add_argument('--buses', type=int, default=2, help='Simulated buses for --benchmark (default: 2)')
+    parser.add_argument('--joints', type=int, default=15, help='Simulated joints for --benchmark (default: 15)')
+    parser.add_argument('--work', type=int, default=20000,
+                       help='Coordinator pure-Python work per iteration for --benchmark (default: 20000)')
+    parser.add_argument('--metrics-port', type=int,
+                       help='Serve Prometheus metrics on this local port (default: $METRICS_PORT)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("MOTOR RUNTIME")
+    print("=" * 70)
+    print()
+
+    if args.benchmark:
+        results = {}
+        for mode in ('thread', 'process'):
+            print(f"  Running {mode} mode: {args.buses} buses, {args.joints} joints, "
+                  f"{args.rate:.0f} Hz, {args.duration:.0f} s...")
+            results[mode] = benchmark(mode, args.buses, args.joints, args.rate, args.duration, args.work)
+        print_benchmark(results, args.rate, args.duration)
+        return
+
+    if not args.bus:
+        parser.error("at least one --bus is required unless --benchmark is given")
+
+    buses = dict(parse_bus(spec) for spec in args.bus)
+    runtime = MotorRuntime(buses, args.rate, mode=args.mode)
+    runtime.export_metrics()
+    start_from_env(args.metrics_port)
+    try:
+        runtime.start()
+        if not runtime.wait_running(10.0):
+            print("  [FAIL] Not all bus workers started")
+            sys.exit(1)
+        print(f"  [OK] {len(buses)} bus workers running ({args.mode} mode)")
+        runtime.set_target({m: args.target for motors in buses.values() for m in motors})
+
+        end = time.monotonic() + args.duration
+        while time.monotonic() < end:
+            time.sleep(0.5)
+            for row in runtime.telemetry():
+                print(f"  Motor {row['motor_id']:>2}: pos={row['position']:+.3f} rad  "
+                      f"vel={row['velocity']:+.3f} rad/s  cmd={row['command']:+.3f} rad/s")
+
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+    finally:
+        stats = runtime.stop()
+        for i, b in enumerate(stats):
+            print(f"  Bus {i}: {b['ticks']} ticks, overruns={b['overruns']}, "
+                  f"jitter std={b['jitter_std_us']:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
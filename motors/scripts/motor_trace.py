@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Span tracing for the motor command path, exported as Chrome trace JSON
+Open the exported file in chrome://tracing or https://ui.perfetto.dev (the
+file stays local; Perfetto loads it in the browser).
+
+Stages recorded by L91Adapter / ControlLoop when tracing is enabled:
+  encode          building JOG / command frames
+  enqueue         ser.write() handing bytes to the OS serial driver
+  write           ser.flush() until the driver has sent them to the adapter
+  first_rx_byte   instant: RX data seen after the line was idle
+  decode          parsing the RX bytes into frames (and feedback decode)
+  frame_complete  instant per parsed frame
+  motor N         async span from the end of a write to that motor's reply
+
+Tracing is off by default. Disabled, span() returns a shared no-op context
+manager and the adapter skips the traced path with one attribute check.
+Enabled, the write path also waits for flush(), which is part of what it
+measures.
+
+Enable in code (TRACER.enable(); ...; TRACER.export_chrome(path)) or for any
+script with the environment variable MOTOR_TRACE=trace.json (exported at exit).
+
+Usage:
+  MOTOR_TRACE=trace.json python motor_controller.py --port /dev/ttyUSB0 --motors 6
+  python motor_trace.py trace.json          # per-stage duration summary
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+CATEGORY = 'motor'
+
+
+class _NullSpan:
+    """No-op span returned while tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.complete(self.name, self.start, time.perf_counter_ns(), self.cat, self.args)
+        return False
+
+
+class Tracer:
+    """Collects trace events in memory; list.append is atomic, so threads can share one tracer"""
+
+    def __init__(self):
+        self.enabled = False
+        self.events: List[tuple] = []
+        self.pid = os.getpid()
+        self._origin_ns = time.perf_counter_ns()
+        self._thread_names: Dict[int, str] = {}
+
+    def enable(self):
+        self._origin_ns = time.perf_counter_ns()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.events = []
+
+    def _tid(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def span(self, name: str, cat: str = CATEGORY, **args):
+        """Context manager timing one stage (no-op while disabled)"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def complete(self, name: str, start_ns: int, end_ns: int, cat: str = CATEGORY, args=None):
+        """Record a finished span from perf_counter_ns() timestamps"""
+        if self.enabled:
+            self.events.append(('X', name, cat, start_ns, end_ns - start_ns, self._tid(), args, None))
+
+    def instant(self, name: str, cat: str = CATEGORY, ts_ns: Optional[int] = None, **args):
+        if self.enabled:
+            ts = time.perf_counter_ns() if ts_ns is None else ts_ns
+            self.events.append(('i', name, cat, ts, 0, self._tid(), args, None))
+
+    def async_begin(self, name: str, span_id, ts_ns: int, cat: str = CATEGORY, **args):
+        """Start of a span that ends on another event (e.g. write -> motor reply)"""
+        if self.enabled:
+            self.events.append(('b', name, cat, ts_ns, 0, self._tid(), args, span_id))
+
+    def async_end(self, name: str, span_id, ts_ns: int, cat: str = CATEGORY, **args):
+        if self.enabled:
+            self.events.append(('e', name, cat, ts_ns, 0, self._tid(), args, span_id))
+
+    def chrome_events(self) -> List[dict]:
+        """Events in Chrome trace format (timestamps in microseconds)"""
+        origin = self._origin_ns
+        out = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+               for tid, name in self._thread_names.items()]
+        for ph, name, cat, ts, dur, tid, args, span_id in list(self.events):
+            event = {'name': name, 'cat': cat, 'ph': ph, 'ts': (ts - origin) / 1000.0,
+                     'pid': self.pid, 'tid': tid}
+            if ph == 'X':
+                event['dur'] = dur / 1000.0
+            elif ph == 'i':
+                event['s'] = 't'
+            else:
+                event['id'] = str(span_id)
+            if args:
+                event['args'] = args
+            out.append(event)
+        return out
+
+    def export_chrome(self, path: str) -> int:
+        """Write a Chrome trace JSON file; returns the number of events"""
+        events = self.chrome_events()
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+TRACER = Tracer()
+span = TRACER.span
+
+
+def _enable_from_env():
+    path = os.environ.get('MOTOR_TRACE')
+    if not path:
+        return
+    TRACER.enable()
+
+    def export():
+        n = TRACER.export_chrome(path)
+        print(f"[OK] Wrote {n} trace events to {path}")
+
+    atexit.register(export)
+
+
+_enable_from_env()
+
+
+def summarize(path: str) -> Dict[str, Dict[str, float]]:
+    """Per-name duration stats (us) for complete and async spans in a trace file"""
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+
+    durations: Dict[str, List[float]] = {}
+    open_async: Dict[tuple, float] = {}
+    counts: Dict[str, int] = {}
+    for e in events:
+        ph = e.get('ph')
+        if ph == 'X':
+            durations.setdefault(e['name'], []).append(e['dur'])
+        elif ph == 'b':
+            open_async[(e['name'], e['id'])] = e['ts']
+        elif ph == 'e':
+            start = open_async.pop((e['name'], e['id']), None)
+            if start is not None:
+                durations.setdefault(e['name'], []).append(e['ts'] - start)
+        elif ph == 'i':
+            counts[e['name']] = counts.get(e['name'], 0) + 1
+
+    stats = {}
+    for name, values in durations.items():
+        values.sort()
+        n = len(values)
+        stats[name] = {
+            'count': n,
+            'p50_us': values[n // 2],
+            'p99_us': values[min(n - 1, int(n * 0.99))],
+            'max_us': values[-1],
+            'total_ms': sum(values) / 1000.0,
+        }
+    for name, n in counts.items():
+        stats[name] = {'count': n}
+    return stats
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Summarize a motor Chrome trace file')
+    parser.add_argument('trace', help='Trace JSON written by TRACER.export_chrome / MOTOR_TRACE')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"TRACE SUMMARY: {args.trace}")
+    print("=" * 70)
+    stats = summarize(args.trace)
+    print(f"  {'stage':<20} {'count':>7} {'p50 us':>9} {'p99 us':>9} {'max us':>9} {'total ms':>9}")
+    for name, s in sorted(stats.items(), key=lambda kv: -kv[1].get('total_ms', 0.0)):
+        if 'p50_us' in s:
+            print(f"  {name:<20} {s['count']:>7} {s['p50_us']:>9.1f} {s['p99_us']:>9.1f} "
+                  f"{s['max_us']:>9.1f} {s['total_ms']:>9.2f}")
+        else:
+            print(f"  {name:<20} {s['count']:>7} {'(instant)':>9}")
+    print()
+    print("  Open the file in https://ui.perfetto.dev or chrome://tracing for the timeline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Low-latency tuning for the USB-CAN adapters' serial ports
+Our traffic is small frames, so adapter RTT is dominated by buffering in the
+USB-serial driver rather than by the 921600 baud link. Applied where the
+platform and chip allow it:
+  - ASYNC_LOW_LATENCY (TIOCSSERIAL, via pyserial set_low_latency_mode):
+    the tty layer pushes received bytes to readers immediately
+  - FTDI latency_timer (sysfs) 16 ms -> 1 ms: how long the chip holds a
+    partly filled USB packet. Needs write access to sysfs; without it the
+    udev rule below makes it permanent:
+      ACTION=="add", SUBSYSTEM=="usb-serial", DRIVER=="ftdi_sio", ATTR{latency_timer}="1"
+CH340 and CP210x have no latency timer; they still get the low-latency
+flag. Each step is best effort and recorded in a TuningResult.
+
+termios VMIN/VTIME is deliberately left alone: pyserial opens the port
+O_NONBLOCK, waits in select() and sets VMIN=0 itself (again on every
+reconfigure), so VMIN=1 / VTIME=0 would change nothing.
+
+L91Adapter.connect() applies this by default (low_latency=True) and keeps
+the result in adapter.tuning. This script measures adapter RTT before and
+after tuning and stores the effective configuration per adapter in the
+discovery cache.
+
+Usage:
+  python serial_tuning.py /dev/ttyUSB0 /dev/ttyUSB1           # AT+AT round trips
+  python serial_tuning.py /dev/ttyUSB0 --motor 6 --samples 200  # motor feedback round trips
+"""
+
+import os
+import select
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+LATENCY_TIMER_MS = 1
+
+# USB vendor id -> chip family
+USB_CHIPS = {0x0403: 'FTDI', 0x1a86: 'CH340', 0x10c4: 'CP210x'}
+
+RTT_SAMPLES = 100
+RTT_TIMEOUT = 0.2      # seconds to wait for a reply before counting a probe as lost
+
+
+class TuningResult(NamedTuple):
+    port: str
+    chip: Optional[str]
+    low_latency: bool                    # ASYNC_LOW_LATENCY set
+    latency_timer_before: Optional[int]  # ms; None if the chip has no latency timer
+    latency_timer: Optional[int]         # ms, effective after tuning
+    notes: List[str]
+
+
+def usb_chip(port: str) -> Optional[str]:
+    """Chip family of a USB-serial port from its vendor id, if recognised"""
+    try:
+        from serial.tools import list_ports
+    except ImportError:
+        return None
+    device = os.path.realpath(port)
+    for info in list_ports.comports():
+        if info.device in (port, device) and info.vid is not None:
+            return USB_CHIPS.get(info.vid, f'{info.vid:04x}:{info.pid:04x}')
+    return None
+
+
+def latency_timer_path(port: str) -> Optional[str]:
+    """sysfs latency_timer of an FTDI port (Linux), if it exists"""
+    name = os.path.basename(os.path.realpath(port))
+    path = f'/sys/bus/usb-serial/devices/{name}/latency_timer'
+    return path if os.path.exists(path) else None
+
+
+def read_latency_timer(port: str) -> Optional[int]:
+    path = latency_timer_path(port)
+    if path is None:
+        return None
+    with open(path) as f:
+        return int(f.read().strip())
+
+
+def set_latency_timer(port: str, ms: int = LATENCY_TIMER_MS) -> Optional[int]:
+    """Write the latency timer; returns the value read back (raises OSError without permission)"""
+    path = latency_timer_path(port)
+    if path is None:
+        return None
+    with open(path, 'w') as f:
+        f.write(str(ms))
+    return read_latency_timer(port)
+
+
+def tune(ser, port: Optional[str] = None, latency_ms: int = LATENCY_TIMER_MS) -> TuningResult:
+    """Apply every available low-latency setting to an open pyserial port"""
+    port = port or ser.port
+    notes = []
+
+    low_latency = False
+    if hasattr(ser, 'set_low_latency_mode'):
+        try:
+            ser.set_low_latency_mode(True)
+            low_latency = True
+        except (OSError, IOError, ValueError) as e:
+            notes.append(f"ASYNC_LOW_LATENCY: {e}")
+    else:
+        notes.append("ASYNC_LOW_LATENCY: not supported on this platform")
+
+    before = after = None
+    try:
+        before = after = read_latency_timer(port)
+        if before is not None and before != latency_ms:
+            after = set_latency_timer(port, latency_ms)
+    except (OSError, ValueError) as e:
+        notes.append(f"latency_timer: {e} (see the udev rule in serial_tuning.py)")
+
+    return TuningResult(port, usb_chip(port), low_latency, before, after, notes)
+
+
+def _wait_readable(ser, timeout: float) -> bool:
+    """Block until the port has data (select on POSIX, short polls elsewhere)"""
+    if hasattr(ser, 'fileno'):
+        try:
+            return bool(select.select([ser.fileno()], [], [], timeout)[0])
+        except (OSError, ValueError, AttributeError):
+            pass
+    deadline = time.perf_counter() + timeout
+    while not ser.in_waiting:
+        if time.perf_counter() >= deadline:
+            return False
+        time.sleep(0.0002)
+    return True
+
+
+def measure_rtt(adapter, samples: int = RTT_SAMPLES, motor: Optional[int] = None,
+                timeout: float = RTT_TIMEOUT) -> Dict[str, float]:
+    """
+    Round trips on a connected L91Adapter: AT+AT until the adapter's first
+    reply byte, or (with motor) an activation frame until that motor's
+    complete feedback frame. Returns p50 / p99 / max in seconds and the
+    number of lost probes.
+    """
+    from l91_protocol import CMD_AT_AT, FrameParser, activation_frame, byte_val_for_motor
+
+    ser = adapter.ser
+    probe = CMD_AT_AT if motor is None else activation_frame(byte_val_for_motor(motor))
+    rtts = []
+    lost = 0
+    for _ in range(samples):
+        time.sleep(0.005)
+        ser.reset_input_buffer()
+        parser = FrameParser()
+        t0 = time.perf_counter()
+        ser.write(probe)
+        deadline = t0 + timeout
+        done = False
+        while not done:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not _wait_readable(ser, remaining):
+                break
+            data = ser.read(ser.in_waiting or 1)
+            if motor is None:
+                done = bool(data)
+            else:
+                done = any((f.arbitration_id >> 8) & 0xFF == motor for f in parser.feed(data))
+        if done:
+            rtts.append(time.perf_counter() - t0)
+        else:
+            lost += 1
+    rtts.sort()
+    n = len(rtts)
+    if not n:
+        return {'samples': samples, 'lost': lost}
+    return {'samples': samples, 'lost': lost, 'p50': rtts[n // 2],
+            'p99': rtts[min(n - 1, int(n * 0.99))], 'max': rtts[-1]}
+
+
+def _format_rtt(stats: Dict[str, float]) -> str:
+    if 'p50' not in stats:
+        return f"no replies ({stats['lost']} lost)"
+    lost = f", {stats['lost']} lost" if stats['lost'] else ''
+    return (f"p50 {stats['p50'] * 1e3:.2f} ms  p99 {stats['p99'] * 1e3:.2f} ms  "
+            f"max {stats['max'] * 1e3:.2f} ms{lost}")
+
+
+def tune_and_measure(port: str, samples: int, motor: Optional[int] = None, cache=None) -> bool:
+    """Measure RTT with the port as found, tune it, measure again, record the result"""
+    from l91_adapter import L91Adapter
+
+    print(f"{port}")
+    adapter = L91Adapter(port, low_latency=False)
+    if not adapter.connect():
+        return False
+    try:
+        before = measure_rtt(adapter, samples, motor)
+        print(f"  Before: {_format_rtt(before)}")
+        result = tune(adapter.ser, port)
+        after = measure_rtt(adapter, samples, motor)
+        print(f"  After:  {_format_rtt(after)}")
+    finally:
+        adapter.disconnect()
+
+    timer = 'n/a' if result.latency_timer is None else f"{result.latency_timer} ms"
+    if result.latency_timer_before not in (None, result.latency_timer):
+        timer = f"{result.latency_timer_before} -> {timer}"
+    print(f"  Chip: {result.chip or 'unknown'}  ASYNC_LOW_LATENCY: {'yes' if result.low_latency else 'no'}  "
+          f"latency_timer: {timer}")
+    for note in result.notes:
+        print(f"  [WARNING] {note}")
+    if 'p50' in before and 'p50' in after:
+        change = 100.0 * (after['p50'] - before['p50']) / before['p50']
+        print(f"  {'[OK]' if change <= 0 else '[WARNING]'} p50 RTT {change:+.1f}%")
+
+    if cache is not None:
+        cache.update(port, tuning=result._asdict(), rtt_before=before, rtt_after=after,
+                     rtt_probe='AT+AT' if motor is None else f'motor {motor}')
+    return 'p50' in after
+
+
+def main():
+    import argparse
+    from discovery_cache import DiscoveryCache
+
+    parser = argparse.ArgumentParser(description='Apply and measure low-latency serial settings')
+    parser.add_argument('ports', nargs='+', help='Adapter serial ports (e.g. /dev/ttyUSB0)')
+    parser.add_argument('--samples', type=int, default=RTT_SAMPLES,
+                       help=f'Round trips per measurement (default: {RTT_SAMPLES})')
+    parser.add_argument('--motor', type=int, help='Time motor feedback replies instead of AT+AT')
+    parser.add_argument('--no-cache', action='store_true', help="Don't record results in the discovery cache")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("SERIAL LOW-LATENCY TUNING")
+    print("=" * 70)
+    print()
+
+    cache = None if args.no_cache else DiscoveryCache()
+    ok = True
+    for port in args.ports:
+        ok = tune_and_measure(port, args.samples, args.motor, cache) and ok
+        print()
+    if cache is not None:
+        cache.save()
+        print(f"  Results recorded in {cache.path}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Deterministic replay of a recorded control session for regression benchmarks
+Feeds a .canlog capture (motor_controller.py --record) back through the
+control stack against emulated adapters and checks that the stack writes
+exactly the JOG frames that were recorded.
+
+How a capture is replayed:
+  - controller and bus settings come from the capture's .json sidecar
+  - each control tick is one JOG write per adapter; tick k gets the RX
+    frames recorded between tick k-1 and tick k (the first tick gets none)
+  - each tick runs on the loop clock (now, dt) recorded with it, not the
+    wall clock, so the output does not depend on replay speed; --speed 1
+    paces ticks as recorded, --speed 0 runs as fast as possible
+  - the final JOG write per adapter is the loop's stop() and is compared too
+
+Captures without clock records have the clock rebuilt from write times;
+with ki > 0 the integral then drifts from the original, so use --tolerance.
+
+To compare two code versions, point --against at the other checkout's
+motors/scripts directory; each version is replayed in its own process and
+the command output, latency and throughput are compared.
+
+Usage:
+  python motor_controller.py --simulate 15 --duration 5 --record session.canlog
+  python session_replay.py session.canlog                    # replay with this tree
+  python session_replay.py session.canlog --speed 1          # at recorded speed
+  python session_replay.py session.canlog --against ../../other/motors/scripts
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from can_recorder import CLOCK_DT, CLOCK_NOW, DIR_RX, DIR_TX, FLAG_AT_COMMAND, FLAG_CLOCK, CanCapture
+from l91_protocol import TYPE_JOG, Frame, parse_frames
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that make up the control stack; reloaded from --stack
+STACK_MODULES = ('motor_controller', 'motor_trace', 'l91_protocol')
+
+
+class Tick(NamedTuple):
+    t_ns: int
+    rx: Dict[int, List[Frame]]     # adapter id -> frames delivered before this tick
+    tx: Dict[int, bytes]           # adapter id -> recorded write
+    now: Optional[float] = None    # recorded loop clock, if the capture has it
+    dt: Optional[float] = None
+
+
+class ReplayAdapter:
+    """Emulated adapter: serves the RX frames set for the current tick and collects writes"""
+
+    def __init__(self, adapter_id: int):
+        self.adapter_id = adapter_id
+        self.rx: List[Frame] = []
+        self.tx: List[bytes] = []
+
+    def read_frames(self, timeout: float = 0.0) -> List[Frame]:
+        frames, self.rx = self.rx, []
+        return frames
+
+    def write(self, data: bytes):
+        self.tx.append(data)
+
+    def take(self) -> bytes:
+        data = b''.join(self.tx)
+        self.tx = []
+        return data
+
+
+def _frames(rows) -> List[Frame]:
+    return [Frame(int(r['can_id']), bytes(r['data'][:r['dlc']])) for r in rows]
+
+
+def load_ticks(capture: CanCapture) -> List[Tick]:
+    """Split a capture into control ticks (JOG writes) with the RX frames each tick read"""
+    adapters = {int(a) for a in capture.session['buses']}
+    records = np.asarray(capture.records)
+    records = records[np.isin(records['adapter'], list(adapters))]
+
+    tx = records[(records['direction'] == DIR_TX) & (records['flags'] & (FLAG_AT_COMMAND | FLAG_CLOCK) == 0)
+                 & ((records['can_id'] >> 24) == TYPE_JOG)]
+    rx = records[records['direction'] == DIR_RX]
+    clock = records[(records['flags'] & FLAG_CLOCK) != 0]
+    clock_now = clock[clock['can_id'] == CLOCK_NOW]
+    clock_dt = clock[clock['can_id'] == CLOCK_DT]
+
+    # One write = consecutive TX records with the same timestamp and adapter
+    if len(tx) == 0:
+        return []
+    change = (np.diff(tx['t_ns']) != 0) | (np.diff(tx['adapter']) != 0)
+    bounds = np.concatenate(([0], np.nonzero(change)[0] + 1, [len(tx)]))
+
+    ticks: List[Tick] = []
+    current: Dict[int, bytes] = {}
+    start_ns = 0
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        adapter = int(tx['adapter'][lo])
+        if adapter in current:
+            ticks.append(Tick(start_ns, {}, current))
+            current = {}
+        if not current:
+            start_ns = int(tx['t_ns'][lo])
+        current[adapter] = b''.join(f.encode() for f in _frames(tx[lo:hi]))
+    ticks.append(Tick(start_ns, {}, current))
+
+    rx_times = rx['t_ns']
+    for k in range(1, len(ticks)):
+        lo = int(np.searchsorted(rx_times, ticks[k - 1].t_ns, 'right'))
+        hi = int(np.searchsorted(rx_times, ticks[k].t_ns, 'right'))
+        for row in rx[lo:hi]:
+            ticks[k].rx.setdefault(int(row['adapter']), []).extend(_frames([row]))
+
+    # The clock record of tick k is the last one written before its JOG write
+    if len(clock_now) and len(clock_now) == len(clock_dt):
+        previous = -1
+        for k, tick in enumerate(ticks):
+            i = int(np.searchsorted(clock_now['t_ns'], tick.t_ns, 'right')) - 1
+            if i > previous:
+                ticks[k] = tick._replace(now=_clock_value(clock_now[i]), dt=_clock_value(clock_dt[i]))
+                previous = i
+    return ticks
+
+
+def _clock_value(row) -> float:
+    return float(np.frombuffer(row['data'].tobytes(), dtype='<f8')[0])
+
+
+def load_stack(stack_dir: str):
+    """Import motor_controller (and its protocol modules) from stack_dir"""
+    stack_dir = os.path.abspath(stack_dir)
+    for name in STACK_MODULES:
+        sys.modules.pop(name, None)
+    sys.path.insert(0, stack_dir)
+    try:
+        return importlib.import_module('motor_controller')
+    finally:
+        sys.path.remove(stack_dir)
+
+
+def _same_within(expected: bytes, actual: bytes, tolerance: int) -> bool:
+    if expected == actual:
+        return True
+    if tolerance <= 0:
+        return False
+    a, b = parse_frames(expected), parse_frames(actual)
+    if len(a) != len(b):
+        return False
+    for fa, fb in zip(a, b):
+        if fa.can_id != fb.can_id or fa.data[:6] != fb.data[:6]:
+            return False
+        if abs(int.from_bytes(fa.data[6:8], 'big') - int.from_bytes(fb.data[6:8], 'big')) > tolerance:
+            return False
+    return True
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {'p50_us': 0.0, 'p99_us': 0.0, 'max_us': 0.0}
+    values = np.sort(np.asarray(samples)) * 1e6
+    n = len(values)
+    return {'p50_us': float(values[n // 2]),
+            'p99_us': float(values[min(n - 1, int(n * 0.99))]),
+            'max_us': float(values[-1])}
+
+
+def replay(capture_path: str, stack_dir: str = HERE, speed: float = 0.0, tolerance: int = 0) -> dict:
+    """Replay a capture through the stack in stack_dir; returns the result summary"""
+    capture = CanCapture(capture_path)
+    settings = capture.session
+    if settings.get('tool') != 'motor_controller':
+        raise ValueError(f"{capture_path} has no controller settings (record it with motor_controller.py --record)")
+    ticks = load_ticks(capture)
+    if len(ticks) < 2:
+        raise ValueError(f"{capture_path} has no control ticks")
+
+    mc = load_stack(stack_dir)
+    controller = mc.JointController(
+        settings['motors'], kp=settings['kp'], ki=settings['ki'], kd=settings['kd'],
+        max_velocity=settings['max_velocity'], jog_full_scale=settings['jog_full_scale'],
+        integral_limit=settings['integral_limit'], feedback_timeout=settings['feedback_timeout'])
+    controller.set_target(np.asarray(settings['target']), np.asarray(settings['velocity_ff']))
+    adapters = {int(a): ReplayAdapter(int(a)) for a in settings['buses']}
+    loop = mc.ControlLoop(controller, {adapters[int(a)]: m for a, m in settings['buses'].items()},
+                          settings['rate_hz'])
+
+    t0_ns = ticks[0].t_ns
+    digest = hashlib.sha256()
+    compute, wall = [], []
+    mismatches = 0
+    first_mismatch = None
+    frames = 0
+
+    def check(k: int, tick: Tick):
+        nonlocal mismatches, first_mismatch, frames
+        for aid, adapter in adapters.items():
+            actual = adapter.take()
+            expected = tick.tx.get(aid, b'')
+            digest.update(actual)
+            frames += len(actual) // 17
+            if not _same_within(expected, actual, tolerance):
+                mismatches += 1
+                if first_mismatch is None:
+                    first_mismatch = {'tick': k, 'adapter': aid,
+                                      'expected': expected.hex(), 'actual': actual.hex()}
+
+    recorded_clock = all(t.now is not None for t in ticks[:-1])
+    start = time.perf_counter()
+    previous_ns = t0_ns
+    for k, tick in enumerate(ticks[:-1]):
+        if speed > 0:
+            delay = start + (tick.t_ns - t0_ns) / 1e9 / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        for aid, adapter in adapters.items():
+            adapter.rx = tick.rx.get(aid, [])
+        if recorded_clock:
+            now, dt = tick.now, tick.dt
+        else:
+            now = (tick.t_ns - t0_ns) / 1e9
+            dt = (tick.t_ns - previous_ns) / 1e9 if k else loop.period
+        previous_ns = tick.t_ns
+        w0 = time.perf_counter()
+        compute.append(loop.tick(dt, now))
+        wall.append(time.perf_counter() - w0)
+        check(k, tick)
+    loop.stop()
+    check(len(ticks) - 1, ticks[-1])
+    elapsed = time.perf_counter() - start
+
+    recorded = (ticks[-1].t_ns - t0_ns) / 1e9
+    return {
+        'capture': os.path.abspath(capture_path),
+        'stack': os.path.abspath(stack_dir),
+        'speed': speed,
+        'clock': 'recorded' if recorded_clock else 'rebuilt',
+        'ticks': len(ticks) - 1,
+        'frames': frames,
+        'mismatched_writes': mismatches,
+        'first_mismatch': first_mismatch,
+        'tx_sha256': digest.hexdigest(),
+        'recorded_seconds': recorded,
+        'replay_seconds': elapsed,
+        'ticks_per_second': (len(ticks) - 1) / elapsed if elapsed > 0 else 0.0,
+        'frames_per_second': frames / elapsed if elapsed > 0 else 0.0,
+        'compute': _percentiles(compute),
+        'tick': _percentiles(wall),
+    }
+
+
+def replay_subprocess(capture_path: str, stack_dir: str, speed: float, tolerance: int) -> dict:
+    """Run replay() for one stack in a fresh interpreter"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        out = f.name
+    try:
+        cmd = [sys.executable, os.path.abspath(__file__), capture_path, '--stack', stack_dir,
+               '--speed', str(speed), '--tolerance', str(tolerance), '--json', out, '--quiet']
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if not os.path.getsize(out):
+            raise RuntimeError(f"Replay with {stack_dir} failed:\n{result.stdout}{result.stderr}")
+        with open(out) as f:
+            return json.load(f)
+    finally:
+        os.unlink(out)
+
+
+def print_result(result: dict):
+    ok = result['mismatched_writes'] == 0
+    print(f"  Stack:    {result['stack']}")
+    print(f"  Ticks:    {result['ticks']}  ({result['frames']} frames, "
+          f"{result['recorded_seconds']:.2f} s recorded, replayed in {result['replay_seconds']:.2f} s, "
+          f"{result['clock']} clock)")
+    print(f"  Compute:  p50 {result['compute']['p50_us']:.1f} us  p99 {result['compute']['p99_us']:.1f} us  "
+          f"max {result['compute']['max_us']:.1f} us")
+    print(f"  Tick:     p50 {result['tick']['p50_us']:.1f} us  p99 {result['tick']['p99_us']:.1f} us")
+    print(f"  Rate:     {result['ticks_per_second']:.0f} ticks/s  {result['frames_per_second']:.0f} frames/s")
+    if ok:
+        print(f"  [OK] Command output identical to the capture (sha256 {result['tx_sha256'][:16]})")
+    else:
+        m = result['first_mismatch']
+        print(f"  [FAIL] {result['mismatched_writes']} writes differ; first at tick {m['tick']} "
+              f"adapter {m['adapter']}")
+        print(f"         expected {m['expected'][:68]}")
+        print(f"         actual   {m['actual'][:68]}")
+
+
+def print_comparison(a: dict, b: dict):
+    rows = [
+        ('compute p50 (us)', a['compute']['p50_us'], b['compute']['p50_us']),
+        ('compute p99 (us)', a['compute']['p99_us'], b['compute']['p99_us']),
+        ('tick p50 (us)', a['tick']['p50_us'], b['tick']['p50_us']),
+        ('tick p99 (us)', a['tick']['p99_us'], b['tick']['p99_us']),
+        ('ticks/s', a['ticks_per_second'], b['ticks_per_second']),
+        ('frames/s', a['frames_per_second'], b['frames_per_second']),
+    ]
+    print(f"  {'metric':<18} {'this tree':>12} {'against':>12} {'change':>9}")
+    for name, x, y in rows:
+        change = f"{100.0 * (x - y) / y:+.1f}%" if y else 'n/a'
+        print(f"  {name:<18} {x:>12.1f} {y:>12.1f} {change:>9}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay a recorded control session through the motor stack')
+    parser.add_argument('capture', help='.canlog recorded with motor_controller.py --record')
+    parser.add_argument('--stack', default=HERE, help='motors/scripts directory to replay with (default: this one)')
+    parser.add_argument('--against', metavar='DIR',
+                       help='Also replay with another motors/scripts directory and compare')
+    parser.add_argument('--speed', type=float, default=0.0,
+                       help='Replay speed: 1 = as recorded, 0 = as fast as possible (default: 0)')
+    parser.add_argument('--tolerance', type=int, default=0,
+                       help='Allowed JOG speed difference in encoder counts (default: 0, exact)')
+    parser.add_argument('--json', metavar='PATH', help='Write the result(s) as JSON')
+    parser.add_argument('--quiet', action='store_true', help='No report (with --json)')
+    args = parser.parse_args()
+
+    if args.against:
+        results = [replay_subprocess(args.capture, d, args.speed, args.tolerance)
+                   for d in (args.stack, args.against)]
+    else:
+        results = [replay(args.capture, args.stack, args.speed, args.tolerance)]
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results[0] if len(results) == 1 else results, f, indent=2)
+    ok = all(r['mismatched_writes'] == 0 for r in results)
+    if len(results) == 2:
+        ok = ok and results[0]['tx_sha256'] == results[1]['tx_sha256']
+    if args.quiet:
+        sys.exit(0 if ok else 1)
+
+    print("=" * 70)
+    print(f"SESSION REPLAY: {args.capture}")
+    print("=" * 70)
+    for result in results:
+        print()
+        print_result(result)
+    if len(results) == 2:
+        print()
+        same = results[0]['tx_sha256'] == results[1]['tx_sha256']
+        print(f"  {'[OK]' if same else '[FAIL]'} Both versions "
+              f"{'send identical commands' if same else 'send different commands'}")
+        print_comparison(*results)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
@@ -5,36 +5,53 @@
 
 // L91 Protocol Motor Control Library
 // Controls Robstride motors via serial AT commands at 921600 baud
+//
+// All send methods are non-blocking: frames are copied into the UART TX
+// buffer and the call returns immediately. Pacing between commands (e.g. the
+// settle time after activation) is the caller's job - see l91TxTask in main.cpp.
 
 // Motor CAN IDs (adjust as needed)
 #define MOTOR_12_CAN_ID  0x0C
 #define MOTOR_13_CAN_ID  0x0D
 #define MOTOR_14_CAN_ID  0x0E
 
+// Settle times the caller should leave after each command type
+#define L91_ACTIVATE_SETTLE_MS    200
+#define L91_DEACTIVATE_SETTLE_MS  100
+#define L91_LOAD_PARAMS_SETTLE_MS 200
+
+// Largest L91 frame we build (JOG: 17 bytes)
+#define L91_MAX_FRAME_LEN 20
+
+// UART TX ring buffer; large enough to absorb a burst of JOG frames
+#define L91_TX_BUFFER_SIZE 1024
+
 class L91Motor {
 private:
     HardwareSerial* serial;
     int baudRate;
-    
+
 public:
     L91Motor(HardwareSerial* serialPort, int baud = 921600);
-    
+
     // Initialize L91 serial communication
     bool begin();
-    
+
     // Motor control commands
     bool activateMotor(uint8_t can_id);
     bool deactivateMotor(uint8_t can_id);
     bool loadParams(uint8_t can_id);
     bool moveJog(uint8_t can_id, float speed, uint8_t flag);
-    
+
     // Helper: Send raw L91 AT command
     bool sendCommand(const uint8_t* cmd, size_t len);
-    
+
+    // Encode a JOG frame into buf (at least L91_MAX_FRAME_LEN bytes); returns length
+    static size_t encodeJog(uint8_t* buf, uint8_t can_id, float speed, uint8_t flag);
+
     // Convenience methods
     bool stopMotor(uint8_t can_id);
     bool moveMotor(uint8_t can_id, float speed);
 };
 
 #endif
-
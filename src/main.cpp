@@ -32,6 +32,75 @@ bool mpuInitialized = false;
 // L91 Motor Controller (using Serial2)
 L91Motor l91Motor(&Serial2, 921600);
 
+// Set to 1 to log every CAN frame / L91 write over USB serial. Each line
+// competes with the IMU stream for the console, so keep it off when measuring.
+#define BRIDGE_VERBOSE 0
+
+// Task layout: CAN RX and L91 TX sit on core 1 at high priority and talk
+// through l91Queue; sensor/servo/status work runs on core 0 and never blocks them.
+#define BRIDGE_CORE       1
+#define AUX_CORE          0
+#define CAN_RX_PRIORITY   5
+#define L91_TX_PRIORITY   4
+#define AUX_PRIORITY      1
+#define L91_QUEUE_DEPTH   32
+
+// USB console doubles as the binary IMU stream; 921600 leaves room for
+// 500 Hz frames next to the occasional status line
+#define CONSOLE_BAUD      921600
+
+// Binary IMU stream (decoded by tools/imu_stream_reader.py)
+// Frame, little-endian, 24 bytes:
+//   a5 5a | type u8 | seq u8 | t_us u32 | accel i16[3] | gyro i16[3] | temp i16 | crc16
+// accel LSB = 0.0025 m/s^2, gyro LSB = 0.0005 rad/s, temp LSB = 0.01 C
+// crc16 = CRC-16/CCITT-FALSE over the first 22 bytes
+#define IMU_RATE_HZ       500
+#define IMU_FRAME_TYPE    0x01
+#define IMU_ACCEL_SCALE   400.0f
+#define IMU_GYRO_SCALE    2000.0f
+#define IMU_TEMP_SCALE    100.0f
+
+struct __attribute__((packed)) ImuFrame {
+  uint8_t sync[2];
+  uint8_t type;
+  uint8_t seq;
+  uint32_t t_us;
+  int16_t accel[3];
+  int16_t gyro[3];
+  int16_t temp;
+  uint16_t crc;
+};
+
+enum L91CommandType : uint8_t {
+  L91_CMD_JOG,
+  L91_CMD_ACTIVATE,
+  L91_CMD_LOAD_PARAMS,
+};
+
+struct L91Command {
+  uint8_t type;
+  uint8_t can_id;
+  float speed;
+  uint32_t rx_us;  // micros() when the CAN frame arrived (0 for setup commands)
+};
+
+QueueHandle_t l91Queue = NULL;
+
+// Bridge statistics: written only by l91TxTask / canRxTask, read by statusTask
+struct BridgeStats {
+  volatile uint32_t frames;
+  volatile uint32_t dropped;
+  volatile uint32_t latencyMaxUs;
+  volatile uint64_t latencySumUs;
+};
+BridgeStats bridgeStats = {0, 0, 0, 0};
+
+void canRxTask(void* param);
+void l91TxTask(void* param);
+void sensorTask(void* param);
+void servoTask(void* param);
+void statusTask(void* param);
+
 // CAN bus configuration
 twai_general_config_t g_config = TWAI_GENERAL_CONFIG_DEFAULT(CAN_TX_PIN, CAN_RX_PIN, TWAI_MODE_NORMAL);
 twai_timing_config_t t_config = TWAI_TIMING_CONFIG_500KBITS();
@@ -42,6 +111,24 @@ void setPulse(int us) {
   ledcWrite(pwmChannel, duty);
 }
 
+uint16_t crc16Ccitt(const uint8_t* data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+    }
+  }
+  return crc;
+}
+
+int16_t scaleToInt16(float value, float scale) {
+  float scaled = value * scale;
+  if (scaled > 32767.0f) return 32767;
+  if (scaled < -32768.0f) return -32768;
+  return (int16_t)lroundf(scaled);
+}
+
 void setRGB(int r, int g, int b) {
   digitalWrite(redPin, r);
   digitalWrite(greenPin, g);
@@ -68,7 +155,7 @@ bool initCAN() {
 }
 
 void setup() {
-  Serial.begin(115200);
+  Serial.begin(CONSOLE_BAUD);
   delay(1000);
   
   Serial.println("\n========================================");
@@ -87,6 +174,7 @@ void setup() {
   
   // MPU-6050 I2C setup
   Wire.begin(sdaPin, sclPin);
+  Wire.setClock(400000);  // Fast mode: one 14-byte MPU read takes ~0.4 ms
   delay(100);
   
   // Scan I2C bus
@@ -120,7 +208,8 @@ void setup() {
   
   // Initialize CAN bus
   Serial.println("\nInitializing CAN bus...");
-  if (initCAN()) {
+  bool canReady = initCAN();
+  if (canReady) {
     Serial.println("✓ CAN bus ready (receiving from vision system)");
     setRGB(0, 0, 1);  // Blue = CAN ready
   } else {
@@ -130,53 +219,25 @@ void setup() {
   
   // Initialize L91 Motor Controller
   Serial.println("\nInitializing L91 Motor Controller (Serial2 @ 921600 baud)...");
-  if (l91Motor.begin()) {
+  l91Queue = xQueueCreate(L91_QUEUE_DEPTH, sizeof(L91Command));
+  bool l91Ready = (l91Queue != NULL) && l91Motor.begin();
+  if (l91Ready) {
     Serial.println("✓ L91 Motor Controller ready");
-    delay(500);
-    
-    // Initialize motors (activate and load params)
-    Serial.println("\nInitializing Robstride motors...");
-    
-    // Motor 12
-    Serial.print("Motor 12 (0x0C): ");
-    if (l91Motor.activateMotor(MOTOR_12_CAN_ID)) {
-      Serial.print("Activated, ");
-      delay(200);
-      if (l91Motor.loadParams(MOTOR_12_CAN_ID)) {
-        Serial.println("Params loaded ✓");
-      } else {
-        Serial.println("Params failed ✗");
-      }
-    } else {
-      Serial.println("Activate failed ✗");
-    }
-    
-    // Motor 13
-    Serial.print("Motor 13 (0x0D): ");
-    if (l91Motor.activateMotor(MOTOR_13_CAN_ID)) {
-      Serial.print("Activated, ");
-      delay(200);
-      if (l91Motor.loadParams(MOTOR_13_CAN_ID)) {
-        Serial.println("Params loaded ✓");
-      } else {
-        Serial.println("Params failed ✗");
-      }
-    } else {
-      Serial.println("Activate failed ✗");
-    }
+    xTaskCreatePinnedToCore(l91TxTask, "l91_tx", 4096, NULL, L91_TX_PRIORITY, NULL, BRIDGE_CORE);
     
-    // Motor 14
-    Serial.print("Motor 14 (0x0E): ");
-    if (l91Motor.activateMotor(MOTOR_14_CAN_ID)) {
-      Serial.print("Activated, ");
-      delay(200);
-      if (l91Motor.loadParams(MOTOR_14_CAN_ID)) {
-        Serial.println("Params loaded ✓");
-      } else {
-        Serial.println("Params failed ✗");
-      }
-    } else {
-      Serial.println("Activate failed ✗");
+    // Initialize motors (activate and load params). The commands are queued
+    // for l91TxTask, which spaces them by their settle times without
+    // holding up CAN reception.
+    Serial.println("\nQueueing Robstride motor initialization...");
+    const uint8_t initMotors[] = {MOTOR_12_CAN_ID, MOTOR_13_CAN_ID, MOTOR_14_CAN_ID};
+    for (uint8_t can_id : initMotors) {
+      L91Command activate = {L91_CMD_ACTIVATE, can_id, 0.0f, 0};
+      L91Command load = {L91_CMD_LOAD_PARAMS, can_id, 0.0f, 0};
+      xQueueSend(l91Queue, &activate, portMAX_DELAY);
+      xQueueSend(l91Queue, &load, portMAX_DELAY);
+      Serial.print("Motor 0x");
+      Serial.print(can_id, HEX);
+      Serial.println(": activate + load params queued");
     }
     
     setRGB(0, 1, 1);  // Cyan = motors ready
@@ -188,6 +249,14 @@ void setup() {
   // Start servo at center
   setPulse(1500);
   
+  // Start the remaining tasks; loop() has nothing left to do
+  if (canReady && l91Ready) {
+    xTaskCreatePinnedToCore(canRxTask, "can_rx", 4096, NULL, CAN_RX_PRIORITY, NULL, BRIDGE_CORE);
+  }
+  xTaskCreatePinnedToCore(sensorTask, "sensor", 4096, NULL, AUX_PRIORITY, NULL, AUX_CORE);
+  xTaskCreatePinnedToCore(servoTask, "servo", 2048, NULL, AUX_PRIORITY, NULL, AUX_CORE);
+  xTaskCreatePinnedToCore(statusTask, "status", 3072, NULL, AUX_PRIORITY, NULL, AUX_CORE);
+  
   Serial.println("\n========================================");
   Serial.println("System Ready!");
   Serial.println("- CAN bus: Listening for commands");
@@ -197,80 +266,154 @@ void setup() {
   delay(1000);
 }
 
-void processCANMessage() {
+// CAN receive: blocks on the TWAI driver and hands motor commands to l91TxTask
+void canRxTask(void* param) {
   twai_message_t message;
   
-  // Try to receive CAN message (non-blocking)
-  if (twai_receive(&message, pdMS_TO_TICKS(10)) == ESP_OK) {
-    Serial.print("CAN RX: ID=0x");
-    Serial.print(message.identifier, HEX);
-    Serial.print(" DLC=");
-    Serial.print(message.data_length_code);
-    Serial.print(" Data=");
-    
-    for (int i = 0; i < message.data_length_code; i++) {
-      if (message.data[i] < 0x10) Serial.print("0");
-      Serial.print(message.data[i], HEX);
-      Serial.print(" ");
+  for (;;) {
+    if (twai_receive(&message, portMAX_DELAY) != ESP_OK) {
+      continue;
     }
-    Serial.println();
+    uint32_t rx_us = micros();
     
     // Parse CAN message and convert to L91 motor command
     // Example protocol: ID=0x0C means motor 12, data[0]=speed (-1.0 to 1.0 as byte -128 to 127)
     uint8_t motor_id = message.identifier & 0x0F;  // Extract motor ID (0x0C, 0x0D, 0x0E)
     
     if (motor_id >= 0x0C && motor_id <= 0x0E && message.data_length_code >= 1) {
-      // Convert byte (-128 to 127) to float speed (-1.0 to 1.0)
-      float speed = ((float)message.data[0]) / 127.0f;
+      // Convert byte (-128 to 127) to float speed (-1.0 to 1.0). The byte is
+      // signed: 0x80-0xFF are reverse speeds (read unsigned, they clamped to +1.0)
+      float speed = ((float)(int8_t)message.data[0]) / 127.0f;
       
       // Clamp to safe range
       if (speed > 1.0f) speed = 1.0f;
       if (speed < -1.0f) speed = -1.0f;
       
-      Serial.print("  -> L91 Motor ");
-      Serial.print(motor_id);
-      Serial.print(" speed: ");
-      Serial.println(speed, 3);
+      L91Command cmd = {L91_CMD_JOG, motor_id, speed, rx_us};
+      if (xQueueSend(l91Queue, &cmd, 0) != pdTRUE) {
+        bridgeStats.dropped++;
+      }
+    }
+  }
+}
+
+// L91 output: the only writer to Serial2. Settle times after activate /
+// load params are vTaskDelay()s here, so they never stall CAN reception.
+void l91TxTask(void* param) {
+  L91Command cmd;
+  
+  for (;;) {
+    if (xQueueReceive(l91Queue, &cmd, portMAX_DELAY) != pdTRUE) {
+      continue;
+    }
+    
+    switch (cmd.type) {
+      case L91_CMD_ACTIVATE:
+        l91Motor.activateMotor(cmd.can_id);
+        vTaskDelay(pdMS_TO_TICKS(L91_ACTIVATE_SETTLE_MS));
+        break;
+      
+      case L91_CMD_LOAD_PARAMS:
+        l91Motor.loadParams(cmd.can_id);
+        vTaskDelay(pdMS_TO_TICKS(L91_LOAD_PARAMS_SETTLE_MS));
+        break;
       
-      // Send L91 command
-      l91Motor.moveMotor(motor_id, speed);
+      case L91_CMD_JOG: {
+        l91Motor.moveMotor(cmd.can_id, cmd.speed);
+        uint32_t latency = micros() - cmd.rx_us;
+        bridgeStats.frames++;
+        bridgeStats.latencySumUs += latency;
+        if (latency > bridgeStats.latencyMaxUs) {
+          bridgeStats.latencyMaxUs = latency;
+        }
+#if BRIDGE_VERBOSE
+        Serial.print("CAN -> L91 Motor 0x");
+        Serial.print(cmd.can_id, HEX);
+        Serial.print(" speed: ");
+        Serial.print(cmd.speed, 3);
+        Serial.print(" (");
+        Serial.print(latency);
+        Serial.println(" us)");
+#endif
+        break;
+      }
     }
   }
 }
 
-void loop() {
-  // Process CAN messages (non-blocking)
-  processCANMessage();
+// MPU-6050 binary stream at IMU_RATE_HZ (if initialized)
+void sensorTask(void* param) {
+  if (!mpuInitialized) {
+    vTaskDelete(NULL);
+  }
+  
+  ImuFrame frame;
+  frame.sync[0] = 0xA5;
+  frame.sync[1] = 0x5A;
+  frame.type = IMU_FRAME_TYPE;
+  frame.seq = 0;
   
-  // Read MPU-6050 data periodically (if initialized)
-  static unsigned long lastMPURead = 0;
-  if (mpuInitialized && (millis() - lastMPURead > 1000)) {
+  const TickType_t period = pdMS_TO_TICKS(1000 / IMU_RATE_HZ);
+  TickType_t lastWake = xTaskGetTickCount();
+  
+  for (;;) {
+    vTaskDelayUntil(&lastWake, period);
+    
     sensors_event_t a, g, temp;
     mpu.getEvent(&a, &g, &temp);
     
-    Serial.println("=== MPU-6050 Readings ===");
-    Serial.print("Accel X: "); Serial.print(a.acceleration.x);
-    Serial.print("  Y: "); Serial.print(a.acceleration.y);
-    Serial.print("  Z: "); Serial.println(a.acceleration.z);
-    Serial.print("Gyro X: "); Serial.print(g.gyro.x);
-    Serial.print("  Y: "); Serial.print(g.gyro.y);
-    Serial.print("  Z: "); Serial.println(g.gyro.z);
-    Serial.print("Temperature: "); Serial.print(temp.temperature); Serial.println(" C");
-    Serial.println();
+    frame.t_us = micros();
+    frame.accel[0] = scaleToInt16(a.acceleration.x, IMU_ACCEL_SCALE);
+    frame.accel[1] = scaleToInt16(a.acceleration.y, IMU_ACCEL_SCALE);
+    frame.accel[2] = scaleToInt16(a.acceleration.z, IMU_ACCEL_SCALE);
+    frame.gyro[0] = scaleToInt16(g.gyro.x, IMU_GYRO_SCALE);
+    frame.gyro[1] = scaleToInt16(g.gyro.y, IMU_GYRO_SCALE);
+    frame.gyro[2] = scaleToInt16(g.gyro.z, IMU_GYRO_SCALE);
+    frame.temp = scaleToInt16(temp.temperature, IMU_TEMP_SCALE);
+    frame.crc = crc16Ccitt((const uint8_t*)&frame, sizeof(frame) - sizeof(frame.crc));
     
-    lastMPURead = millis();
+    Serial.write((const uint8_t*)&frame, sizeof(frame));
+    frame.seq++;
   }
-  
-  // Servo control (can be modified based on CAN commands if needed)
-  // For now, keep existing servo behavior
-  static unsigned long lastServoMove = 0;
-  if (millis() - lastServoMove > 5000) {
+}
+
+// Servo control (can be modified based on CAN commands if needed)
+// For now, keep existing servo behavior
+void servoTask(void* param) {
+  for (;;) {
+    vTaskDelay(pdMS_TO_TICKS(5000));
     setPulse(1800);
-    delay(2000);
+    vTaskDelay(pdMS_TO_TICKS(2000));
     setPulse(1500);
-    lastServoMove = millis();
   }
+}
+
+// Periodic bridge summary (replaces per-frame logging)
+void statusTask(void* param) {
+  uint32_t lastFrames = 0;
   
-  // Small delay to prevent CPU spinning
-  delay(10);
+  for (;;) {
+    vTaskDelay(pdMS_TO_TICKS(5000));
+    uint32_t frames = bridgeStats.frames;
+    if (frames == lastFrames) {
+      continue;
+    }
+    lastFrames = frames;
+    
+    // One write: sensorTask shares the console, and separate prints would let
+    // binary IMU frames land in the middle of the line
+    char line[96];
+    int len = snprintf(line, sizeof(line), "Bridge: frames=%lu dropped=%lu CAN->L91 avg=%luus max=%luus\r\n",
+                       (unsigned long)frames, (unsigned long)bridgeStats.dropped,
+                       (unsigned long)(bridgeStats.latencySumUs / frames),
+                       (unsigned long)bridgeStats.latencyMaxUs);
+    if (len > 0) {
+      Serial.write((const uint8_t*)line, min((size_t)len, sizeof(line) - 1));
+    }
+  }
+}
+
+void loop() {
+  // All work happens in the FreeRTOS tasks started from setup()
+  vTaskDelay(portMAX_DELAY);
 }
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Binary IMU stream reader for the ESP32 bridge (MPU-6050)
+Decodes the framed stream written by sensorTask in src/main.cpp into a NumPy
+ring buffer. Decoding is vectorized over every frame in a read chunk - there is
+no per-sample Python loop.
+
+Frame (little-endian, 24 bytes):
+  a5 5a | type u8 | seq u8 | t_us u32 | accel i16[3] | gyro i16[3] | temp i16 | crc16
+
+Text and binary share the port: the firmware's setup messages and its
+periodic "Bridge: ..." status line are interleaved with the frames. Text is
+skipped here (a frame only counts if its sync bytes, type and CRC all match).
+The status line goes out in one write, so it never splits a frame, but it is
+preceded by frame bytes rather than a newline; text readers such as
+motors/scripts/esp32_bridge_latency_probe.py search for it anywhere in the data.
+
+Usage:
+  python imu_stream_reader.py /dev/ttyUSB0
+  python imu_stream_reader.py COM4 --baud 921600
+"""
+
+import sys
+import time
+
+import numpy as np
+
+SYNC = b'\xa5\x5a'
+FRAME_TYPE_IMU = 0x01
+FRAME_SIZE = 24
+CRC_LEN = FRAME_SIZE - 2
+
+# Must match IMU_*_SCALE in src/main.cpp
+ACCEL_LSB = 1.0 / 400.0    # m/s^2
+GYRO_LSB = 1.0 / 2000.0    # rad/s
+TEMP_LSB = 1.0 / 100.0     # C
+
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('type', 'u1'),
+    ('seq', 'u1'),
+    ('t_us', '<u4'),
+    ('accel', '<i2', (3,)),
+    ('gyro', '<i2', (3,)),
+    ('temp', '<i2'),
+    ('crc', '<u2'),
+])
+assert FRAME_DTYPE.itemsize == FRAME_SIZE
+
+SAMPLE_DTYPE = np.dtype([
+    ('t', '<f8'),            # device time in seconds (micros() unwrapped)
+    ('seq', '<u2'),
+    ('accel', '<f4', (3,)),  # m/s^2
+    ('gyro', '<f4', (3,)),   # rad/s
+    ('temp', '<f4'),         # C
+])
+
+
+def _crc16_table():
+    """CRC-16/CCITT-FALSE lookup table (poly 0x1021)"""
+    table = np.zeros(256, dtype=np.uint16)
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[byte] = crc & 0xFFFF
+    return table
+
+
+CRC16_TABLE = _crc16_table()
+
+
+def crc16_rows(rows):
+    """CRC-16/CCITT-FALSE of every row of a (n, k) uint8 array at once"""
+    crc = np.full(rows.shape[0], 0xFFFF, dtype=np.uint16)
+    for col in range(rows.shape[1]):
+        idx = ((crc >> 8) ^ rows[:, col]) & 0xFF
+        crc = (crc << 8) ^ CRC16_TABLE[idx]
+    return crc
+
+
+def decode_frames(data):
+    """
+    Find and validate every IMU frame in data.
+
+    Returns (frames, consumed): frames is a FRAME_DTYPE array, consumed is the
+    number of leading bytes that can be discarded (a possibly incomplete frame
+    at the end is left for the next call).
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    n = buf.size
+    keep_from = max(0, n - (FRAME_SIZE - 1))
+    if n < FRAME_SIZE:
+        return np.empty(0, dtype=FRAME_DTYPE), 0
+
+    starts = np.flatnonzero((buf[:-1] == 0xA5) & (buf[1:] == 0x5A))
+    starts = starts[starts + FRAME_SIZE <= n]
+    if starts.size == 0:
+        return np.empty(0, dtype=FRAME_DTYPE), keep_from
+
+    rows = buf[starts[:, None] + np.arange(FRAME_SIZE)]
+    crc = rows[:, CRC_LEN].astype(np.uint16) | (rows[:, CRC_LEN + 1].astype(np.uint16) << 8)
+    valid = (rows[:, 2] == FRAME_TYPE_IMU) & (crc16_rows(rows[:, :CRC_LEN]) == crc)
+
+    starts = starts[valid]
+    rows = rows[valid]
+    if starts.size == 0:
+        return np.empty(0, dtype=FRAME_DTYPE), keep_from
+
+    # A sync pair inside a valid frame that also passes CRC is ~1/65536;
+    # drop any candidate that starts inside the previous one
+    if starts.size > 1:
+        ok = np.concatenate(([True], np.diff(starts) >= FRAME_SIZE))
+        starts = starts[ok]
+        rows = rows[ok]
+
+    frames = np.ascontiguousarray(rows).view(FRAME_DTYPE).reshape(-1)
+    consumed = max(int(starts[-1]) + FRAME_SIZE, keep_from)
+    return frames, consumed
+
+
+class ImuStreamReader:
+    """Serial IMU reader backed by a fixed-size NumPy ring buffer"""
+
+    def __init__(self, port=None, baudrate=921600, capacity=8192):
+        self.port = port
+        self.baudrate = baudrate
+        self.ser = None
+        self.capacity = capacity
+        self.samples = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self.count = 0          # total samples ever written
+        self.dropped = 0        # gaps detected from seq
+        self._pending = bytearray()
+        self._last_seq = None
+        self._last_t_us = None
+        self._wrap_us = 0
+
+    def connect(self):
+        """Open the serial port"""
+        import serial
+        self.ser = serial.Serial(self.port, self.baudrate, timeout=0.05)
+        self.ser.reset_input_buffer()
+        return True
+
+    def disconnect(self):
+        """Close serial connection"""
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+    def poll(self):
+        """Read whatever is waiting on the port; returns number of new samples"""
+        chunk = self.ser.read(self.ser.in_waiting or 1)
+        return self.feed(chunk) if chunk else 0
+
+    def feed(self, data):
+        """Decode raw stream bytes into the ring buffer; returns number of new samples"""
+        self._pending.extend(data)
+        frames, consumed = decode_frames(bytes(self._pending))
+        del self._pending[:consumed]
+        if frames.size == 0:
+            return 0
+
+        self._append(frames)
+        return int(frames.size)
+
+    def _append(self, frames):
+        """Convert frames to SI units and write them into the ring"""
+        k = frames.size
+
+        # Unwrap the 32-bit micros() counter (wraps every ~71 minutes)
+        t_us = frames['t_us'].astype(np.int64)
+        prev = t_us[0] if self._last_t_us is None else self._last_t_us
+        wraps = np.cumsum(np.diff(t_us, prepend=prev) < 0)
+        t_us = t_us + (self._wrap_us + wraps * (1 << 32))
+        self._wrap_us += int(wraps[-1]) * (1 << 32)
+        self._last_t_us = int(frames['t_us'][-1])
+
+        seq = frames['seq'].astype(np.int64)
+        prev_seq = seq[0] - 1 if self._last_seq is None else self._last_seq
+        gaps = (np.diff(seq, prepend=prev_seq) - 1) % 256
+        self.dropped += int(gaps.sum())
+        self._last_seq = int(seq[-1])
+
+        out = np.empty(k, dtype=SAMPLE_DTYPE)
+        out['t'] = t_us * 1e-6
+        out['seq'] = seq
+        out['accel'] = frames['accel'] * ACCEL_LSB
+        out['gyro'] = frames['gyro'] * GYRO_LSB
+        out['temp'] = frames['temp'] * TEMP_LSB
+
+        if k > self.capacity:
+            out = out[-self.capacity:]
+            self.count += k - self.capacity
+            k = self.capacity
+
+        idx = (self.count + np.arange(k)) % self.capacity
+        self.samples[idx] = out
+        self.count += k
+
+    def latest(self, n=None):
+        """Return the newest n samples (oldest first) as a copy"""
+        available = min(self.count, self.capacity)
+        n = available if n is None else min(n, available)
+        idx = (self.count - n + np.arange(n)) % self.capacity
+        return self.samples[idx]
+
+    def rate_hz(self, window=500):
+        """Sample rate estimated from device timestamps over the last window samples"""
+        recent = self.latest(window)
+        if recent.size < 2:
+            return 0.0
+        span = recent['t'][-1] - recent['t'][0]
+        return (recent.size - 1) / span if span > 0 else 0.0
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Read the ESP32 binary IMU stream')
+    parser.add_argument('port', help='ESP32 USB console port (e.g. /dev/ttyUSB0, COM4)')
+    parser.add_argument('--baud', type=int, default=921600,
+                       help='Console baud rate (default: 921600)')
+    parser.add_argument('--interval', type=float, default=1.0,
+                       help='Summary print interval in seconds (default: 1.0)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ESP32 IMU STREAM READER")
+    print("=" * 70)
+    print()
+
+    reader = ImuStreamReader(args.port, args.baud)
+    try:
+        reader.connect()
+        print(f"  [OK] Connected to {args.port} at {args.baud} baud")
+        print()
+
+        last_print = time.time()
+        while True:
+            reader.poll()
+            if time.time() - last_print < args.interval:
+                continue
+            last_print = time.time()
+
+            recent = reader.latest(int(reader.rate_hz() * args.interval) or 1)
+            if recent.size == 0:
+                print("  [WAITING] No IMU frames yet")
+                continue
+
+            accel = recent['accel'].mean(axis=0)
+            gyro = recent['gyro'].mean(axis=0)
+            print(f"  {reader.rate_hz():6.1f} Hz  dropped={reader.dropped:<5d} "
+                  f"accel=({accel[0]:+6.2f}, {accel[1]:+6.2f}, {accel[2]:+6.2f}) m/s^2  "
+                  f"gyro=({gyro[0]:+5.2f}, {gyro[1]:+5.2f}, {gyro[2]:+5.2f}) rad/s  "
+                  f"temp={recent['temp'][-1]:.1f} C")
+
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
+    finally:
+        reader.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Lightweight metrics registry with a Prometheus text endpoint
+Shared by the motor, camera and voice scripts: counters, gauges and
+HDR-style latency histograms, served at http://127.0.0.1:<port>/metrics.
+
+Hot paths never take a lock. Counters and histograms keep one cell per
+writing thread (registered once, on that thread's first update); a scrape
+sums the cells without stopping the writers, so a snapshot may be a few
+updates behind but never blocks a control or capture loop.
+
+Histograms use log-linear buckets (8 sub-buckets per power of two, ~9%
+relative error) from 1 us to ~12 days, and are exported as Prometheus
+summaries (p50 / p90 / p99 / p99.9, _sum, _count).
+
+Usage in a script:
+  from metrics import counter, histogram, start_http_server
+  FRAMES = counter('camera_frames_total', 'Frames captured', ['camera'])
+  start_http_server(9108)          # or start_from_env() to use $METRICS_PORT
+  FRAMES.labels('cam0').inc()
+
+  python metrics.py --port 9108        # demo endpoint with a few live metrics
+"""
+
+import math
+import os
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PORT = 9108
+
+HIST_LOWEST = 1e-6        # seconds; smallest distinguishable value
+HIST_SUB_BUCKETS = 8      # per power of two
+HIST_OCTAVES = 40         # 1 us * 2^40 ~ 12.7 days
+HIST_BUCKETS = HIST_OCTAVES * HIST_SUB_BUCKETS
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class _CellOwner:
+    """Lives in the writing thread's thread-local; collected when that thread exits"""
+    __slots__ = ('cell', '__weakref__')
+
+    def __init__(self, cell: list):
+        self.cell = cell
+
+
+class _ThreadCells:
+    """
+    One mutable list per writing thread; only the owning thread writes it.
+    When a thread exits, its cell is folded into a base cell, so
+    thread-per-connection servers don't grow the cell list (and scrape
+    time) with every connection they ever served.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._cells: List[list] = [[0] * size]     # _cells[0]: totals of exited threads
+        self._lock = threading.Lock()    # taken on a thread's first update and when it exits
+
+    def mine(self) -> list:
+        try:
+            return self._local.owner.cell
+        except AttributeError:
+            cell = [0] * self.size
+            with self._lock:
+                self._cells = self._cells + [cell]    # replace, so readers can iterate without the lock
+            owner = self._local.owner = _CellOwner(cell)
+            weakref.finalize(owner, self._retire, cell)
+            return cell
+
+    def _retire(self, cell: list):
+        """Fold an exited thread's cell into the base cell (one list swap, readers never see it twice)"""
+        with self._lock:
+            cells = self._cells
+            base = [a + b for a, b in zip(cells[0], cell)]
+            self._cells = [base] + [c for c in cells[1:] if c is not cell]
+
+    def all(self) -> List[list]:
+        return self._cells
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], '_Metric'] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs) -> '_Metric':
+        """Child metric for one label combination (cache it on hot paths)"""
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children = {**self._children, values: child}
+        return child
+
+    def _new_child(self) -> '_Metric':
+        return type(self)(self.name, self.documentation)
+
+    def _series(self):
+        """(label values, metric) pairs to export"""
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1):
+        self._cells.mine()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return sum(cell[0] for cell in self._cells.all())
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        self._update = threading.Lock()
+
+    def set(self, value: float):
+        self._value = value    # a single store; last writer wins
+
+    def inc(self, amount: float = 1):
+        """Add to the value; read-modify-write under a lock, so concurrent callers don't lose updates"""
+        with self._update:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Evaluate function at scrape time instead of storing a value"""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._value
+
+
+def bucket_index(value: float) -> int:
+    """Log-linear bucket for a value in seconds"""
+    if value <= HIST_LOWEST:
+        return 0
+    mantissa, exponent = math.frexp(value / HIST_LOWEST)   # mantissa in [0.5, 1)
+    index = (exponent - 1) * HIST_SUB_BUCKETS + int((mantissa - 0.5) * 2 * HIST_SUB_BUCKETS)
+    return min(index, HIST_BUCKETS - 1)
+
+
+def bucket_upper(index: int) -> float:
+    """Upper edge of a bucket in seconds"""
+    octave, sub = divmod(index, HIST_SUB_BUCKETS)
+    return HIST_LOWEST * (2.0 ** octave) * (1.0 + (sub + 1) / HIST_SUB_BUCKETS)
+
+
+class Histogram(_Metric):
+    """Latency histogram in seconds; cells are [count, sum, bucket counts...]"""
+    kind = 'summary'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._cells = _ThreadCells(2 + HIST_BUCKETS)
+
+    def observe(self, seconds: float):
+        cell = self._cells.mine()
+        cell[0] += 1
+        cell[1] += seconds
+        cell[2 + bucket_index(seconds)] += 1
+
+    def time(self):
+        """Context manager observing the elapsed time of its block"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[int, float, List[int]]:
+        count, total = 0, 0.0
+        buckets = [0] * HIST_BUCKETS
+        for cell in self._cells.all():
+            count += cell[0]
+            total += cell[1]
+            for i, n in enumerate(cell[2:]):
+                if n:
+                    buckets[i] += n
+        return count, total, buckets
+
+    def quantiles(self, qs: Sequence[float] = QUANTILES) -> Dict[float, float]:
+        count, _, buckets = self.snapshot()
+        result = {}
+        if count == 0:
+            return {q: float('nan') for q in qs}
+        for q in qs:
+            rank = q * count
+            seen = 0
+            for i, n in enumerate(buckets):
+                seen += n
+                if seen >= rank and n:
+                    result[q] = bucket_upper(i)
+                    break
+        return result
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+def _format_labels(names, values, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Registry:
+    """Named metrics; get-or-create, so modules can declare the same metric safely"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labelnames):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = cls(name, documentation, labelnames)
+                    self._metrics = {**self._metrics, name: metric}
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name, documentation='', labelnames=()) -> Counter:
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation='', labelnames=()) -> Gauge:
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation='', labelnames=()) -> Histogram:
+        return self._get(Histogram, name, documentation, labelnames)
+
+    def exposition(self) -> str:
+        """Prometheus text format (version 0.0.4)"""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for values, series in metric._series():
+                labels = _format_labels(metric.labelnames, values)
+                if isinstance(series, Histogram):
+                    count, total, _ = series.snapshot()
+                    for q, v in series.quantiles().items():
+                        ql = _format_labels(metric.labelnames, values, ('quantile', str(q)))
+                        lines.append(f"{name}{ql} {_format_value(v)}")
+                    lines.append(f"{name}_sum{labels} {_format_value(total)}")
+                    lines.append(f"{name}_count{labels} {count}")
+                else:
+                    lines.append(f"{name}{labels} {_format_value(series.value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Suppress log messages
+
+
+def start_http_server(port: int = DEFAULT_PORT, addr: str = '127.0.0.1',
+                      registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread; returns the server (call shutdown() to stop)"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    httpd = ThreadingHTTPServer((addr, port), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name='metrics-http', daemon=True).start()
+    return httpd
+
+
+def start_from_env(port: Optional[int] = None, addr: str = '127.0.0.1') -> Optional[ThreadingHTTPServer]:
+    """Start the endpoint on port, else on $METRICS_PORT; do nothing if neither is set"""
+    if port is None:
+        env = os.environ.get('METRICS_PORT')
+        port = int(env) if env else None
+    if not port:
+        return None
+    httpd = start_http_server(port, addr)
+    print(f"  [OK] Metrics at http://{addr}:{port}/metrics")
+    return httpd
+
+
+def main():
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description='Demo metrics endpoint')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'HTTP port (default: {DEFAULT_PORT})')
+    parser.add_argument('--addr', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    args = parser.parse_args()
+
+    loops = counter('demo_loops_total', 'Demo loop iterations')
+    latency = histogram('demo_latency_seconds', 'Demo loop latency', ['stage'])
+    stage = latency.labels('work')
+    gauge('demo_start_time_seconds', 'Demo start time').set(time.time())
+
+    start_http_server(args.port, args.addr)
+    print("=" * 70)
+    print(f"METRICS ENDPOINT: http://{args.addr}:{args.port}/metrics")
+    print("=" * 70)
+    try:
+        while True:
+            with stage.time():
+                time.sleep(random.uniform(0.001, 0.005))
+            loops.inc()
+    except KeyboardInterrupt:
+        print("\n\n[INTERRUPTED] Stopped by user")
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,12 @@ import numpy as np
 import struct
 from pathlib import Path
 
+import _paths  # ../../tools on sys.path for metrics
+from metrics import counter, histogram, start_from_env
+
+STAGE_SECONDS = histogram('voice_stage_seconds', 'Voice pipeline stage duration', ['stage'])
+CYCLES = counter('voice_cycles_total', 'Conversation cycles by result', ['result'])
+
 class VoiceAssistant:
     def __init__(self):
         # Piper TTS configuration
@@ -341,36 +347,45 @@ class VoiceAssistant:
         print("=" * 50)
         
         # Step 1: Record audio
-        audio_file = self.record_audio()
+        with STAGE_SECONDS.labels('record').time():
+            audio_file = self.record_audio()
         
         if not audio_file:
             print("\n❌ Could not record audio")
+            CYCLES.labels('no_audio').inc()
             return False
         
         # Step 2: Speech to Text
-        text = self.speech_to_text(audio_file)
+        with STAGE_SECONDS.labels('stt').time():
+            text = self.speech_to_text(audio_file)
         if audio_file and os.path.exists(audio_file):
             os.unlink(audio_file)  # Clean up
         
         if not text:
             print("\n❌ Could not understand speech")
+            CYCLES.labels('no_text').inc()
             return False
         
         # Step 3: Get LLM response
-        response = self.get_llm_response(text)
+        with STAGE_SECONDS.labels('llm').time():
+            response = self.get_llm_response(text)
         
         if not response:
             print("\n❌ Could not get LLM response")
+            CYCLES.labels('no_response').inc()
             return False
         
         # Step 4: Text to Speech
-        success = self.text_to_speech(response)
+        with STAGE_SECONDS.labels('tts').time():
+            success = self.text_to_speech(response)
         
         if not success:
             print("\n❌ Could not generate speech")
+            CYCLES.labels('tts_failed').inc()
             return False
         
         print("\n✓ Conversation cycle complete!")
+        CYCLES.labels('ok').inc()
         return True
     
     def run_interactive(self):
@@ -400,6 +415,9 @@ def main():
     
     print("\n✓ All dependencies installed!")
     
+    # Local metrics endpoint when METRICS_PORT is set
+    start_from_env()
+    
     # Run interactive mode
     try:
         assistant.run_interactive()